@@ -1,5 +1,7 @@
 # 股票分析模块 - 基于短线实战体系
-from typing import List, Dict
+from typing import List, Dict, Tuple
+
+import numpy as np
 
 
 def analyze_volume_price(stock: dict) -> dict:
@@ -302,6 +304,242 @@ def calculate_score(stock: dict, market_change: float = 0, theme_change: float =
     return max(0, min(100, round(score))), details
 
 
+# ==================== 批量评分（向量化） ====================
+# 与 analyze_volume_price / analyze_strength / analyze_position / calculate_score
+# 逐只计算的结果完全一致，一次处理整个题材（或全市场）的列数据
+
+VOLUME_LEVELS = np.array(["爆量", "放量", "中量", "缩量", "地量"], dtype=object)
+SIGNALS = np.array(["放量上涨", "缩量强势", "放量滞涨", "放量下跌", "温和上涨", "无量上涨", "观望"], dtype=object)
+STRENGTHS = np.array(["涨停", "强势", "偏强", "震荡", "偏弱", "弱势"], dtype=object)
+OPEN_STRENGTHS = np.array(["竞价涨停", "竞价强势", "高开强势", "小幅高开", "低开弱势", "小幅低开", "平开"], dtype=object)
+POSITIONS = np.array(["日内高位", "日内低位", "中位"], dtype=object)
+
+SIGNAL_SCORES = np.array([30, 25, -10, -20, 15, 0, 0])
+STRENGTH_SCORES = np.array([20, 18, 12, 5, -5, -5])
+
+SCORE_COLUMNS = [
+    "price", "change_pct", "amount", "amplitude", "high", "low",
+    "open", "prev_close", "market_cap", "float_cap",
+]
+
+
+def _to_number(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def stocks_to_columns(stocks: List[dict]) -> Dict[str, np.ndarray]:
+    """股票列表转为列数据（缺失或非数值按0处理）"""
+    cols = {}
+    for key in SCORE_COLUMNS:
+        values = [s.get(key, 0) for s in stocks]
+        try:
+            # None 转为 NaN，在 score_columns 中按0处理
+            cols[key] = np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            # 含 "-" 等非数值，逐个转换
+            cols[key] = np.array([_to_number(v) for v in values], dtype=float)
+    return cols
+
+
+def score_columns(cols, market_change: float = 0, theme_change: float = 0) -> Dict[str, np.ndarray]:
+    """
+    向量化评分
+    
+    参数:
+        cols: 列数据，dict 或 pandas.DataFrame，需包含 SCORE_COLUMNS 各列
+        market_change: 大盘涨跌幅
+        theme_change: 板块涨跌幅
+    
+    返回:
+        各指标列：turnover_rate、volume_level/signal/strength/open_strength/position（编码，
+        对应 VOLUME_LEVELS 等数组下标）、open_change、is_weak_to_strong、weak_to_strong_type、
+        is_front_runner、各前排标签布尔列、is_limit_up、is_near_limit、score、valid
+    """
+    col = {key: np.nan_to_num(np.asarray(cols[key], dtype=float)) for key in SCORE_COLUMNS}
+    price, change = col["price"], col["change_pct"]
+    amount, amplitude = col["amount"], col["amplitude"]
+    high, low = col["high"], col["low"]
+    open_price, prev_close = col["open"], col["prev_close"]
+    market_cap, float_cap = col["market_cap"], col["float_cap"]
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 1. 量价：换手率 = 成交额 / 流通市值（无流通市值用总市值70%估算）
+        cap = np.where(float_cap > 0, float_cap, np.where(market_cap > 0, market_cap * 0.7, 0))
+        turnover = np.where(cap > 0, (amount / cap) * 100, 0)
+        volume_level = np.select([turnover >= 15, turnover >= 8, turnover >= 4, turnover >= 2], [0, 1, 2, 3], 4)
+        heavy = volume_level <= 1  # 爆量/放量
+        medium = (volume_level == 2) | (volume_level == 3)  # 中量/缩量
+        signal = np.select(
+            [
+                heavy & (change > 3),
+                medium & (change > 5),
+                heavy & (change > -1) & (change < 2),
+                heavy & (change < -3),
+                change > 2,
+                (volume_level == 4) & (change > 0),
+            ],
+            [0, 1, 2, 3, 4, 5], 6,
+        )
+        
+        # 日内位置
+        day_range = high - low
+        has_range = (high > 0) & (low > 0) & (price > 0) & (day_range > 0)
+        price_pos = np.where(has_range, (price - low) / day_range, 0)
+        
+        # 2. 强度：开盘强度
+        has_open = (prev_close > 0) & (open_price > 0)
+        open_change = np.where(has_open, (open_price - prev_close) / prev_close * 100, 0)
+    
+    open_strength = np.select(
+        [open_change >= 9.5, open_change >= 5, open_change >= 3, open_change >= 1,
+         open_change <= -3, open_change <= -1],
+        [0, 1, 2, 3, 4, 5], 6,
+    )
+    
+    # 弱转强（后面的形态覆盖前面的）
+    low_open_up = (open_change <= 0) & (change >= 3)
+    pullback = (amplitude >= 5) & (change >= 3) & has_range & (price_pos >= 0.7)
+    reversal = (amplitude >= 4) & (change >= 5) & (open_change <= 1)
+    is_weak_to_strong = low_open_up | pullback | reversal
+    weak_to_strong_type = np.select([reversal, pullback, low_open_up], ["分时反转", "回踩确认", "低开高走"], "")
+    
+    # 前排强度（标签顺序与 analyze_strength 中追加顺序一致）
+    none = np.zeros(len(change), dtype=bool)
+    against_market = (change > 0) if market_change < -0.5 else none
+    lead_theme = (change >= theme_change + 3) if theme_change < 1 else none
+    tags = {
+        "逆势上涨": against_market,
+        "逆势走强": ~against_market & (change >= 3) if market_change < 0 else none,
+        "板块领涨": lead_theme,
+        "独立走强": ~lead_theme & (change > 0) if theme_change < 0 else none,
+    }
+    tags["涨速凌厉"] = (amplitude >= 6) & (change >= 5) & has_range & (price_pos >= 0.8)
+    tags["强势封板"] = (change >= 9.9) & (amplitude <= 5)
+    tags["封板"] = (change >= 9.9) & (amplitude > 5) & (amplitude <= 8)
+    tags["竞价兑现"] = (open_change >= 3) & (change >= open_change)
+    is_front_runner = np.zeros(len(change), dtype=bool)
+    for name, mask in tags.items():
+        if name != "封板":
+            is_front_runner |= mask
+    
+    strength = np.select(
+        [change >= 9.9, change >= 7, change >= 3, change >= 0, change >= -3],
+        [0, 1, 2, 3, 4], 5,
+    )
+    
+    # 3. 位置
+    position = np.select(
+        [has_range & (price_pos > 0.8), has_range & (price_pos < 0.3)],
+        [0, 1], 2,
+    )
+    is_limit_up = change >= 9.9
+    is_near_limit = (change >= 7) & (change < 9.9)
+    
+    # 综合评分
+    score = (
+        40
+        + SIGNAL_SCORES[signal]
+        + STRENGTH_SCORES[strength]
+        + np.where(is_weak_to_strong, 10, 0)
+        + np.where(is_front_runner, 8, 0)
+        + np.where((position == 0) & ~is_limit_up, -5, np.where(is_near_limit, 8, 0))
+        + np.select([(market_cap > 5000000000) & (market_cap < 50000000000), market_cap > 100000000000], [5, 2], 0)
+    )
+    valid = price != 0
+    score = np.where(valid, np.clip(score, 0, 100), 0)
+    
+    return {
+        "turnover_rate": turnover,
+        "volume_level": volume_level,
+        "signal": signal,
+        "open_strength": open_strength,
+        "open_change": open_change,
+        "strength": strength,
+        "is_weak_to_strong": is_weak_to_strong,
+        "weak_to_strong_type": weak_to_strong_type,
+        "is_front_runner": is_front_runner,
+        "front_runner_tags": tags,
+        "position": position,
+        "is_limit_up": is_limit_up,
+        "is_near_limit": is_near_limit,
+        "score": score,
+        "valid": valid,
+    }
+
+
+def score_stocks_batch(stocks: List[dict], market_change: float = 0, theme_change: float = 0) -> List[Tuple[int, dict]]:
+    """
+    批量评分，返回值与对每只股票调用 calculate_score 相同：[(分数, 分析详情), ...]
+    """
+    if not stocks:
+        return []
+    
+    r = score_columns(stocks_to_columns(stocks), market_change, theme_change)
+    # 先转成Python列表再逐只组装，避免逐元素访问numpy标量
+    volume_levels = VOLUME_LEVELS[r["volume_level"]].tolist()
+    signals = SIGNALS[r["signal"]].tolist()
+    open_strengths = OPEN_STRENGTHS[r["open_strength"]].tolist()
+    strengths = STRENGTHS[r["strength"]].tolist()
+    positions = POSITIONS[r["position"]].tolist()
+    turnovers = r["turnover_rate"].tolist()
+    open_changes = r["open_change"].tolist()
+    weak_to_strong = r["is_weak_to_strong"].tolist()
+    weak_to_strong_types = r["weak_to_strong_type"].tolist()
+    front_runner = r["is_front_runner"].tolist()
+    limit_up = r["is_limit_up"].tolist()
+    near_limit = r["is_near_limit"].tolist()
+    scores = r["score"].tolist()
+    tag_names = list(r["front_runner_tags"])
+    tag_masks = np.column_stack([r["front_runner_tags"][name] for name in tag_names]).tolist()
+    
+    results = []
+    for i, stock in enumerate(stocks):
+        # 与 calculate_score 一致：价格为0视为无效（None/缺失字段不算）
+        if not stock or stock.get("price", 0) == 0:
+            results.append((0, {}))
+            continue
+        
+        signal = signals[i]
+        is_weak_to_strong = weak_to_strong[i]
+        is_front_runner = front_runner[i]
+        front_runner_tags = [name for name, hit in zip(tag_names, tag_masks[i]) if hit]
+        
+        details = {
+            "volume_price": {
+                "volume_level": volume_levels[i],
+                "turnover_rate": round(turnovers[i], 2),
+                "signal": signal,
+                "is_healthy": signal in ["放量上涨", "缩量强势", "温和上涨", "无量上涨"],
+            },
+            "strength": {
+                "open_strength": open_strengths[i],
+                "open_change": round(open_changes[i], 2),
+                "strength": strengths[i],
+                "is_weak_to_strong": is_weak_to_strong,
+                "weak_to_strong_type": weak_to_strong_types[i],
+                "is_front_runner": is_front_runner,
+                "front_runner_tags": front_runner_tags,
+            },
+        }
+        if is_weak_to_strong:
+            details["weak_to_strong"] = True
+        if is_front_runner:
+            details["is_front_runner"] = True
+            details["front_runner_tags"] = front_runner_tags
+        details["position"] = {
+            "position": positions[i],
+            "is_limit_up": limit_up[i],
+            "is_near_limit": near_limit[i],
+            "amplitude": stock.get("amplitude", 0) or 0,
+        }
+        results.append((int(scores[i]), details))
+    
+    return results
+
+
 def get_trading_signal(stock: dict, details: dict) -> str:
     """生成交易信号建议"""
     signals = []
@@ -369,7 +607,43 @@ def get_recommendation_reason(stock: dict, details: dict) -> str:
     return "，".join(reasons) if reasons else "综合表现一般"
 
 
-def identify_stock_role(stock: dict, all_stocks: list, theme_change: float = 0, market_change: float = 0) -> dict:
+# 不在排名表中的股票按第100名处理
+UNRANKED = 100
+
+
+def _rank_by(stocks: list, field: str) -> Dict[str, int]:
+    """按字段降序排名（从1开始），代码重复时取第一次出现的名次"""
+    ordered = sorted(stocks, key=lambda x: x.get(field, 0) or 0, reverse=True)
+    ranks = {}
+    for i, s in enumerate(ordered, 1):
+        ranks.setdefault(s.get("code"), i)
+    return ranks
+
+
+def build_rank_index(stocks: list) -> dict:
+    """
+    预先计算题材内排名，整个题材只排序一次
+    
+    返回:
+        change_rank / cap_rank / amount_rank: {代码: 名次}
+        second_change: 涨幅第二名的涨幅（不足2只时为None）
+        count: 股票数
+        first_limit_code: 列表中第一只涨停股的代码（率先涨停）
+    """
+    changes = sorted((s.get("change_pct", 0) or 0 for s in stocks), reverse=True)
+    first_limit = next((s for s in stocks if (s.get("change_pct", 0) or 0) >= 9.9), None)
+    return {
+        "change_rank": _rank_by(stocks, "change_pct"),
+        "cap_rank": _rank_by(stocks, "market_cap"),
+        "amount_rank": _rank_by(stocks, "amount"),
+        "second_change": changes[1] if len(changes) >= 2 else None,
+        "count": len(stocks),
+        "first_limit_code": first_limit.get("code") if first_limit else None,
+    }
+
+
+def identify_stock_role(stock: dict, all_stocks: list, theme_change: float = 0, market_change: float = 0,
+                        rank_index: dict = None) -> dict:
     """
     识别股票在题材中的角色
     
@@ -378,6 +652,8 @@ def identify_stock_role(stock: dict, all_stocks: list, theme_change: float = 0,
     - 中军：涨幅不错(3-9%) + 市值较大 + 成交活跃，板块核心主力
     - 低吸：回调到位、缩量企稳、有反弹预期
     
+    rank_index: build_rank_index(all_stocks) 的结果，批量识别时传入避免重复排序
+    
     返回: {"role": "龙头/中军/低吸/跟风", "role_reason": "原因"}
     """
     change_pct = stock.get("change_pct", 0) or 0
@@ -385,14 +661,14 @@ def identify_stock_role(stock: dict, all_stocks: list, theme_change: float = 0,
     amount = stock.get("amount", 0) or 0
     amplitude = stock.get("amplitude", 0) or 0
     
-    # 计算板块内排名
-    sorted_by_change = sorted(all_stocks, key=lambda x: x.get("change_pct", 0) or 0, reverse=True)
-    sorted_by_cap = sorted(all_stocks, key=lambda x: x.get("market_cap", 0) or 0, reverse=True)
-    sorted_by_amount = sorted(all_stocks, key=lambda x: x.get("amount", 0) or 0, reverse=True)
-    
-    change_rank = next((i for i, s in enumerate(sorted_by_change) if s.get("code") == stock.get("code")), 99) + 1
-    cap_rank = next((i for i, s in enumerate(sorted_by_cap) if s.get("code") == stock.get("code")), 99) + 1
-    amount_rank = next((i for i, s in enumerate(sorted_by_amount) if s.get("code") == stock.get("code")), 99) + 1
+    # 板块内排名
+    if rank_index is None:
+        rank_index = build_rank_index(all_stocks)
+    code = stock.get("code")
+    change_rank = rank_index["change_rank"].get(code, UNRANKED)
+    cap_rank = rank_index["cap_rank"].get(code, UNRANKED)
+    amount_rank = rank_index["amount_rank"].get(code, UNRANKED)
+    stock_count = rank_index["count"]
     
     role = "跟风"
     role_reason = ""
@@ -425,8 +701,8 @@ def identify_stock_role(stock: dict, all_stocks: list, theme_change: float = 0,
             role_reason = "逆势领涨"
     
     # 3. 板块内绝对领先（涨幅比第二名高3%以上）
-    if role != "龙头" and change_rank == 1 and len(sorted_by_change) >= 2:
-        second_change = sorted_by_change[1].get("change_pct", 0) or 0
+    second_change = rank_index["second_change"]
+    if role != "龙头" and change_rank == 1 and second_change is not None:
         if change_pct - second_change >= 3 and change_pct >= 5:
             role = "龙头"
             role_reason = "绝对领先"
@@ -435,7 +711,7 @@ def identify_stock_role(stock: dict, all_stocks: list, theme_change: float = 0,
     # 涨幅不错(3-9%) + 市值较大 + 成交活跃
     if role == "跟风":
         if 3 <= change_pct < 9.9:
-            if cap_rank <= len(all_stocks) // 2 or amount_rank <= 5:
+            if cap_rank <= stock_count // 2 or amount_rank <= 5:
                 if market_cap >= 10000000000:  # 100亿以上
                     role = "中军"
                     role_reason = f"涨{change_pct:.1f}%强势"
@@ -450,7 +726,7 @@ def identify_stock_role(stock: dict, all_stocks: list, theme_change: float = 0,
     # ========== 低吸判断 ==========
     if role == "跟风":
         if -3 <= change_pct <= 1 and amplitude <= 4:
-            if amount_rank >= len(all_stocks) // 2:
+            if amount_rank >= stock_count // 2:
                 role = "低吸"
                 role_reason = "缩量企稳"
             elif change_pct < 0 and change_pct > -2:
@@ -468,6 +744,14 @@ def identify_stock_role(stock: dict, all_stocks: list, theme_change: float = 0,
     }
 
 
+def assign_roles(stocks: List[dict], theme_change: float = 0, market_change: float = 0,
+                 rank_index: dict = None) -> List[dict]:
+    """批量识别整个题材的股票角色，顺序与 stocks 一致"""
+    if rank_index is None:
+        rank_index = build_rank_index(stocks)
+    return [identify_stock_role(s, stocks, theme_change, market_change, rank_index) for s in stocks]
+
+
 def format_amount(amount):
     """格式化成交额"""
     if not amount:
@@ -490,104 +774,184 @@ def format_market_cap(cap):
     return "-"
 
 
-def format_stock_display(stock: dict, theme_stocks: List[dict] = None, market_change: float = 0, theme_change: float = 0) -> dict:
-    """格式化股票显示数据"""
-    if not stock:
-        return {"error": "无数据"}
-    
+def is_suspended(stock) -> bool:
+    """停牌或无数据：价格无效且涨跌幅为0"""
     price = stock.get("price", 0)
     change_pct = stock.get("change_pct", 0) or 0
+    return (not price or price == "-") and change_pct == 0
+
+
+class AnalyzedStock:
+    """
+    单只股票的分析结果
     
-    # 只有当price和change_pct都无效时才认为是停牌
-    if (not price or price == "-") and change_pct == 0:
+    保存行情记录和数值形式的评分、角色，显示用的字符串（"12.34亿"、"+3.21%"等）
+    推迟到 to_display() 输出JSON时再生成，只格式化最终入选的股票
+    """
+    __slots__ = ("quote", "score", "details", "role", "role_reason", "is_first_limit")
+    
+    def __init__(self, quote, score: int, details: dict, role: str, role_reason: str, is_first_limit: bool = False):
+        self.quote = quote
+        self.score = score
+        self.details = details
+        self.role = role
+        self.role_reason = role_reason
+        self.is_first_limit = is_first_limit
+    
+    @property
+    def code(self) -> str:
+        return self.quote.get("code", "")
+    
+    @property
+    def change_pct(self) -> float:
+        return self.quote.get("change_pct", 0) or 0
+    
+    @property
+    def is_limit_up(self) -> bool:
+        return self.change_pct >= 9.9
+    
+    def to_record(self) -> dict:
+        """原始数值记录（保存报表用，见 database.save_report）"""
+        stock = self.quote
+        strength_info = self.details.get("strength", {})
         return {
             "code": stock.get("code", ""),
             "name": stock.get("name", ""),
-            "error": "停牌或无数据",
+            "price": stock.get("price", 0) or 0,
+            "change_pct": self.change_pct,
+            "score": self.score,
+            "role": self.role,
+            "role_reason": self.role_reason,
+            "signal": get_trading_signal(stock, self.details),
+            "volume_level": self.details.get("volume_price", {}).get("volume_level", "-"),
+            "strength": strength_info.get("strength", "-"),
+            "is_weak_to_strong": strength_info.get("is_weak_to_strong", False),
+            "is_front_runner": strength_info.get("is_front_runner", False),
+            "front_runner_tags": strength_info.get("front_runner_tags", []),
+            "market_cap": stock.get("market_cap", 0) or 0,
+            "amount": stock.get("amount", 0) or 0,
+            "turnover_rate": self.details.get("volume_price", {}).get("turnover_rate", 0),
+            "open_change": strength_info.get("open_change", 0) or 0,
         }
     
-    score, details = calculate_score(stock, market_change, theme_change)
-    strength_info = details.get("strength", {})
+    def to_display(self) -> dict:
+        """格式化为前端/推送使用的显示数据"""
+        stock = self.quote
+        details = self.details
+        strength_info = details.get("strength", {})
+        price = stock.get("price", 0)
+        change_pct = self.change_pct
+        
+        return {
+            "code": stock.get("code", ""),
+            "name": stock.get("name", ""),
+            "price": f"{float(price):.2f}" if price else "-",
+            "change_pct": f"{change_pct:+.2f}%",
+            "change_pct_num": change_pct,
+            "volume": f"{(stock.get('volume', 0) or 0)/10000:.1f}万手",
+            "amount": format_amount(stock.get("amount", 0)),
+            "market_cap": format_market_cap(stock.get("market_cap", 0)),
+            "amplitude": f"{stock.get('amplitude', 0) or 0:.2f}%",
+            "turnover_rate": f"{details.get('volume_price', {}).get('turnover_rate', 0):.1f}%",
+            "score": self.score,
+            "signal": get_trading_signal(stock, details),
+            "reason": get_recommendation_reason(stock, details),
+            # 详细分析数据
+            "volume_level": details.get("volume_price", {}).get("volume_level", "-"),
+            "strength": strength_info.get("strength", "-"),
+            "is_weak_to_strong": strength_info.get("is_weak_to_strong", False),
+            "weak_to_strong_type": strength_info.get("weak_to_strong_type", ""),
+            # 特殊标签
+            "is_first_limit": self.is_first_limit,
+            "open_strength": strength_info.get("open_strength", "平开"),  # 竞价强度标签
+            "open_change": strength_info.get("open_change", 0),
+            "is_limit_up": self.is_limit_up,
+            # 前排强度
+            "is_front_runner": strength_info.get("is_front_runner", False),
+            "front_runner_tags": strength_info.get("front_runner_tags", []),
+            # 股票角色
+            "role": self.role,
+            "role_reason": self.role_reason,
+        }
+
+
+def analyze_stock(stock, theme_stocks: list = None, market_change: float = 0, theme_change: float = 0,
+                  scored: tuple = None, rank_index: dict = None, role_info: dict = None) -> AnalyzedStock:
+    """
+    分析单只股票（需为非停牌股票）
+    scored: 预先批量计算的 (分数, 分析详情)，不传则单独计算
+    rank_index: 预先计算的题材排名索引，不传则按 theme_stocks 计算
+    role_info: 预先批量识别的角色，不传则单独识别
+    """
+    score, details = scored if scored is not None else calculate_score(stock, market_change, theme_change)
+    change_pct = stock.get("change_pct", 0) or 0
+    
+    if rank_index is None:
+        rank_index = build_rank_index(theme_stocks or [])
     
     # 判断是否率先涨停
     is_first_limit = False
     if change_pct >= 9.9 and theme_stocks:
-        limit_stocks = [s for s in theme_stocks if (s.get("change_pct", 0) or 0) >= 9.9]
-        if limit_stocks and stock.get("code") == limit_stocks[0].get("code"):
-            is_first_limit = True
+        is_first_limit = stock.get("code") == rank_index["first_limit_code"]
     
-    # 竞价强度标签
-    open_strength = strength_info.get("open_strength", "平开")
-    open_change = strength_info.get("open_change", 0)
+    # 识别股票角色（龙头/中军/低吸）
+    if role_info is None:
+        role_info = identify_stock_role(stock, theme_stocks or [], theme_change, market_change, rank_index)
     
-    # 前排强度
-    is_front_runner = strength_info.get("is_front_runner", False)
-    front_runner_tags = strength_info.get("front_runner_tags", [])
+    return AnalyzedStock(stock, score, details, role_info["role"], role_info["role_reason"], is_first_limit)
+
+
+def format_stock_display(stock: dict, theme_stocks: List[dict] = None, market_change: float = 0, theme_change: float = 0,
+                         scored: tuple = None, rank_index: dict = None, role_info: dict = None) -> dict:
+    """
+    格式化股票显示数据（参数同 analyze_stock）
+    """
+    if not stock:
+        return {"error": "无数据"}
     
-    # 识别股票角色（龙头/中军/低吸）
-    role_info = identify_stock_role(stock, theme_stocks or [], theme_change, market_change)
-    
-    result = {
-        "code": stock.get("code", ""),
-        "name": stock.get("name", ""),
-        "price": f"{float(price):.2f}" if price else "-",
-        "change_pct": f"{change_pct:+.2f}%",
-        "change_pct_num": change_pct,
-        "volume": f"{(stock.get('volume', 0) or 0)/10000:.1f}万手",
-        "amount": format_amount(stock.get("amount", 0)),
-        "market_cap": format_market_cap(stock.get("market_cap", 0)),
-        "amplitude": f"{stock.get('amplitude', 0) or 0:.2f}%",
-        "turnover_rate": f"{details.get('volume_price', {}).get('turnover_rate', 0):.1f}%",
-        "score": score,
-        "signal": get_trading_signal(stock, details),
-        "reason": get_recommendation_reason(stock, details),
-        # 详细分析数据
-        "volume_level": details.get("volume_price", {}).get("volume_level", "-"),
-        "strength": strength_info.get("strength", "-"),
-        "is_weak_to_strong": strength_info.get("is_weak_to_strong", False),
-        "weak_to_strong_type": strength_info.get("weak_to_strong_type", ""),
-        # 特殊标签
-        "is_first_limit": is_first_limit,
-        "open_strength": open_strength,
-        "open_change": open_change,
-        "is_limit_up": change_pct >= 9.9,
-        # 前排强度
-        "is_front_runner": is_front_runner,
-        "front_runner_tags": front_runner_tags,
-        # 股票角色
-        "role": role_info["role"],
-        "role_reason": role_info["role_reason"],
-    }
+    # 只有当price和change_pct都无效时才认为是停牌
+    if is_suspended(stock):
+        return {
+            "code": stock.get("code", ""),
+            "name": stock.get("name", ""),
+            "error": "停牌或无数据",
+        }
     
-    return result
+    analyzed = analyze_stock(stock, theme_stocks, market_change, theme_change, scored, rank_index, role_info)
+    return analyzed.to_display()
 
 
-def analyze_and_format_stocks(stocks: List[dict], market_change: float = 0, theme_change: float = 0) -> List[dict]:
+def analyze_stocks(stocks: list, market_change: float = 0, theme_change: float = 0) -> List[AnalyzedStock]:
     """
-    分析并格式化股票列表
-    返回5只股票：龙头优先，然后是中军和低吸
+    分析题材股票并挑选5只：龙头优先，然后是中军和低吸
+    返回未格式化的分析结果，显示数据由 AnalyzedStock.to_display() 生成
     
     参数:
-        stocks: 股票列表
+        stocks: 股票列表（StockQuote 或 dict）
         market_change: 大盘涨跌幅（用于判断逆势）
         theme_change: 板块涨跌幅（用于判断板块内强度）
     """
-    formatted = [format_stock_display(s, stocks, market_change, theme_change) for s in stocks]
-    # 过滤掉有错误的
-    valid = [f for f in formatted if "error" not in f]
-    invalid = [f for f in formatted if "error" in f]
+    scored = score_stocks_batch(stocks, market_change, theme_change)
+    rank_index = build_rank_index(stocks)
+    roles = assign_roles(stocks, theme_change, market_change, rank_index)
+    # 过滤掉停牌/无数据的
+    valid = [
+        analyze_stock(s, stocks, market_change, theme_change, sc, rank_index, role)
+        for s, sc, role in zip(stocks, scored, roles)
+        if s and not is_suspended(s)
+    ]
     
     # 按角色分类
-    leaders = [s for s in valid if s.get("role") == "龙头"]
-    middles = [s for s in valid if s.get("role") == "中军"]
-    dips = [s for s in valid if s.get("role") == "低吸"]
-    others = [s for s in valid if s.get("role") == "跟风"]
+    leaders = [s for s in valid if s.role == "龙头"]
+    middles = [s for s in valid if s.role == "中军"]
+    dips = [s for s in valid if s.role == "低吸"]
+    others = [s for s in valid if s.role == "跟风"]
     
     # 各类别内部按评分排序
-    leaders.sort(key=lambda x: x.get("score", 0), reverse=True)
-    middles.sort(key=lambda x: x.get("score", 0), reverse=True)
-    dips.sort(key=lambda x: x.get("score", 0), reverse=True)
-    others.sort(key=lambda x: x.get("score", 0), reverse=True)
+    leaders.sort(key=lambda x: x.score, reverse=True)
+    middles.sort(key=lambda x: x.score, reverse=True)
+    dips.sort(key=lambda x: x.score, reverse=True)
+    others.sort(key=lambda x: x.score, reverse=True)
     
     # 组合结果：龙头(最多2) + 中军(最多1) + 低吸(最多1) + 其他补足到5
     result = []
@@ -607,21 +971,34 @@ def analyze_and_format_stocks(stocks: List[dict], market_change: float = 0, them
         # 从剩余的龙头、中军、低吸、跟风中补充
         pool = leaders[2:] + middles[1:] + dips[1:] + others
         # 去重
-        existing_codes = {s.get("code") for s in result}
+        existing_codes = {s.code for s in result}
         for s in pool:
-            if s.get("code") not in existing_codes:
+            if s.code not in existing_codes:
                 result.append(s)
-                existing_codes.add(s.get("code"))
+                existing_codes.add(s.code)
                 if len(result) >= 5:
                     break
     
     # 标记率先涨停（第一个涨停的）
     found_first_limit = False
     for s in result:
-        if s.get("is_limit_up") and not found_first_limit:
-            s["is_first_limit"] = True
+        if s.is_limit_up and not found_first_limit:
+            s.is_first_limit = True
             found_first_limit = True
-        elif s.get("is_first_limit"):
-            s["is_first_limit"] = False
+        elif s.is_first_limit:
+            s.is_first_limit = False
     
     return result
+
+
+def analyze_and_format_stocks(stocks: list, market_change: float = 0, theme_change: float = 0) -> List[dict]:
+    """
+    分析并格式化股票列表
+    返回5只股票：龙头优先，然后是中军和低吸（见 analyze_stocks）
+    
+    参数:
+        stocks: 股票列表（StockQuote 或 dict）
+        market_change: 大盘涨跌幅（用于判断逆势）
+        theme_change: 板块涨跌幅（用于判断板块内强度）
+    """
+    return [s.to_display() for s in analyze_stocks(stocks, market_change, theme_change)]
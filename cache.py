@@ -0,0 +1,137 @@
+# 缓存模块 - 线程安全的单飞(single-flight)缓存
+# 同一个key同时只有一个请求在加载，其余调用方等待其结果；
+# 过期后在宽限期内先返回旧值，同时后台刷新（stale-while-revalidate）
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class _InFlight:
+    """一次正在进行的加载"""
+    __slots__ = ("event", "value")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+class SingleFlightCache:
+    """
+    单飞 + LRU 缓存
+
+    参数:
+        ttl: 新鲜期(秒)，期内直接命中
+        maxsize: 最大条目数，超出按最近最少使用淘汰
+        stale_ttl: 过期后的宽限期(秒)，期内返回旧值并在后台刷新；0表示不启用
+
+    加载函数返回None表示加载失败：结果不缓存，等待中的调用方同样拿到None
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 512, stale_ttl: float = 0):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._inflight = {}  # key -> _InFlight
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,          # 新鲜命中
+            "stale_hits": 0,    # 返回旧值（后台刷新）
+            "misses": 0,        # 未命中，由本调用方加载
+            "coalesced": 0,     # 未命中，但合并到已在进行的加载
+            "loads": 0,         # 实际执行的加载次数（含后台刷新）
+            "load_failures": 0, # 加载返回None或抛异常
+            "refreshes": 0,     # 后台刷新次数
+            "evictions": 0,     # LRU淘汰次数
+        }
+
+    def get_or_load(self, key: Hashable, loader: Callable):
+        """获取缓存值，未命中时加载；同一key的并发调用只加载一次"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self._data.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._inflight:
+                        self._start_refresh(key, loader)
+                    return value
+
+            call = self._inflight.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._inflight[key] = _InFlight()
+                self._stats["misses"] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            return call.value
+        return self._load(key, loader, call)
+
+    def _start_refresh(self, key, loader):
+        """后台刷新（调用方需持有锁）"""
+        call = self._inflight[key] = _InFlight()
+        self._stats["refreshes"] += 1
+        threading.Thread(
+            target=self._load, args=(key, loader, call), daemon=True,
+            name=f"cache-refresh-{key}",
+        ).start()
+
+    def _load(self, key, loader, call: _InFlight):
+        value = None
+        try:
+            value = loader()
+        except Exception as e:
+            print(f"缓存加载失败 {key}: {e}")
+        finally:
+            with self._lock:
+                self._stats["loads"] += 1
+                if value is None:
+                    self._stats["load_failures"] += 1
+                else:
+                    self._store(key, value)
+                self._inflight.pop(key, None)
+            call.value = value
+            call.event.set()
+        return value
+
+    def _store(self, key, value):
+        """写入并按LRU淘汰（调用方需持有锁）"""
+        self._data[key] = (value, time.time())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def set(self, key: Hashable, value):
+        with self._lock:
+            self._store(key, value)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._data)
+            stats["maxsize"] = self.maxsize
+            stats["inflight"] = len(self._inflight)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups * 100, 1) if lookups else 0
+        return stats
@@ -4,9 +4,51 @@ import os
 # 并发配置
 MAX_WORKERS = 15  # 最大并发线程数
 REQUEST_TIMEOUT = 10  # 请求超时时间(秒)
+FETCH_CONCURRENCY = MAX_WORKERS * 2  # 题材抓取同时在途的最大请求数（成分股+K线+资金流向）
+FETCH_DEADLINE = 20  # 题材抓取总时限(秒)，超时的请求按失败处理
+
+# HTTP连接池配置
+HTTP_POOL_HOSTS = 10  # 缓存连接池的host数量（东财push2/push2his、新浪、同花顺等）
+HTTP_POOL_SIZE = FETCH_CONCURRENCY  # 每个host保持的keep-alive连接数，与并发请求数一致
+HTTP_RETRY_TOTAL = 2  # 失败重试次数（连接错误、5xx、429）
+HTTP_RETRY_BACKOFF = 0.3  # 重试退避系数(秒)，依次等待 0.3s、0.6s...
 
 # 缓存配置
 CACHE_EXPIRE_SECONDS = 300  # 缓存过期时间5分钟
+CACHE_STALE_SECONDS = 300  # 过期后的宽限期：期内先返回旧数据，后台刷新
+CACHE_MAX_ENTRIES = 512  # 题材缓存最大条目数（LRU淘汰）
+SNAPSHOT_REFRESH_SECONDS = 60  # /api/all 快照在交易时段的重建间隔(秒)
+
+# 接口响应配置
+COMPRESS_MIN_BYTES = 1024  # 超过该大小的响应做gzip/brotli压缩
+COMPRESS_CACHE_ENTRIES = 64  # 压缩结果缓存条目数（按内容哈希，LRU淘汰）
+HISTORY_MAX_AGE = 86400  # 历史日期报表的浏览器缓存时间(秒)，过期后凭ETag校验
+
+# 数据库配置（SQLite连接池，WAL模式）
+DB_POOL_SIZE = 8  # 连接池保留的空闲连接数
+DB_BUSY_TIMEOUT_MS = 5000  # 等待写锁的最长时间(毫秒)
+DB_CACHE_SIZE_KB = 16384  # 每个连接的页缓存(KB)
+DB_MMAP_SIZE = 256 * 1024 * 1024  # 内存映射读取的最大字节数
+REPORT_CACHE_SIZE = 60  # 历史报表缓存条目数（LRU淘汰）
+REPORT_PREWARM_DAYS = 10  # 启动时预热最近N个交易日的报表缓存
+
+# 全市场扫描配置
+FULL_MARKET_SCAN = False  # 开启后分页拉取沪深主板行情和全部概念板块，成分股由本地板块成分表拼装，评分全部成分股
+MARKET_PAGE_SIZE = 100  # 分页接口每页条数（东方财富clist单页上限）
+
+# 批量行情配置（收益跟踪）
+BATCH_PRICE_CHUNK_SIZE = 100  # 批量行情接口每次请求的股票数
+BATCH_PRICE_RETRIES = 2  # 失败分组的重试轮数（只重试失败的分组）
+
+# 新闻存储配置
+NEWS_LOOKBACK_DAYS = 3  # 题材匹配新闻的回看天数（检索本地新闻库）
+NEWS_RETENTION_DAYS = 30  # 本地新闻保留天数
+NEWS_SEARCH_LIMIT = 500  # 单次检索最多返回的候选新闻数
+NEWS_POLL_SECONDS = 60  # 新闻增量采集的最短间隔(秒)
+NEWS_POLL_PAGE_SIZE = 10  # 增量采集每个来源先取的条数（整页都是新消息时再取 NEWS_PAGE_SIZE 条补齐）
+NEWS_PAGE_SIZE = 30  # 每个来源单次最多取的条数（首次采集）
+THEME_KEYWORD_CACHE_SIZE = 256  # 题材关键词缓存条目数（按题材+成分股，LRU淘汰）
+NEWS_DUP_THRESHOLD = 0.75  # 近似去重阈值：字符2-gram Jaccard相似度达到该值的新闻视为同一条
 
 # 每个题材推荐股票数量
 STOCKS_PER_THEME = 3
@@ -1,21 +1,184 @@
 # 数据库模块 - SQLite存储推荐报表和收益跟踪
 import sqlite3
 import os
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, date
 from typing import List, Dict, Optional
 import json
 
+from config import (
+    DB_POOL_SIZE, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, REPORT_CACHE_SIZE, REPORT_PREWARM_DAYS,
+)
+from trading_calendar import offset_trading_day
+
 # 数据库文件路径
 DB_PATH = os.path.join(os.path.dirname(__file__), "ticai.db")
 
 
-def get_connection():
-    """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH)
+# ==================== 连接池 ====================
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    """
+    打开新连接并设置 pragma
+    WAL模式下读不阻塞写、写不阻塞读；synchronous=NORMAL 在WAL下仍保证数据库一致
+    """
+    conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
     conn.row_factory = sqlite3.Row  # 返回字典格式
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store = MEMORY")
     return conn
 
 
+class PooledConnection:
+    """
+    连接池中借出的连接
+    用法与 sqlite3.Connection 相同，close() 把连接归还连接池而不是关闭；
+    with 语句块结束时提交（异常时回滚），不归还连接
+    """
+    __slots__ = ("_conn", "_pool")
+
+    def __init__(self, conn: sqlite3.Connection, pool: "ConnectionPool"):
+        self._conn = conn
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+        return False
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """
+    SQLite连接池（按数据库路径）
+    空闲连接放在LIFO队列中复用，池空时直接新建，不会等待；
+    归还时超过 max_idle 的连接直接关闭
+    """
+
+    def __init__(self, path: str, max_idle: int = DB_POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+        self._stats_lock = threading.Lock()
+        self._stats = {"opened": 0, "reused": 0, "closed": 0}
+
+    def acquire(self) -> PooledConnection:
+        try:
+            conn = self._idle.get_nowait()
+            self._count("reused")
+        except queue.Empty:
+            conn = _open_connection(self.path)
+            self._count("opened")
+        return PooledConnection(conn, self)
+
+    def release(self, conn: sqlite3.Connection):
+        # 未提交的事务回滚，保证下一个使用者拿到干净的连接
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            self._count("closed")
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+            self._count("closed")
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["idle"] = self._idle.qsize()
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# 历史报表缓存：(数据库路径, 日期) -> 组装好的报表
+_report_cache = OrderedDict()
+_report_cache_lock = threading.Lock()
+_report_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _get_pool() -> ConnectionPool:
+    """当前 DB_PATH 对应的连接池（DB_PATH 改变后自动使用新的连接池）"""
+    pool = _pools.get(DB_PATH)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(DB_PATH, ConnectionPool(DB_PATH))
+    return pool
+
+
+def get_connection() -> PooledConnection:
+    """从连接池获取数据库连接，用完调用 close() 归还"""
+    return _get_pool().acquire()
+
+
+def get_pool_stats() -> dict:
+    """连接池统计：新建、复用、关闭的连接数和当前空闲数"""
+    return _get_pool().stats()
+
+
+@contextmanager
+def connection():
+    """
+    借用连接，块结束时自动归还
+    
+    用法:
+        with connection() as conn:
+            rows = conn.execute(...).fetchall()
+    """
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transaction():
+    """
+    事务：块正常结束时提交，抛出异常时回滚，并归还连接
+    
+    用法:
+        with transaction() as conn:
+            conn.execute(...)
+    """
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 def migrate_database():
     """
     数据库迁移 - 为旧表添加新字段
@@ -42,10 +205,220 @@ def migrate_database():
             except Exception as e:
                 print(f"添加字段 {col_name} 失败: {e}")
     
+    # 收益跟踪表：当日开盘价（K线回填时写入）
+    cursor.execute("PRAGMA table_info(performance)")
+    perf_columns = [col[1] for col in cursor.fetchall()]
+    if perf_columns and "open_price" not in perf_columns:
+        try:
+            cursor.execute("ALTER TABLE performance ADD COLUMN open_price REAL")
+            print("✅ 已添加字段: open_price")
+        except Exception as e:
+            print(f"添加字段 open_price 失败: {e}")
+    
+    # 推荐股票按 (报表, 题材, 代码) 唯一，save_report 据此原地更新
+    if columns:
+        create_stock_unique_index(cursor)
+        create_performance_index(cursor)
+        
+        # 收益汇总表：旧库首次升级（汇总表为空）时按已有数据全量生成
+        create_performance_rollup_table(cursor)
+        cursor.execute('SELECT 1 FROM performance_rollup LIMIT 1')
+        if cursor.fetchone() is None:
+            cursor.execute('SELECT report_date FROM reports')
+            report_dates = [row[0] for row in cursor.fetchall()]
+            if report_dates:
+                _refresh_rollup(cursor, report_dates)
+                print(f"✅ 已生成收益汇总: {len(report_dates)}天")
+    
+    # 新增的表（旧库升级时创建）
+    create_market_data_tables(cursor)
+    create_news_tables(cursor)
+    
     conn.commit()
     conn.close()
 
 
+def create_stock_unique_index(cursor):
+    """
+    为 recommended_stocks 建立 (report_id, theme_name, stock_code) 唯一索引
+    旧库中的重复记录先合并：保留id最小的一条，收益记录转到保留的记录上
+    """
+    cursor.execute('''
+        SELECT rs.id, keep.id AS keep_id
+        FROM recommended_stocks rs
+        JOIN (
+            SELECT MIN(id) AS id, report_id, theme_name, stock_code
+            FROM recommended_stocks
+            GROUP BY report_id, theme_name, stock_code
+            HAVING COUNT(*) > 1
+        ) keep ON rs.report_id = keep.report_id
+              AND rs.theme_name = keep.theme_name
+              AND rs.stock_code = keep.stock_code
+              AND rs.id <> keep.id
+    ''')
+    duplicates = [(row[1], row[0]) for row in cursor.fetchall()]
+    if duplicates:
+        cursor.executemany('UPDATE OR IGNORE performance SET stock_id = ? WHERE stock_id = ?', duplicates)
+        cursor.executemany('DELETE FROM performance WHERE stock_id = ?', [(dup,) for _, dup in duplicates])
+        cursor.executemany('DELETE FROM recommended_stocks WHERE id = ?', [(dup,) for _, dup in duplicates])
+        print(f"✅ 已合并重复推荐记录: {len(duplicates)}条")
+    
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_stocks_report_theme_code
+        ON recommended_stocks(report_id, theme_name, stock_code)
+    ''')
+
+
+def create_performance_index(cursor):
+    """收益统计的覆盖索引：按股票取各持有天数的最新收益，不需要回表"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_performance_stock_days
+        ON performance(stock_id, days_held, track_date, return_pct)
+    ''')
+
+
+def create_performance_rollup_table(cursor):
+    """收益汇总表（见 _refresh_rollup）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS performance_rollup (
+            report_date DATE NOT NULL,
+            is_buyable INTEGER NOT NULL,
+            dimension TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            days_held INTEGER NOT NULL,
+            count INTEGER DEFAULT 0,
+            win_count INTEGER DEFAULT 0,
+            sum_return REAL DEFAULT 0,
+            max_return REAL,
+            min_return REAL,
+            PRIMARY KEY (report_date, is_buyable, dimension, bucket, days_held)
+        ) WITHOUT ROWID
+    ''')
+
+
+def create_market_data_tables(cursor):
+    """
+    行情数据本地存储表（见 kline_store）
+    
+    1. klines - 日K线，按 (secid, 复权方式, 日期) 存储
+    2. fund_flows - 日资金流向
+    3. kline_sync - 每个secid各序列的同步状态（含板块成分 series=members）
+    4. board_members - 板块成分股（见 market_scan，每日刷新）
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS klines (
+            secid TEXT NOT NULL,
+            fqt INTEGER NOT NULL,
+            trade_date TEXT NOT NULL,
+            open REAL,
+            close REAL,
+            high REAL,
+            low REAL,
+            volume REAL,
+            amount REAL,
+            amplitude REAL,
+            change_pct REAL,
+            change_amt REAL,
+            turnover REAL,
+            PRIMARY KEY (secid, fqt, trade_date)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fund_flows (
+            secid TEXT NOT NULL,
+            trade_date TEXT NOT NULL,
+            main_inflow REAL,
+            small_inflow REAL,
+            medium_inflow REAL,
+            large_inflow REAL,
+            super_inflow REAL,
+            PRIMARY KEY (secid, trade_date)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kline_sync (
+            secid TEXT NOT NULL,
+            series TEXT NOT NULL,
+            name TEXT,
+            complete INTEGER DEFAULT 0,
+            synced_at TIMESTAMP,
+            PRIMARY KEY (secid, series)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS board_members (
+            board_code TEXT NOT NULL,
+            stock_code TEXT NOT NULL,
+            PRIMARY KEY (board_code, stock_code)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_board_members_stock ON board_members(stock_code)')
+
+
+def create_news_tables(cursor):
+    """
+    新闻本地存储表（见 news_store）
+    
+    1. news_articles - 新闻正文，按 uid（标题摘要）去重
+    2. news_fts - news_articles 的 FTS5 全文索引（trigram分词，支持中文子串检索），由触发器同步；
+       SQLite未编译FTS5时不创建，检索退化为 LIKE
+    3. news_cursors - 每个新闻来源的增量采集游标（见 news_ingest）
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS news_articles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid TEXT NOT NULL UNIQUE,
+            source TEXT,
+            title TEXT,
+            content TEXT,
+            time TEXT,
+            published_at REAL NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_published ON news_articles(published_at)')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS news_cursors (
+            source TEXT PRIMARY KEY,
+            last_published REAL,
+            last_uids TEXT,
+            polled_at REAL
+        )
+    ''')
+    
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+                title, content,
+                content='news_articles', content_rowid='id',
+                tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ SQLite不支持FTS5 trigram，新闻检索使用LIKE: {e}")
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS news_articles_ai AFTER INSERT ON news_articles BEGIN
+            INSERT INTO news_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS news_articles_ad AFTER DELETE ON news_articles BEGIN
+            INSERT INTO news_fts (news_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS news_articles_au AFTER UPDATE ON news_articles BEGIN
+            INSERT INTO news_fts (news_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO news_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    ''')
+
+
 def init_database():
     """
     初始化数据库表结构
@@ -54,6 +427,9 @@ def init_database():
     1. reports - 每日推荐报表
     2. recommended_stocks - 推荐的股票详情
     3. performance - 收益跟踪记录
+    3.1 performance_rollup - 按报表日期×维度×持有天数的收益汇总
+    4. klines / fund_flows / kline_sync / board_members - 行情数据本地存储
+    5. news_articles / news_fts - 新闻本地存储与全文索引
     """
     conn = get_connection()
     cursor = conn.cursor()
@@ -110,6 +486,7 @@ def init_database():
             current_price REAL,
             return_pct REAL,
             is_trading_day INTEGER DEFAULT 1,
+            open_price REAL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (stock_id) REFERENCES recommended_stocks(id),
             UNIQUE(stock_id, track_date)
@@ -122,6 +499,14 @@ def init_database():
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_stocks_code ON recommended_stocks(stock_code)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_performance_stock ON performance(stock_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_performance_date ON performance(track_date)')
+    create_performance_index(cursor)
+    
+    # 收益汇总表
+    create_performance_rollup_table(cursor)
+    
+    # 行情数据本地存储
+    create_market_data_tables(cursor)
+    create_news_tables(cursor)
     
     conn.commit()
     conn.close()
@@ -132,115 +517,176 @@ def init_database():
     print("✅ 数据库初始化完成")
 
 
-def save_report(report_date: date, market_change: float, themes_data: Dict) -> int:
+# recommended_stocks 写入的字段（不含 report_id）
+STOCK_RECORD_COLUMNS = [
+    "theme_name", "stock_code", "stock_name", "recommend_price", "change_pct", "score",
+    "role", "role_reason", "signal", "volume_level", "strength", "is_weak_to_strong",
+    "is_front_runner", "front_runner_tags", "market_cap", "amount", "turnover_rate",
+    "open_change", "is_buyable", "unbuyable_reason",
+]
+
+
+def check_buyable(open_change: float, change_pct: float) -> tuple:
+    """
+    判断是否可买入（排除买不到的情况）
+    返回: (is_buyable, unbuyable_reason)
     """
-    保存每日推荐报表
+    # 情况1：一字涨停（开盘涨幅>=9.5%，基本买不到）
+    if open_change >= 9.5:
+        return 0, "一字涨停"
+    # 情况2：竞价涨停（开盘涨幅>=7%且当前涨停，很难买到）
+    if open_change >= 7 and change_pct >= 9.9:
+        return 0, "竞价涨停"
+    # 情况3：早盘秒板（开盘涨幅>=5%且很快涨停，难买）
+    if open_change >= 5 and change_pct >= 9.9:
+        return 0, "高开秒板"
+    return 1, ""
+
+
+def _parse_number(text, units: dict = None) -> float:
+    """从显示字符串中解析数值，如 "12.34" / "3.2%" / "2.88亿" """
+    if isinstance(text, (int, float)):
+        return text
+    if not text or text == "-":
+        return 0
+    text = str(text).replace("%", "")
+    multiplier = 1
+    for unit, value in (units or {}).items():
+        if text.endswith(unit):
+            text, multiplier = text[:-len(unit)], value
+            break
+    try:
+        return float(text) * multiplier
+    except ValueError:
+        return 0
+
+
+def _display_to_record(stock: Dict) -> Dict:
+    """旧格式：从 /api/all 的显示数据中解析出数值记录"""
+    units = {"亿": 100000000, "万": 10000}
+    return {
+        "code": stock.get("code", ""),
+        "name": stock.get("name", ""),
+        "price": _parse_number(stock.get("price", "0")),
+        "change_pct": stock.get("change_pct_num", 0) or 0,
+        "score": stock.get("score", 0),
+        "role": stock.get("role", ""),
+        "role_reason": stock.get("role_reason", ""),
+        "signal": stock.get("signal", ""),
+        "volume_level": stock.get("volume_level", ""),
+        "strength": stock.get("strength", ""),
+        "is_weak_to_strong": stock.get("is_weak_to_strong"),
+        "is_front_runner": stock.get("is_front_runner"),
+        "front_runner_tags": stock.get("front_runner_tags", []),
+        "market_cap": _parse_number(stock.get("market_cap", 0), units),
+        "amount": _parse_number(stock.get("amount", 0), units),
+        "turnover_rate": _parse_number(stock.get("turnover_rate", "0%")),
+        "open_change": stock.get("open_change", 0) or 0,
+    }
+
+
+def _record_to_row(theme_name: str, record: Dict) -> tuple:
+    """数值记录转为 recommended_stocks 行（字段顺序同 STOCK_RECORD_COLUMNS）"""
+    change_pct = record.get("change_pct", 0) or 0
+    open_change = record.get("open_change", 0) or 0
+    is_buyable, unbuyable_reason = check_buyable(open_change, change_pct)
+    return (
+        theme_name,
+        record.get("code", ""),
+        record.get("name", ""),
+        record.get("price", 0) or 0,
+        change_pct,
+        record.get("score", 0),
+        record.get("role", ""),
+        record.get("role_reason", ""),
+        record.get("signal", ""),
+        record.get("volume_level", ""),
+        record.get("strength", ""),
+        1 if record.get("is_weak_to_strong") else 0,
+        1 if record.get("is_front_runner") else 0,
+        json.dumps(record.get("front_runner_tags", []), ensure_ascii=False),
+        record.get("market_cap", 0) or 0,
+        record.get("amount", 0) or 0,
+        record.get("turnover_rate", 0) or 0,
+        open_change,
+        is_buyable,
+        unbuyable_reason,
+    )
+
+
+def save_report(report_date: date, market_change: float, themes_data: Dict,
+                stock_records: Dict[str, List[Dict]] = None) -> int:
+    """
+    保存每日推荐报表（幂等：同一天重复保存按 (日期, 题材, 代码) 更新）
+    
+    已存在的推荐股票原地更新、保留id，已有的收益跟踪记录继续关联；
+    本次不再推荐的股票连同其收益记录一起删除
     
     参数:
         report_date: 报表日期
         market_change: 大盘涨跌幅
         themes_data: 题材数据（从/api/all返回的数据）
+        stock_records: {题材: [数值记录]}（analyzer.AnalyzedStock.to_record()），
+                       不传则从 themes_data 的显示数据中解析
     
     返回:
         report_id: 报表ID
     """
+    if stock_records is None:
+        stock_records = {
+            theme_name: [_display_to_record(s) for s in theme_data.get("stocks", [])]
+            for theme_name, theme_data in themes_data.items()
+        }
+    rows = [
+        _record_to_row(theme_name, record)
+        for theme_name, records in stock_records.items()
+        for record in records
+    ]
+    
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
         # 计算统计数据
         themes_count = len(themes_data)
-        stocks_count = sum(len(t.get("stocks", [])) for t in themes_data.values())
+        stocks_count = len(rows)
         
-        # 插入或更新报表记录
+        # 插入或更新报表记录（更新时保留id）
         cursor.execute('''
-            INSERT OR REPLACE INTO reports (report_date, market_change, themes_count, stocks_count)
+            INSERT INTO reports (report_date, market_change, themes_count, stocks_count)
             VALUES (?, ?, ?, ?)
+            ON CONFLICT(report_date) DO UPDATE SET
+                market_change = excluded.market_change,
+                themes_count = excluded.themes_count,
+                stocks_count = excluded.stocks_count
         ''', (report_date, market_change, themes_count, stocks_count))
+        cursor.execute('SELECT id FROM reports WHERE report_date = ?', (report_date,))
+        report_id = cursor.fetchone()['id']
         
-        report_id = cursor.lastrowid
+        # 删除本次不再推荐的股票及其收益记录
+        keep = {(row[0], row[1]) for row in rows}
+        cursor.execute(
+            'SELECT id, theme_name, stock_code FROM recommended_stocks WHERE report_id = ?',
+            (report_id,),
+        )
+        dropped = [(r['id'],) for r in cursor.fetchall() if (r['theme_name'], r['stock_code']) not in keep]
+        if dropped:
+            cursor.executemany('DELETE FROM performance WHERE stock_id = ?', dropped)
+            cursor.executemany('DELETE FROM recommended_stocks WHERE id = ?', dropped)
         
-        # 如果是更新，先删除旧的股票记录
-        cursor.execute('SELECT id FROM reports WHERE report_date = ?', (report_date,))
-        row = cursor.fetchone()
-        if row:
-            report_id = row['id']
-            cursor.execute('DELETE FROM recommended_stocks WHERE report_id = ?', (report_id,))
+        # 批量写入推荐股票
+        updates = ", ".join(f"{col} = excluded.{col}" for col in STOCK_RECORD_COLUMNS[2:])
+        cursor.executemany(f'''
+            INSERT INTO recommended_stocks (report_id, {", ".join(STOCK_RECORD_COLUMNS)})
+            VALUES (?, {", ".join("?" * len(STOCK_RECORD_COLUMNS))})
+            ON CONFLICT(report_id, theme_name, stock_code) DO UPDATE SET {updates}
+        ''', [(report_id,) + row for row in rows])
         
-        # 保存推荐股票
-        for theme_name, theme_data in themes_data.items():
-            stocks = theme_data.get("stocks", [])
-            for stock in stocks:
-                # 提取价格数值
-                price_str = stock.get("price", "0")
-                try:
-                    price = float(price_str) if price_str and price_str != "-" else 0
-                except:
-                    price = 0
-                
-                # 提取涨跌幅数值
-                change_pct = stock.get("change_pct_num", 0) or 0
-                
-                # 提取换手率数值
-                turnover_str = stock.get("turnover_rate", "0%")
-                try:
-                    turnover = float(turnover_str.replace("%", "")) if turnover_str else 0
-                except:
-                    turnover = 0
-                
-                # 提取开盘涨幅（用于判断是否可买入）
-                open_change = stock.get("open_change", 0) or 0
-                
-                # 判断是否可买入（排除买不到的情况）
-                is_buyable = 1
-                unbuyable_reason = ""
-                
-                # 情况1：一字涨停（开盘涨幅>=9.5%，基本买不到）
-                if open_change >= 9.5:
-                    is_buyable = 0
-                    unbuyable_reason = "一字涨停"
-                # 情况2：竞价涨停（开盘涨幅>=7%且当前涨停，很难买到）
-                elif open_change >= 7 and change_pct >= 9.9:
-                    is_buyable = 0
-                    unbuyable_reason = "竞价涨停"
-                # 情况3：早盘秒板（开盘涨幅>=5%且很快涨停，难买）
-                elif open_change >= 5 and change_pct >= 9.9:
-                    is_buyable = 0
-                    unbuyable_reason = "高开秒板"
-                
-                cursor.execute('''
-                    INSERT INTO recommended_stocks (
-                        report_id, theme_name, stock_code, stock_name,
-                        recommend_price, change_pct, score, role, role_reason,
-                        signal, volume_level, strength, is_weak_to_strong,
-                        is_front_runner, front_runner_tags, market_cap, amount, turnover_rate,
-                        open_change, is_buyable, unbuyable_reason
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    report_id,
-                    theme_name,
-                    stock.get("code", ""),
-                    stock.get("name", ""),
-                    price,
-                    change_pct,
-                    stock.get("score", 0),
-                    stock.get("role", ""),
-                    stock.get("role_reason", ""),
-                    stock.get("signal", ""),
-                    stock.get("volume_level", ""),
-                    stock.get("strength", ""),
-                    1 if stock.get("is_weak_to_strong") else 0,
-                    1 if stock.get("is_front_runner") else 0,
-                    json.dumps(stock.get("front_runner_tags", []), ensure_ascii=False),
-                    stock.get("market_cap", 0) or 0,
-                    stock.get("amount", 0) or 0,
-                    turnover,
-                    open_change,
-                    is_buyable,
-                    unbuyable_reason
-                ))
+        # 推荐股票变化后重算当天的收益汇总
+        _refresh_rollup(cursor, [report_date])
         
         conn.commit()
+        invalidate_report_cache(report_date)
         print(f"✅ 报表保存成功: {report_date}, 共{themes_count}个题材, {stocks_count}只股票")
         return report_id
         
@@ -252,16 +698,12 @@ def save_report(report_date: date, market_change: float, themes_data: Dict) -> i
         conn.close()
 
 
-def get_report_by_date(report_date: date) -> Optional[Dict]:
-    """获取指定日期的报表"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+def _load_report(cursor, report_date: date) -> Optional[Dict]:
+    """查询并组装报表（报表信息 + 推荐股票 + 按题材分组）"""
     cursor.execute('SELECT * FROM reports WHERE report_date = ?', (report_date,))
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         return None
     
     report = dict(row)
@@ -284,10 +726,70 @@ def get_report_by_date(report_date: date) -> Optional[Dict]:
         themes[theme_name].append(stock)
     report['themes'] = themes
     
-    conn.close()
     return report
 
 
+def get_report_by_date(report_date: date) -> Optional[Dict]:
+    """
+    获取指定日期的报表
+    今天之前的报表收盘后不再变化，组装好的结果放入LRU缓存（只读，调用方不要修改），
+    save_report 重写该日期时失效
+    """
+    if report_date >= date.today():
+        with connection() as conn:
+            return _load_report(conn.cursor(), report_date)
+    
+    key = (DB_PATH, str(report_date))
+    with _report_cache_lock:
+        report = _report_cache.get(key)
+        if report is not None:
+            _report_cache.move_to_end(key)
+            _report_cache_stats["hits"] += 1
+            return report
+        _report_cache_stats["misses"] += 1
+        generation = _report_cache_stats["invalidations"]
+    
+    with connection() as conn:
+        report = _load_report(conn.cursor(), report_date)
+    
+    with _report_cache_lock:
+        # 查询期间有报表被重写时不缓存（可能读到旧数据）
+        if report is not None and generation == _report_cache_stats["invalidations"]:
+            _report_cache[key] = report
+            while len(_report_cache) > REPORT_CACHE_SIZE:
+                _report_cache.popitem(last=False)
+    return report
+
+
+def invalidate_report_cache(report_date: date = None):
+    """报表缓存失效（不传日期时清空）"""
+    with _report_cache_lock:
+        _report_cache_stats["invalidations"] += 1
+        if report_date is None:
+            _report_cache.clear()
+        else:
+            _report_cache.pop((DB_PATH, str(report_date)), None)
+
+
+def prewarm_report_cache(days: int = REPORT_PREWARM_DAYS) -> int:
+    """预热最近 days 个交易日（不含今天）的报表缓存，返回缓存的报表数"""
+    count = 0
+    try:
+        for i in range(1, days + 1):
+            if get_report_by_date(offset_trading_day(date.today(), -i)) is not None:
+                count += 1
+        print(f"✅ 报表缓存预热完成: 最近{days}个交易日, {count}份报表")
+    except Exception as e:
+        print(f"⚠️ 报表缓存预热失败: {e}")
+    return count
+
+
+def get_report_cache_stats() -> dict:
+    """报表缓存统计：命中、未命中、失效次数和当前条目数"""
+    with _report_cache_lock:
+        return dict(_report_cache_stats, entries=len(_report_cache))
+
+
 def get_recent_reports(limit: int = 30) -> List[Dict]:
     """获取最近的报表列表"""
     conn = get_connection()
@@ -307,12 +809,13 @@ def get_recent_reports(limit: int = 30) -> List[Dict]:
 def get_stocks_for_tracking(days_ago: int = 5, only_buyable: bool = True) -> List[Dict]:
     """
     获取需要跟踪收益的股票
-    获取最近N天推荐的股票，用于更新收益
+    获取最近N个交易日推荐的股票，用于更新收益
     
     参数:
-        days_ago: 获取最近多少天的数据
+        days_ago: 获取最近多少个交易日的数据（按交易日历，节假日不占名额）
         only_buyable: 是否只返回可买入的股票（排除一字板等买不到的）
     """
+    since = offset_trading_day(date.today(), -days_ago).isoformat()
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -321,43 +824,123 @@ def get_stocks_for_tracking(days_ago: int = 5, only_buyable: bool = True) -> Lis
             SELECT rs.*, r.report_date
             FROM recommended_stocks rs
             JOIN reports r ON rs.report_id = r.id
-            WHERE r.report_date >= date('now', ? || ' days')
+            WHERE r.report_date >= ?
               AND rs.is_buyable = 1
             ORDER BY r.report_date DESC
-        ''', (-days_ago,))
+        ''', (since,))
     else:
         cursor.execute('''
             SELECT rs.*, r.report_date
             FROM recommended_stocks rs
             JOIN reports r ON rs.report_id = r.id
-            WHERE r.report_date >= date('now', ? || ' days')
+            WHERE r.report_date >= ?
             ORDER BY r.report_date DESC
-        ''', (-days_ago,))
+        ''', (since,))
     
     stocks = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return stocks
 
 
+def save_performance_batch(rows: List[Dict], refresh_rollup: bool = True) -> Dict:
+    """
+    批量保存收益跟踪记录（一个事务，按 (stock_id, track_date) 幂等写入）
+    
+    参数:
+        rows: [{stock_id, track_date, days_held, current_price, return_pct,
+                is_trading_day(可选，默认True), open_price(可选，为空时保留已有值)}]
+        refresh_rollup: 是否同时重算涉及报表日期的收益汇总
+    
+    返回:
+        {"inserted": 新增条数, "updated": 数值有变化而更新的条数}
+    """
+    params = [
+        (
+            r["stock_id"], r["track_date"], r["days_held"], r["current_price"], r["return_pct"],
+            1 if r.get("is_trading_day", True) else 0, r.get("open_price"),
+        )
+        for r in rows
+    ]
+    # 同一 (stock_id, track_date) 出现多次时以最后一条为准
+    params = list({(p[0], str(p[1])): p for p in params}.values())
+    result = {"inserted": 0, "updated": 0}
+    if not params:
+        return result
+    
+    with transaction() as conn:
+        cursor = conn.cursor()
+        
+        # 读出已有记录，区分新增/有变化/未变化
+        stock_ids = sorted({p[0] for p in params})
+        existing = {}
+        # 分段查询，避免超过SQL参数个数上限
+        for i in range(0, len(stock_ids), 500):
+            chunk = stock_ids[i:i + 500]
+            cursor.execute(f'''
+                SELECT stock_id, track_date, days_held, current_price, return_pct, is_trading_day, open_price
+                FROM performance
+                WHERE stock_id IN ({", ".join("?" * len(chunk))})
+            ''', chunk)
+            for row in cursor.fetchall():
+                existing[(row[0], row[1])] = tuple(row[2:])
+        
+        inserts, updates = [], []
+        for p in params:
+            old = existing.get((p[0], str(p[1])))
+            if old is None:
+                inserts.append(p)
+                continue
+            if p[6] is None:
+                p = p[:6] + (old[4],)
+            if old != p[2:]:
+                updates.append(p[2:] + p[:2])
+        
+        cursor.executemany('''
+            INSERT OR IGNORE INTO performance
+            (stock_id, track_date, days_held, current_price, return_pct, is_trading_day, open_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', inserts)
+        result["inserted"] = cursor.rowcount if inserts else 0
+        
+        cursor.executemany('''
+            UPDATE performance
+            SET days_held = ?, current_price = ?, return_pct = ?, is_trading_day = ?, open_price = ?
+            WHERE stock_id = ? AND track_date = ?
+        ''', updates)
+        result["updated"] = cursor.rowcount if updates else 0
+        
+        # 只重算有变化的股票所属报表日期的收益汇总
+        changed_ids = sorted({p[0] for p in inserts} | {p[5] for p in updates})
+        if refresh_rollup and changed_ids:
+            report_dates = set()
+            for i in range(0, len(changed_ids), 500):
+                chunk = changed_ids[i:i + 500]
+                cursor.execute(f'''
+                    SELECT DISTINCT r.report_date
+                    FROM recommended_stocks rs
+                    JOIN reports r ON rs.report_id = r.id
+                    WHERE rs.id IN ({", ".join("?" * len(chunk))})
+                ''', chunk)
+                report_dates.update(row[0] for row in cursor.fetchall())
+            _refresh_rollup(cursor, report_dates)
+    
+    return result
+
+
 def save_performance(stock_id: int, track_date: date, days_held: int, 
                     current_price: float, return_pct: float, is_trading_day: bool = True):
-    """保存收益跟踪记录"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    """保存单条收益跟踪记录（批量写入见 save_performance_batch）"""
     try:
-        cursor.execute('''
-            INSERT OR REPLACE INTO performance 
-            (stock_id, track_date, days_held, current_price, return_pct, is_trading_day)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (stock_id, track_date, days_held, current_price, return_pct, 1 if is_trading_day else 0))
-        
-        conn.commit()
+        save_performance_batch([{
+            "stock_id": stock_id,
+            "track_date": track_date,
+            "days_held": days_held,
+            "current_price": current_price,
+            "return_pct": return_pct,
+            "is_trading_day": is_trading_day,
+        }])
     except Exception as e:
-        conn.rollback()
         print(f"❌ 保存收益记录失败: {e}")
-    finally:
-        conn.close()
 
 
 def get_stock_performance(stock_id: int) -> List[Dict]:
@@ -376,9 +959,139 @@ def get_stock_performance(stock_id: int) -> List[Dict]:
     return records
 
 
+# 评分区间（按展示顺序）
+SCORE_BUCKETS = ["90+强推", "80-89可买", "70-79观察", "<70弱"]
+
+# 汇总表中参与统计的持有天数；days_held=0 的 stocks 行只记录推荐股票数
+ROLLUP_DAYS = (1, 2, 3, 5)
+
+# 指定报表日期的推荐股票及各持有天数的收益（同一持有天数有多条记录时取最近跟踪日期的一条），
+# 写入连接内的临时表，后续各维度的分组统计都只扫描这张小表
+_PERFORMANCE_WINDOW_SQL = '''
+    CREATE TEMP TABLE perf_window AS
+    WITH picked AS (
+        SELECT rs.id, rs.role, rs.score, rs.volume_level, rs.strength,
+               rs.is_weak_to_strong, rs.is_front_runner, r.report_date,
+               CASE WHEN rs.is_buyable = 1 THEN 1 ELSE 0 END AS is_buyable
+        FROM recommended_stocks rs
+        JOIN reports r ON rs.report_id = r.id
+        WHERE r.report_date IN ({dates})
+    ),
+    latest AS (
+        SELECT p.stock_id, p.days_held, p.return_pct,
+               ROW_NUMBER() OVER (
+                   PARTITION BY p.stock_id, p.days_held ORDER BY p.track_date DESC
+               ) AS rn
+        FROM performance p
+        JOIN picked ON picked.id = p.stock_id
+        WHERE p.days_held IN (1, 2, 3, 5) AND p.return_pct IS NOT NULL
+    )
+    SELECT picked.*, latest.days_held, latest.return_pct
+    FROM picked
+    JOIN latest ON latest.stock_id = picked.id AND latest.rn = 1
+'''
+
+# 分组汇总列：数量, 盈利数, 收益和, 最大收益, 最小收益
+_AGGREGATES = "COUNT(*), SUM(return_pct > 0), SUM(return_pct), MAX(return_pct), MIN(return_pct)"
+
+# 各维度的分组表达式（all=不分组）
+_ROLLUP_DIMENSIONS = {
+    "all": "''",
+    "role": "COALESCE(NULLIF(role, ''), '跟风')",
+    "score": '''CASE
+        WHEN COALESCE(score, 0) >= 90 THEN '90+强推'
+        WHEN COALESCE(score, 0) >= 80 THEN '80-89可买'
+        WHEN COALESCE(score, 0) >= 70 THEN '70-79观察'
+        ELSE '<70弱' END''',
+    "volume": "COALESCE(NULLIF(volume_level, ''), '未知')",
+    "strength": "COALESCE(NULLIF(strength, ''), '未知')",
+    "weak_to_strong": "CASE WHEN is_weak_to_strong THEN '弱转强' ELSE '非弱转强' END",
+    "front_runner": "CASE WHEN is_front_runner THEN '前排强势' ELSE '普通' END",
+}
+
+
+def _refresh_rollup(cursor, report_dates: List) -> None:
+    """
+    重算指定报表日期的收益汇总（调用方负责提交）
+    
+    performance_rollup 按 (报表日期, 是否可买, 维度, 分组, 持有天数) 存储
+    数量/盈利数/收益和/最大/最小，任意统计窗口只需按日期范围把各行相加；
+    另外每天保存T+1收益最高/最低的5只股票（维度 best/worst，分组为股票id），
+    窗口内的最佳/最差股票一定在各天的前5名之中
+    """
+    dates = sorted({str(d) for d in report_dates})
+    if not dates:
+        return
+    placeholders = ", ".join("?" * len(dates))
+    
+    cursor.execute(f'DELETE FROM performance_rollup WHERE report_date IN ({placeholders})', dates)
+    cursor.execute('DROP TABLE IF EXISTS temp.perf_window')
+    cursor.execute(_PERFORMANCE_WINDOW_SQL.format(dates=placeholders), dates)
+    
+    groups = " UNION ALL ".join(
+        f"SELECT report_date, is_buyable, '{name}', {expr}, days_held, {_AGGREGATES} "
+        f"FROM perf_window GROUP BY 1, 2, 4, 5"
+        for name, expr in _ROLLUP_DIMENSIONS.items()
+    )
+    cursor.execute(f'''
+        INSERT INTO performance_rollup
+            (report_date, is_buyable, dimension, bucket, days_held,
+             count, win_count, sum_return, max_return, min_return)
+        {groups}
+    ''')
+    
+    # 每天T+1收益最高/最低的5只
+    for dimension, order in [("best", "return_pct DESC, id"), ("worst", "return_pct, id DESC")]:
+        cursor.execute(f'''
+            INSERT INTO performance_rollup
+                (report_date, is_buyable, dimension, bucket, days_held,
+                 count, win_count, sum_return, max_return, min_return)
+            SELECT report_date, is_buyable, '{dimension}', id, 1,
+                   1, return_pct > 0, return_pct, return_pct, return_pct
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY report_date, is_buyable ORDER BY {order}
+                ) AS rank
+                FROM perf_window WHERE days_held = 1
+            )
+            WHERE rank <= 5
+        ''')
+    cursor.execute('DROP TABLE perf_window')
+    
+    # 推荐股票数（含尚无收益记录的）
+    cursor.execute(f'''
+        INSERT INTO performance_rollup
+            (report_date, is_buyable, dimension, bucket, days_held,
+             count, win_count, sum_return, max_return, min_return)
+        SELECT r.report_date, CASE WHEN rs.is_buyable = 1 THEN 1 ELSE 0 END, 'stocks', '', 0,
+               COUNT(*), 0, 0, NULL, NULL
+        FROM recommended_stocks rs
+        JOIN reports r ON rs.report_id = r.id
+        WHERE r.report_date IN ({placeholders})
+        GROUP BY 1, 2
+    ''', dates)
+
+
+def refresh_performance_rollup(report_dates: List = None):
+    """
+    重算收益汇总表
+    report_dates: 需要重算的报表日期，不传则全部重建
+    """
+    try:
+        with transaction() as conn:
+            cursor = conn.cursor()
+            if report_dates is None:
+                cursor.execute('DELETE FROM performance_rollup')
+                cursor.execute('SELECT report_date FROM reports')
+                report_dates = [row['report_date'] for row in cursor.fetchall()]
+            _refresh_rollup(cursor, report_dates)
+    except Exception as e:
+        print(f"❌ 更新收益汇总失败: {e}")
+
+
 def get_performance_summary(days: int = 30, only_buyable: bool = True) -> Dict:
     """
-    获取收益统计摘要
+    获取收益统计摘要（读取 performance_rollup 汇总表）
     
     统计最近N天的推荐股票表现：
     - 总体胜率（盈利股票占比）
@@ -412,194 +1125,106 @@ def get_performance_summary(days: int = 30, only_buyable: bool = True) -> Dict:
         "unbuyable_list": [],
     }
     
-    # 获取有收益记录的股票（只统计可买入的）
-    buyable_filter = "AND rs.is_buyable = 1" if only_buyable else ""
+    buyable_filter = "AND is_buyable = 1" if only_buyable else ""
+    
+    # 按日期范围合并汇总行：(维度, 分组, 持有天数) -> (数量, 盈利数, 收益和, 最大, 最小)
     cursor.execute(f'''
-        SELECT rs.*, r.report_date,
-               p.days_held, p.return_pct, p.current_price, p.track_date
-        FROM recommended_stocks rs
-        JOIN reports r ON rs.report_id = r.id
-        LEFT JOIN performance p ON rs.id = p.stock_id
-        WHERE r.report_date >= date('now', ? || ' days')
-        {buyable_filter}
-        ORDER BY rs.id, p.days_held
+        SELECT dimension, bucket, days_held,
+               SUM(count), SUM(win_count), SUM(sum_return), MAX(max_return), MIN(min_return)
+        FROM performance_rollup
+        WHERE report_date >= date('now', ? || ' days')
+          AND dimension NOT IN ('best', 'worst')
+          {buyable_filter}
+        GROUP BY dimension, bucket, days_held
     ''', (-days,))
+    groups = {}
+    for dimension, bucket, days_held, count, wins, total, max_return, min_return in cursor.fetchall():
+        if count:
+            groups.setdefault((dimension, days_held), {})[bucket] = (count, wins, total, max_return, min_return)
     
-    rows = cursor.fetchall()
+    # 统计的股票总数（含尚无收益记录的）
+    summary["total_stocks"] = groups.get(("stocks", 0), {}).get("", (0,))[0]
     
-    # 统计数据
-    stock_returns = {}  # {stock_id: {days_held: return_pct}}
-    stock_info = {}  # {stock_id: stock_data}
-    
-    for row in rows:
-        row = dict(row)
-        stock_id = row['id']
-        
-        if stock_id not in stock_info:
-            stock_info[stock_id] = row
-            stock_returns[stock_id] = {}
-        
-        if row['days_held'] is not None:
-            stock_returns[stock_id][row['days_held']] = row['return_pct']
-    
-    summary["total_stocks"] = len(stock_info)
-    
-    # 计算各持有天数的统计
-    for days_held in [1, 2, 3, 5]:
-        returns = [sr.get(days_held, 0) for sr in stock_returns.values() if days_held in sr]
-        if returns:
+    # 各持有天数的统计
+    for days_held in ROLLUP_DAYS:
+        if "" in groups.get(("all", days_held), {}):
+            count, wins, total, max_return, min_return = groups[("all", days_held)][""]
             summary["by_days"][f"T+{days_held}"] = {
-                "count": len(returns),
-                "avg_return": round(sum(returns) / len(returns), 2),
-                "win_rate": round(len([r for r in returns if r > 0]) / len(returns) * 100, 1),
-                "max_return": round(max(returns), 2),
-                "min_return": round(min(returns), 2),
-            }
-    
-    # 按角色统计（使用T+1收益）
-    role_returns = {}
-    for stock_id, info in stock_info.items():
-        role = info.get('role', '跟风') or '跟风'
-        if role not in role_returns:
-            role_returns[role] = []
-        if 1 in stock_returns[stock_id]:
-            role_returns[role].append(stock_returns[stock_id][1])
-    
-    for role, returns in role_returns.items():
-        if returns:
-            summary["by_role"][role] = {
-                "count": len(returns),
-                "avg_return": round(sum(returns) / len(returns), 2),
-                "win_rate": round(len([r for r in returns if r > 0]) / len(returns) * 100, 1),
+                "count": count,
+                "avg_return": round(total / count, 2),
+                "win_rate": round(wins / count * 100, 1),
+                "max_return": round(max_return, 2),
+                "min_return": round(min_return, 2),
             }
     
-    # 按评分区间统计
-    score_returns = {"90+强推": [], "80-89可买": [], "70-79观察": [], "<70弱": []}
-    for stock_id, info in stock_info.items():
-        score = info.get('score', 0) or 0
-        if score >= 90:
-            key = "90+强推"
-        elif score >= 80:
-            key = "80-89可买"
-        elif score >= 70:
-            key = "70-79观察"
-        else:
-            key = "<70弱"
-        if 1 in stock_returns[stock_id]:
-            score_returns[key].append(stock_returns[stock_id][1])
-    
-    for label, returns in score_returns.items():
-        if returns:
-            summary["by_score"][label] = {
-                "count": len(returns),
-                "avg_return": round(sum(returns) / len(returns), 2),
-                "win_rate": round(len([r for r in returns if r > 0]) / len(returns) * 100, 1),
-            }
-    
-    # 按量能统计
-    volume_returns = {}
-    for stock_id, info in stock_info.items():
-        volume = info.get('volume_level', '未知') or '未知'
-        if volume not in volume_returns:
-            volume_returns[volume] = []
-        if 1 in stock_returns[stock_id]:
-            volume_returns[volume].append(stock_returns[stock_id][1])
-    
-    for volume, returns in volume_returns.items():
-        if returns:
-            summary["by_volume"][volume] = {
-                "count": len(returns),
-                "avg_return": round(sum(returns) / len(returns), 2),
-                "win_rate": round(len([r for r in returns if r > 0]) / len(returns) * 100, 1),
-            }
-    
-    # 按强度统计
-    strength_returns = {}
-    for stock_id, info in stock_info.items():
-        strength = info.get('strength', '未知') or '未知'
-        if strength not in strength_returns:
-            strength_returns[strength] = []
-        if 1 in stock_returns[stock_id]:
-            strength_returns[strength].append(stock_returns[stock_id][1])
-    
-    for strength, returns in strength_returns.items():
-        if returns:
-            summary["by_strength"][strength] = {
-                "count": len(returns),
-                "avg_return": round(sum(returns) / len(returns), 2),
-                "win_rate": round(len([r for r in returns if r > 0]) / len(returns) * 100, 1),
+    # 按角色/评分/量能/强度/弱转强/前排强度分组（使用T+1收益）
+    for dimension, key in [
+        ("role", "by_role"), ("score", "by_score"), ("volume", "by_volume"),
+        ("strength", "by_strength"), ("weak_to_strong", "by_weak_to_strong"),
+        ("front_runner", "by_front_runner"),
+    ]:
+        buckets = groups.get((dimension, 1), {})
+        if dimension == "score":
+            buckets = {label: buckets[label] for label in SCORE_BUCKETS if label in buckets}
+        for label, (count, wins, total, _, _) in buckets.items():
+            summary[key][label] = {
+                "count": count,
+                "avg_return": round(total / count, 2),
+                "win_rate": round(wins / count * 100, 1),
             }
     
-    # 弱转强 vs 非弱转强
-    weak_to_strong_returns = {"弱转强": [], "非弱转强": []}
-    for stock_id, info in stock_info.items():
-        is_wts = info.get('is_weak_to_strong', 0)
-        key = "弱转强" if is_wts else "非弱转强"
-        if 1 in stock_returns[stock_id]:
-            weak_to_strong_returns[key].append(stock_returns[stock_id][1])
-    
-    for label, returns in weak_to_strong_returns.items():
-        if returns:
-            summary["by_weak_to_strong"][label] = {
-                "count": len(returns),
-                "avg_return": round(sum(returns) / len(returns), 2),
-                "win_rate": round(len([r for r in returns if r > 0]) / len(returns) * 100, 1),
-            }
+    # 总体胜率（使用T+1收益）
+    if "" in groups.get(("all", 1), {}):
+        count, wins, total, _, _ = groups[("all", 1)][""]
+        summary["win_count"] = wins
+        summary["win_rate"] = round(wins / count * 100, 1)
+        summary["avg_return"] = round(total / count, 2)
     
-    # 前排强度 vs 普通
-    front_runner_returns = {"前排强势": [], "普通": []}
-    for stock_id, info in stock_info.items():
-        is_fr = info.get('is_front_runner', 0)
-        key = "前排强势" if is_fr else "普通"
-        if 1 in stock_returns[stock_id]:
-            front_runner_returns[key].append(stock_returns[stock_id][1])
-    
-    for label, returns in front_runner_returns.items():
-        if returns:
-            summary["by_front_runner"][label] = {
-                "count": len(returns),
-                "avg_return": round(sum(returns) / len(returns), 2),
-                "win_rate": round(len([r for r in returns if r > 0]) / len(returns) * 100, 1),
+    # 最佳和最差股票（使用T+1收益，候选为每天的前5名）
+    for dimension, order in [("best", "pr.sum_return DESC, rs.id"), ("worst", "pr.sum_return, rs.id DESC")]:
+        cursor.execute(f'''
+            SELECT rs.stock_code, rs.stock_name, rs.theme_name, rs.role, rs.recommend_price,
+                   pr.sum_return AS return_pct, pr.report_date
+            FROM performance_rollup pr
+            JOIN recommended_stocks rs ON rs.id = CAST(pr.bucket AS INTEGER)
+            WHERE pr.report_date >= date('now', ? || ' days')
+              AND pr.dimension = ?
+              {buyable_filter.replace("is_buyable", "pr.is_buyable")}
+            ORDER BY {order}
+            LIMIT 5
+        ''', (-days, dimension))
+        summary[f"{dimension}_stocks"] = [
+            {
+                "code": row["stock_code"],
+                "name": row["stock_name"],
+                "theme": row["theme_name"],
+                "role": row["role"],
+                "recommend_price": row["recommend_price"],
+                "return_pct": row["return_pct"],
+                "report_date": row["report_date"],
             }
-    
-    # 总体胜率（使用T+1收益）
-    t1_returns = [sr.get(1, 0) for sr in stock_returns.values() if 1 in sr]
-    if t1_returns:
-        summary["win_count"] = len([r for r in t1_returns if r > 0])
-        summary["win_rate"] = round(summary["win_count"] / len(t1_returns) * 100, 1)
-        summary["avg_return"] = round(sum(t1_returns) / len(t1_returns), 2)
-    
-    # 最佳和最差股票（使用T+1收益）
-    stock_t1_list = []
-    for stock_id, info in stock_info.items():
-        if 1 in stock_returns[stock_id]:
-            stock_t1_list.append({
-                "code": info['stock_code'],
-                "name": info['stock_name'],
-                "theme": info['theme_name'],
-                "role": info['role'],
-                "recommend_price": info['recommend_price'],
-                "return_pct": stock_returns[stock_id][1],
-                "report_date": info['report_date'],
-            })
-    
-    stock_t1_list.sort(key=lambda x: x['return_pct'], reverse=True)
-    summary["best_stocks"] = stock_t1_list[:5]
-    summary["worst_stocks"] = stock_t1_list[-5:][::-1] if len(stock_t1_list) >= 5 else stock_t1_list[::-1]
+            for row in cursor.fetchall()
+        ]
     
     # 统计买不到的股票
     cursor.execute('''
         SELECT rs.stock_code, rs.stock_name, rs.theme_name, rs.role,
                rs.open_change, rs.change_pct, rs.unbuyable_reason, r.report_date
-        FROM recommended_stocks rs
-        JOIN reports r ON rs.report_id = r.id
+        FROM reports r
+        JOIN recommended_stocks rs ON rs.report_id = r.id
         WHERE r.report_date >= date('now', ? || ' days')
           AND rs.is_buyable = 0
         ORDER BY r.report_date DESC
+        LIMIT 10
     ''', (-days,))
-    
     unbuyable_rows = cursor.fetchall()
-    summary["unbuyable_stocks"] = len(unbuyable_rows)
+    
+    cursor.execute('''
+        SELECT COALESCE(SUM(count), 0) FROM performance_rollup
+        WHERE report_date >= date('now', ? || ' days')
+          AND dimension = 'stocks' AND is_buyable = 0
+    ''', (-days,))
+    summary["unbuyable_stocks"] = cursor.fetchone()[0]
     summary["buyable_stocks"] = summary["total_stocks"]
     summary["total_stocks"] = summary["total_stocks"] + summary["unbuyable_stocks"]
     
@@ -615,7 +1240,7 @@ def get_performance_summary(days: int = 30, only_buyable: bool = True) -> Dict:
             "reason": row["unbuyable_reason"],
             "report_date": row["report_date"],
         }
-        for row in unbuyable_rows[:10]
+        for row in unbuyable_rows
     ]
     
     conn.close()
@@ -8,6 +8,8 @@ import schedule
 import time
 import threading
 
+from trading_calendar import run_on_trading_day
+
 # 飞书Webhook地址
 FEISHU_WEBHOOK_URL = "https://open.feishu.cn/open-apis/bot/v2/hook/4dbfb98d-927c-4937-b513-c82605b75c15"
 
@@ -230,12 +232,12 @@ def start_scheduler():
     # 清除旧任务
     schedule.clear()
     
-    # 每天11:00推送（午盘）
-    schedule.every().day.at("11:00").do(push_daily_stock_report)
-    # 每天20:00推送（收盘总结）
-    schedule.every().day.at("20:00").do(push_daily_stock_report)
+    # 交易日11:00推送（午盘）
+    schedule.every().day.at("11:00").do(run_on_trading_day, push_daily_stock_report)
+    # 交易日20:00推送（收盘总结）
+    schedule.every().day.at("20:00").do(run_on_trading_day, push_daily_stock_report)
     
-    print(f"📅 定时任务已设置: 11:00、20:00 推送股票日报")
+    print(f"📅 定时任务已设置: 交易日 11:00、20:00 推送股票日报")
     print(f"📅 当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     def run_scheduler():
@@ -0,0 +1,155 @@
+# HTTP客户端模块 - 东方财富/新浪/同花顺共用的连接池会话
+# 所有行情、新闻请求统一走这里，复用 keep-alive 连接，省去每次请求的 TCP/DNS 握手
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    REQUEST_TIMEOUT, HTTP_POOL_HOSTS, HTTP_POOL_SIZE,
+    HTTP_RETRY_TOTAL, HTTP_RETRY_BACKOFF,
+)
+
+# 默认请求头
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+# 每个host的请求统计 {host: {...}}
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    """创建带连接池和重试策略的会话"""
+    retry = Retry(
+        total=HTTP_RETRY_TOTAL,
+        connect=HTTP_RETRY_TOTAL,
+        read=HTTP_RETRY_TOTAL,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    # pool_connections: 缓存多少个host的连接池；pool_maxsize: 每个host保持的连接数
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=retry,
+        pool_block=False,
+    )
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """获取全局共享会话（懒加载）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _record(host: str, elapsed: float, ok: bool):
+    with _stats_lock:
+        s = _stats.get(host)
+        if s is None:
+            s = _stats[host] = {
+                "requests": 0,
+                "errors": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+            }
+        s["requests"] += 1
+        if not ok:
+            s["errors"] += 1
+        ms = elapsed * 1000
+        s["total_ms"] += ms
+        if ms > s["max_ms"]:
+            s["max_ms"] = ms
+
+
+def http_get(url: str, params: dict = None, headers: dict = None, timeout: float = None) -> requests.Response:
+    """
+    GET请求（走共享连接池）
+    用法与 requests.get 一致，异常同样向上抛出
+    """
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    ok = False
+    try:
+        resp = get_session().get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=timeout or REQUEST_TIMEOUT,
+        )
+        ok = resp.status_code < 400
+        return resp
+    finally:
+        _record(host, time.perf_counter() - start, ok)
+
+
+def get_json(url: str, params: dict = None, headers: dict = None, timeout: float = None):
+    """GET请求并解析JSON"""
+    return http_get(url, params=params, headers=headers, timeout=timeout).json()
+
+
+def _pool_counters() -> Dict[str, dict]:
+    """
+    读取urllib3连接池计数
+    num_connections 为新建连接数，num_requests 为经该池发出的请求数，
+    两者之差即复用 keep-alive 连接的次数
+    """
+    counters = {}
+    session = _session
+    if session is None:
+        return counters
+    adapter = session.get_adapter("http://")
+    pools = adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+        c = counters.setdefault(host, {"new_connections": 0, "pool_requests": 0})
+        c["new_connections"] += pool.num_connections
+        c["pool_requests"] += pool.num_requests
+    return counters
+
+
+def get_http_stats() -> Dict[str, dict]:
+    """
+    各host的请求统计：次数、错误数、平均/最大延迟、新建连接数、连接复用次数
+    """
+    counters = _pool_counters()
+    with _stats_lock:
+        snapshot = {host: dict(s) for host, s in _stats.items()}
+
+    result = {}
+    for host in set(snapshot) | set(counters):
+        s = snapshot.get(host, {"requests": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        c = counters.get(host, {"new_connections": 0, "pool_requests": 0})
+        reused = max(0, c["pool_requests"] - c["new_connections"])
+        result[host] = {
+            "requests": s["requests"],
+            "errors": s["errors"],
+            "avg_ms": round(s["total_ms"] / s["requests"], 1) if s["requests"] else 0,
+            "max_ms": round(s["max_ms"], 1),
+            "new_connections": c["new_connections"],
+            "reused_connections": reused,
+            "reuse_rate": round(reused / c["pool_requests"] * 100, 1) if c["pool_requests"] else 0,
+        }
+    return dict(sorted(result.items()))
@@ -0,0 +1,77 @@
+# 关键词匹配模块 - Aho-Corasick 多模式匹配
+# 所有关键词编译成一个自动机，每篇文本只扫描一遍即可得到命中的全部关键词，
+# 代替「关键词 × 文本」逐个 `kw in text`
+from collections import deque
+from typing import Iterable, List, Set
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 自动机
+
+    用法:
+        matcher = KeywordMatcher(["卫星", "卫星互联网", "利好"])
+        matcher.find("卫星互联网迎来利好")  # {"卫星", "卫星互联网", "利好"}
+    命中规则与 `kw in text` 一致（包括互相重叠、互为前后缀的关键词）
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        # 状态0为根；_goto[s] 为状态s的转移表，_output[s] 为到达s时命中的关键词
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+        self.keywords = set()
+
+        for keyword in keywords:
+            if keyword:
+                self._add(keyword)
+        self._build_fail_links()
+        self._alphabet = frozenset(ch for keyword in self.keywords for ch in keyword)
+
+    def _add(self, keyword: str):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = nxt
+        self._output[state].add(keyword)
+        self.keywords.add(keyword)
+
+    def _build_fail_links(self):
+        """按BFS顺序计算失败指针，并把失败状态的命中合并进来"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt] |= self._output[self._fail[nxt]]
+
+    def find(self, text: str) -> Set[str]:
+        """返回 text 中出现的全部关键词（去重）"""
+        goto, fail, output, alphabet = self._goto, self._fail, self._output, self._alphabet
+        found = set()
+        state = 0
+        for ch in text:
+            # 不出现在任何关键词中的字符直接回到根状态
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+    def __len__(self) -> int:
+        return len(self.keywords)
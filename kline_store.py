@@ -0,0 +1,304 @@
+# K线本地存储模块 - 日K线与资金流向落地SQLite，按secid增量同步
+# 已收盘的日K不会再变，只需拉取本地最后一根之后的新数据；
+# 冷启动和K线图接口大部分直接读本地
+from datetime import datetime, date, time as dtime
+from typing import List, Tuple, Optional
+
+from database import get_connection
+from http_client import get_json
+from trading_calendar import is_trading_day, previous_trading_day
+
+KLINE_URL = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
+FFLOW_URL = "http://push2.eastmoney.com/api/qt/stock/fflow/kline/get"
+
+# 盘中本地数据的有效期(秒)，当日K线仍在变化，过期后增量拉取最新一根
+KLINE_LIVE_TTL = 60
+
+# 交易时段（含集合竞价）
+SESSION_OPEN = dtime(9, 15)
+SESSION_CLOSE = dtime(15, 0)
+
+KLINE_COLUMNS = [
+    "trade_date", "open", "close", "high", "low", "volume",
+    "amount", "amplitude", "change_pct", "change_amt", "turnover",
+]
+FFLOW_COLUMNS = [
+    "trade_date", "main_inflow", "small_inflow", "medium_inflow",
+    "large_inflow", "super_inflow",
+]
+
+
+def secid_for_stock(stock_code: str) -> str:
+    """股票代码转东方财富secid（0=深圳 1=上海）"""
+    market = "1" if stock_code.startswith(("6", "9")) else "0"
+    return f"{market}.{stock_code}"
+
+
+# ============ 同步状态 ============
+
+def _last_close(now: datetime) -> datetime:
+    """最近一次已收盘的时间点"""
+    d = now.date()
+    if not (is_trading_day(d) and now.time() >= SESSION_CLOSE):
+        d = previous_trading_day(d)
+    return datetime.combine(d, SESSION_CLOSE)
+
+
+def _in_session(now: datetime) -> bool:
+    return is_trading_day(now.date()) and SESSION_OPEN <= now.time() < SESSION_CLOSE
+
+
+def _is_fresh(synced_at: Optional[str]) -> bool:
+    """
+    本地数据是否无需同步
+    - 盘中：同步时间在 KLINE_LIVE_TTL 秒内
+    - 盘后/休市：最近一次收盘之后同步过（停牌股也不会反复请求）
+    """
+    if not synced_at:
+        return False
+    synced = datetime.fromisoformat(synced_at)
+    now = datetime.now()
+    if _in_session(now):
+        return (now - synced).total_seconds() < KLINE_LIVE_TTL
+    return synced >= _last_close(now)
+
+
+def _get_sync(cursor, secid: str, series: str) -> dict:
+    cursor.execute(
+        'SELECT name, complete, synced_at FROM kline_sync WHERE secid = ? AND series = ?',
+        (secid, series),
+    )
+    row = cursor.fetchone()
+    return dict(row) if row else {"name": "", "complete": 0, "synced_at": None}
+
+
+def _set_sync(cursor, secid: str, series: str, name: str, complete: bool):
+    cursor.execute('''
+        INSERT INTO kline_sync (secid, series, name, complete, synced_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(secid, series) DO UPDATE SET
+            name = COALESCE(NULLIF(excluded.name, ''), kline_sync.name),
+            complete = excluded.complete,
+            synced_at = excluded.synced_at
+    ''', (secid, series, name, 1 if complete else 0, datetime.now().isoformat(timespec="seconds")))
+
+
+def _gap_limit(last_date: str) -> int:
+    """增量拉取条数：距本地最后一根的自然日数 + 2（多取一根已存的用于校验复权）"""
+    gap = (date.today() - date.fromisoformat(last_date)).days
+    return max(gap, 0) + 2
+
+
+# ============ 东方财富接口 ============
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value) if value and value != "-" else 0
+    except ValueError:
+        return 0
+
+
+def _download_klines(secid: str, fqt: int, lmt: int) -> Tuple[str, List[tuple]]:
+    """下载日K线，返回 (名称, [行...])，行字段顺序同 KLINE_COLUMNS"""
+    params = {
+        "secid": secid,
+        "fields1": "f1,f2,f3,f4,f5,f6",
+        "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
+        "klt": "101",  # 日K
+        "fqt": str(fqt),
+        "end": "20500101",
+        "lmt": str(lmt),
+    }
+    data = get_json(KLINE_URL, params=params)
+    if not data.get("data"):
+        return "", []
+
+    # 格式：日期,开盘,收盘,最高,最低,成交量,成交额,振幅,涨跌幅,涨跌额,换手率
+    rows = []
+    for kline in data["data"].get("klines") or []:
+        parts = kline.split(",")
+        if len(parts) >= 6:
+            parts += [""] * (11 - len(parts))
+            rows.append((parts[0],) + tuple(_to_float(p) for p in parts[1:11]))
+    return data["data"].get("name", ""), rows
+
+
+def _download_fund_flows(secid: str, lmt: int) -> List[tuple]:
+    """下载日资金流向，行字段顺序同 FFLOW_COLUMNS"""
+    params = {
+        "secid": secid,
+        "fields1": "f1,f2,f3,f4,f5,f6",
+        "fields2": "f51,f52,f53,f54,f55,f56",
+        "klt": "101",
+        "lmt": str(lmt),
+    }
+    data = get_json(FFLOW_URL, params=params)
+    if not data.get("data"):
+        return []
+
+    # 格式：日期,主力净流入,小单净流入,中单净流入,大单净流入,超大单净流入
+    rows = []
+    for kline in data["data"].get("klines") or []:
+        parts = kline.split(",")
+        if len(parts) >= 2:
+            parts += [""] * (6 - len(parts))
+            rows.append((parts[0],) + tuple(_to_float(p) for p in parts[1:6]))
+    return rows
+
+
+# ============ 读写 ============
+
+def _upsert_klines(cursor, secid: str, fqt: int, rows: List[tuple]):
+    cursor.executemany(f'''
+        INSERT OR REPLACE INTO klines (secid, fqt, {", ".join(KLINE_COLUMNS)})
+        VALUES (?, ?, {", ".join("?" * len(KLINE_COLUMNS))})
+    ''', [(secid, fqt) + row for row in rows])
+
+
+def _adjustment_changed(cursor, secid: str, fqt: int, rows: List[tuple]) -> bool:
+    """
+    复权数据校验：前复权(fqt=1)在除权除息后会整体改写历史价格，
+    比对新拉到的、本地已有的已收盘K线收盘价，不一致说明需要全量重拉
+    """
+    if fqt == 0 or not rows:
+        return False
+    today = date.today().isoformat()
+    overlap = [r for r in rows if r[0] < today]
+    if not overlap:
+        return False
+    cursor.execute(
+        'SELECT close FROM klines WHERE secid = ? AND fqt = ? AND trade_date = ?',
+        (secid, fqt, overlap[0][0]),
+    )
+    row = cursor.fetchone()
+    return row is not None and abs(row["close"] - overlap[0][2]) > 1e-6
+
+
+def _sync_klines(conn, secid: str, fqt: int, limit: int):
+    """按需同步本地K线（全量/增量/复权重拉）"""
+    cursor = conn.cursor()
+    series = f"kline:{fqt}"
+    sync = _get_sync(cursor, secid, series)
+
+    cursor.execute(
+        'SELECT COUNT(*) AS n, MAX(trade_date) AS last_date FROM klines WHERE secid = ? AND fqt = ?',
+        (secid, fqt),
+    )
+    row = cursor.fetchone()
+    stored, last_date = row["n"], row["last_date"]
+
+    need_full = stored == 0 or (stored < limit and not sync["complete"])
+    if not need_full and _is_fresh(sync["synced_at"]):
+        return
+
+    if need_full:
+        name, rows = _download_klines(secid, fqt, limit)
+        complete = len(rows) < limit
+    else:
+        name, rows = _download_klines(secid, fqt, _gap_limit(last_date))
+        complete = sync["complete"]
+        if _adjustment_changed(cursor, secid, fqt, rows):
+            print(f"🔄 {secid} 复权数据变化，全量重新同步")
+            cursor.execute('DELETE FROM klines WHERE secid = ? AND fqt = ?', (secid, fqt))
+            lmt = max(limit, stored)
+            name, rows = _download_klines(secid, fqt, lmt)
+            complete = len(rows) < lmt
+
+    _upsert_klines(cursor, secid, fqt, rows)
+    _set_sync(cursor, secid, series, name, complete)
+    conn.commit()
+
+
+def _sync_fund_flows(conn, secid: str, limit: int):
+    """按需同步本地资金流向"""
+    cursor = conn.cursor()
+    series = "fflow"
+    sync = _get_sync(cursor, secid, series)
+
+    cursor.execute(
+        'SELECT COUNT(*) AS n, MAX(trade_date) AS last_date FROM fund_flows WHERE secid = ?',
+        (secid,),
+    )
+    row = cursor.fetchone()
+    stored, last_date = row["n"], row["last_date"]
+
+    need_full = stored == 0 or (stored < limit and not sync["complete"])
+    if not need_full and _is_fresh(sync["synced_at"]):
+        return
+
+    lmt = limit if need_full else _gap_limit(last_date)
+    rows = _download_fund_flows(secid, lmt)
+    complete = len(rows) < lmt if need_full else sync["complete"]
+
+    cursor.executemany(f'''
+        INSERT OR REPLACE INTO fund_flows (secid, {", ".join(FFLOW_COLUMNS)})
+        VALUES (?, {", ".join("?" * len(FFLOW_COLUMNS))})
+    ''', [(secid,) + r for r in rows])
+    _set_sync(cursor, secid, series, "", complete)
+    conn.commit()
+
+
+def get_klines(secid: str, limit: int = 250, fqt: int = 1) -> Tuple[str, List[dict]]:
+    """
+    获取最近 limit 根日K线（本地优先，只拉取缺失部分）
+
+    参数:
+        secid: 东方财富secid，如 1.600000 / 0.000001 / 90.BK0001
+        limit: 返回条数
+        fqt: 复权方式 0=不复权 1=前复权
+
+    返回:
+        (名称, [{trade_date, open, close, high, low, volume, amount, ...}]) 按日期升序；
+        网络失败时返回本地已有数据
+    """
+    conn = get_connection()
+    try:
+        try:
+            _sync_klines(conn, secid, fqt, limit)
+        except Exception as e:
+            conn.rollback()
+            print(f"同步K线失败 {secid}: {e}")
+
+        cursor = conn.cursor()
+        cursor.execute('SELECT name FROM kline_sync WHERE secid = ? AND series = ?', (secid, f"kline:{fqt}"))
+        row = cursor.fetchone()
+        name = row["name"] if row else ""
+
+        cursor.execute(f'''
+            SELECT {", ".join(KLINE_COLUMNS)} FROM klines
+            WHERE secid = ? AND fqt = ?
+            ORDER BY trade_date DESC
+            LIMIT ?
+        ''', (secid, fqt, limit))
+        bars = [dict(r) for r in cursor.fetchall()]
+        bars.reverse()
+        return name, bars
+    finally:
+        conn.close()
+
+
+def get_fund_flows(secid: str, limit: int = 5) -> List[dict]:
+    """
+    获取最近 limit 天的资金流向（本地优先，只拉取缺失部分）
+    返回 [{trade_date, main_inflow, ...}] 按日期升序
+    """
+    conn = get_connection()
+    try:
+        try:
+            _sync_fund_flows(conn, secid, limit)
+        except Exception as e:
+            conn.rollback()
+            print(f"同步资金流向失败 {secid}: {e}")
+
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {", ".join(FFLOW_COLUMNS)} FROM fund_flows
+            WHERE secid = ?
+            ORDER BY trade_date DESC
+            LIMIT ?
+        ''', (secid, limit))
+        flows = [dict(r) for r in cursor.fetchall()]
+        flows.reverse()
+        return flows
+    finally:
+        conn.close()
@@ -2,7 +2,7 @@
 import os
 from flask import Flask
 from routes import api
-from database import init_database
+from database import init_database, prewarm_report_cache
 
 
 def create_app():
@@ -17,6 +17,7 @@ def create_app():
 if __name__ == '__main__':
     # 初始化数据库
     init_database()
+    prewarm_report_cache()
     
     app = create_app()
     
@@ -24,6 +25,10 @@ if __name__ == '__main__':
     if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or not app.debug:
         from feishu_pusher import start_scheduler
         start_scheduler()
+        
+        # 启动 /api/all 快照后台刷新（交易时段定时重建）
+        from routes import start_snapshot_refresher
+        start_snapshot_refresher()
     
     # 启动收益跟踪定时任务（每天15:30）
     from performance_tracker import start_performance_scheduler
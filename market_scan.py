@@ -0,0 +1,212 @@
+# 全市场扫描模块 - 分页拉取沪深主板A股实时行情，板块成分股落地SQLite每日刷新
+# 题材成分股由「板块成分表 + 全市场行情」在本地拼装，
+# 替代逐个板块请求前30只成分股
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+from config import MAX_WORKERS, MARKET_PAGE_SIZE
+from database import get_connection
+from http_client import get_json
+from models import StockQuote
+
+CLIST_URL = "http://push2.eastmoney.com/api/qt/clist/get"
+
+# 沪深主板A股（深主板、沪主板）；创业板、科创板不参与推荐（见 is_main_board），不拉取
+A_SHARE_FS = "m:0+t:6,m:1+t:2"
+# 概念板块
+CONCEPT_BOARD_FS = "m:90+t:3"
+
+# 个股行情字段（见 models.CLIST_FIELD_MAP）
+STOCK_FIELDS = "f2,f3,f4,f5,f6,f7,f12,f14,f15,f16,f17,f18,f20,f21"
+
+# 分页请求线程池（独立于题材抓取线程池，避免在其工作线程内提交任务互相等待）
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="market-page")
+    return _executor
+
+
+def is_main_board(code: str) -> bool:
+    """过滤科创板（68开头）和深圳创业板（3开头）"""
+    return bool(code) and not code.startswith("68") and not code.startswith("3")
+
+
+# ============ 分页拉取 ============
+
+def _sort_value(value) -> float:
+    """排序用数值；停牌等无数据（"-"）排在最后"""
+    return value if isinstance(value, (int, float)) else float("-inf")
+
+
+def fetch_clist_all(fs: str, fields: str, sort_by: Optional[str] = None,
+                    page_size: int = MARKET_PAGE_SIZE) -> Optional[List[dict]]:
+    """
+    分页拉取clist列表的全部条目
+    先取第1页得到总数，其余页并发请求，失败的页再补取一次。
+    按代码（f12）升序分页：按涨跌幅等实时字段分页时，拉取期间排名变动会让条目在页间移动，
+    导致重复或遗漏；代码顺序稳定。条目按代码去重，拿到的条数与总数不符时打印警告。
+    sort_by: 拉取完成后在本地按该字段降序排列（如 "f3" 涨跌幅）
+
+    返回: 条目列表；第1页失败返回None，其余页失败只打印警告（返回已拿到的部分）
+    """
+    params = {
+        "pz": page_size,
+        "po": 0,
+        "np": 1,
+        "fltt": 2,
+        "invt": 2,
+        "fid": "f12",
+        "fs": fs,
+        "fields": fields,
+    }
+
+    def fetch_page(pn: int) -> list:
+        data = get_json(CLIST_URL, params={**params, "pn": pn})
+        return (data.get("data") or {}).get("diff") or []
+
+    try:
+        data = get_json(CLIST_URL, params={**params, "pn": 1})
+    except Exception as e:
+        print(f"分页拉取 {fs} 第1页失败: {e}")
+        return None
+    if not data.get("data"):
+        return None
+
+    items = list(data["data"].get("diff") or [])
+    total = data["data"].get("total") or len(items)
+    pages = math.ceil(total / page_size)
+
+    futures = {pn: _get_executor().submit(fetch_page, pn) for pn in range(2, pages + 1)}
+    failed = []
+    for pn, future in futures.items():
+        try:
+            items.extend(future.result())
+        except Exception as e:
+            failed.append(pn)
+            print(f"分页拉取 {fs} 第{pn}页失败: {e}")
+    for pn in failed:
+        try:
+            items.extend(fetch_page(pn))
+        except Exception as e:
+            print(f"分页拉取 {fs} 第{pn}页重试失败: {e}")
+
+    # 拉取期间有新上市/新建板块时，页边界处的条目可能出现两次
+    unique = {}
+    for item in items:
+        unique.setdefault(item.get("f12") or id(item), item)
+    items = list(unique.values())
+    if len(items) != total:
+        print(f"⚠️ {fs} 共{total}条（{pages}页），实际拿到{len(items)}条")
+
+    if sort_by:
+        items.sort(key=lambda item: _sort_value(item.get(sort_by)), reverse=True)
+    return items
+
+
+def fetch_market_spot() -> Optional[Dict[str, StockQuote]]:
+    """
+    沪深主板A股实时行情
+    返回 {代码: StockQuote}；失败返回None
+    """
+    items = fetch_clist_all(A_SHARE_FS, STOCK_FIELDS)
+    if not items:
+        return None
+    spot = {}
+    for item in items:
+        quote = StockQuote.from_clist(item)
+        if quote.code:
+            spot[quote.code] = quote
+    print(f"📊 全市场行情 {len(spot)} 只")
+    return spot
+
+
+def fetch_all_boards(fields: str) -> Optional[List[dict]]:
+    """全部概念板块（按涨跌幅降序）"""
+    return fetch_clist_all(CONCEPT_BOARD_FS, fields, sort_by="f3")
+
+
+# ============ 板块成分表 ============
+
+def _members_synced_today(cursor, secid: str) -> bool:
+    cursor.execute(
+        "SELECT synced_at FROM kline_sync WHERE secid = ? AND series = 'members'",
+        (secid,),
+    )
+    row = cursor.fetchone()
+    if not row or not row["synced_at"]:
+        return False
+    return datetime.fromisoformat(row["synced_at"]).date() >= date.today()
+
+
+def _save_members(conn, board_code: str, codes: List[str]):
+    """整体替换板块成分股，并记录同步时间"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM board_members WHERE board_code = ?', (board_code,))
+    cursor.executemany(
+        'INSERT OR IGNORE INTO board_members (board_code, stock_code) VALUES (?, ?)',
+        [(board_code, code) for code in codes],
+    )
+    cursor.execute('''
+        INSERT INTO kline_sync (secid, series, name, complete, synced_at)
+        VALUES (?, 'members', '', 1, ?)
+        ON CONFLICT(secid, series) DO UPDATE SET synced_at = excluded.synced_at
+    ''', (f"90.{board_code}", datetime.now().isoformat(timespec="seconds")))
+    conn.commit()
+
+
+def get_board_members(board_code: str) -> List[str]:
+    """
+    获取板块成分股代码（本地优先，每天首次使用时刷新）
+    网络失败时返回本地已有数据
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        if not _members_synced_today(cursor, f"90.{board_code}"):
+            items = fetch_clist_all(f"b:{board_code}", "f12")
+            if items:
+                codes = [item.get("f12") for item in items if item.get("f12")]
+                _save_members(conn, board_code, codes)
+            else:
+                print(f"刷新板块成分失败 {board_code}，使用本地数据")
+
+        cursor.execute('SELECT stock_code FROM board_members WHERE board_code = ?', (board_code,))
+        return [row["stock_code"] for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"获取板块成分失败 {board_code}: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def assemble_board_stocks(board_code: str, board_name: str,
+                          get_spot: Callable[[], Optional[Dict[str, StockQuote]]] = fetch_market_spot
+                          ) -> Optional[List[StockQuote]]:
+    """
+    本地拼装板块成分股行情：成分表 join 全市场行情
+    只保留主板股票，停牌股（无价格）不参与评分，按涨跌幅降序；
+    行情获取失败返回None
+    """
+    spot = get_spot()
+    if not spot:
+        return None
+    stocks = []
+    for code in get_board_members(board_code):
+        quote = spot.get(code)
+        if not quote or not is_main_board(code):
+            continue
+        if not quote.price:
+            continue
+        stocks.append(quote.replace(theme=board_name))
+    stocks.sort(key=lambda x: x.change_pct, reverse=True)
+    return stocks
@@ -0,0 +1,94 @@
+# 数据模型 - 紧凑的行情记录（__slots__，无实例dict）
+# 全市场扫描时同时驻留数千只股票行情，用定长记录代替15个键的dict
+from typing import Iterator
+
+# 东方财富clist字段 -> 行情字段
+CLIST_FIELD_MAP = {
+    "f12": "code",
+    "f14": "name",
+    "f2": "price",
+    "f3": "change_pct",
+    "f4": "change_amt",
+    "f5": "volume",       # 成交量(手)
+    "f6": "amount",       # 成交额
+    "f7": "amplitude",    # 振幅
+    "f15": "high",
+    "f16": "low",
+    "f17": "open",
+    "f18": "prev_close",
+    "f20": "market_cap",  # 总市值
+    "f21": "float_cap",   # 流通市值
+}
+
+QUOTE_TEXT_FIELDS = ("code", "name", "theme")
+QUOTE_NUMBER_FIELDS = (
+    "price", "change_pct", "change_amt", "volume", "amount", "amplitude",
+    "high", "low", "open", "prev_close", "market_cap", "float_cap",
+)
+
+
+def to_number(value) -> float:
+    """数值字段转换：停牌等情况接口返回的 '-'、空值按0处理"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value) if value not in (None, "", "-") else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+class StockQuote:
+    """
+    个股实时行情记录
+
+    从 fetch_theme_stocks 一直传到 analyzer，数值字段统一为 int/float。
+    兼容原dict用法的读取方式：quote.get("price", 0)、quote["code"]，供各分析模块直接使用；
+    记录在缓存中被多个请求共享，视为只读，修改请用 replace() 生成新记录
+    """
+    __slots__ = QUOTE_TEXT_FIELDS + QUOTE_NUMBER_FIELDS
+    FIELDS = frozenset(__slots__)
+
+    def __init__(self, code: str = "", name: str = "", theme: str = "", **numbers):
+        self.code = code or ""
+        self.name = name or ""
+        self.theme = theme or ""
+        for field in QUOTE_NUMBER_FIELDS:
+            setattr(self, field, to_number(numbers.pop(field, 0)))
+        if numbers:
+            raise TypeError(f"未知行情字段: {', '.join(numbers)}")
+
+    @classmethod
+    def from_clist(cls, item: dict, theme: str = "") -> "StockQuote":
+        """东方财富clist个股条目转为行情记录"""
+        return cls(theme=theme, **{field: item.get(key, 0) for key, field in CLIST_FIELD_MAP.items()})
+
+    def replace(self, **changes) -> "StockQuote":
+        """复制一份并修改部分字段"""
+        values = self.to_dict()
+        values.update(changes)
+        return StockQuote(**values)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, StockQuote):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"StockQuote({self.code} {self.name} {self.price} {self.change_pct:+.2f}%)"
@@ -0,0 +1,128 @@
+# 新闻近似去重模块 - MinHash + LSH 分段索引
+# 同一条消息在新浪、同花顺、东财的措辞略有不同，按标题前缀去重去不掉；
+# 按字符2-gram集合的Jaccard相似度 >= NEWS_DUP_THRESHOLD 视为同一条。
+# 64个MinHash值分成16段（每段4个）建索引，只与至少一段完全相同的候选比较，不用两两比较
+# （快讯标题很短，措辞稍变SimHash指纹就差出7~13位，所以用MinHash）
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from config import NEWS_DUP_THRESHOLD
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# 分词粒度（字符n-gram）
+SHINGLE_SIZE = 2
+
+# 计算前去掉的字符：空白和标点
+_NOISE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+# multiply-shift 哈希族：h_i(x) = (a_i * x + b_i) mod 2^64 的高32位，a_i 为奇数
+_rng = np.random.default_rng(20240101)
+_PERM_A = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+
+
+def news_text(news: Dict) -> str:
+    """用于比较的新闻文本：标题 + 正文（正文与标题相同时只取一次）"""
+    title = news.get("title") or ""
+    content = news.get("content") or ""
+    return title if content == title else title + content
+
+
+def shingles(text: str) -> Set[str]:
+    text = _NOISE.sub("", text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(grams: Set[str]) -> np.ndarray:
+    """n-gram集合的MinHash签名（NUM_PERM个uint64）"""
+    digests = b"".join(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest() for g in grams)
+    values = np.frombuffer(digests, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        hashed = (_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1)
+
+
+class NearDuplicateIndex:
+    """
+    近似重复索引
+    add() 加入条目，find() 返回Jaccard相似度达到阈值的已有条目key；
+    候选由LSH分段桶给出，再用n-gram集合精确计算相似度
+    """
+
+    def __init__(self, threshold: float = NEWS_DUP_THRESHOLD):
+        self.threshold = threshold
+        self._buckets = [{} for _ in range(BANDS)]
+        self._grams = {}
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray) -> List[bytes]:
+        return [signature[i * ROWS:(i + 1) * ROWS].tobytes() for i in range(BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def find(self, text: str) -> Optional[object]:
+        grams = shingles(text)
+        if not grams:
+            return None
+        return self._find(grams, self._band_keys(minhash(grams)))[0]
+
+    def _find(self, grams: Set[str], band_keys: List[bytes]):
+        best, best_score = None, self.threshold
+        seen = set()
+        for bucket, band in zip(self._buckets, band_keys):
+            for key in bucket.get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = jaccard(grams, self._grams[key])
+                if score >= best_score:
+                    best, best_score = key, score
+        return best, band_keys
+
+    def add(self, text: str, key) -> Optional[object]:
+        """
+        加入条目；已有近似重复条目时不加入，返回该条目的key，否则返回None
+        """
+        grams = shingles(text)
+        if not grams:
+            return None
+        duplicate, band_keys = self._find(grams, self._band_keys(minhash(grams)))
+        if duplicate is not None:
+            return duplicate
+        self._grams[key] = grams
+        for bucket, band in zip(self._buckets, band_keys):
+            bucket.setdefault(band, []).append(key)
+        return None
+
+
+def dedupe_news(news_list: Iterable[Dict], threshold: float = NEWS_DUP_THRESHOLD) -> List[Dict]:
+    """
+    近似去重：每组相似新闻只保留一条（正文最长的一条），位置取该组第一次出现的位置
+    """
+    index = NearDuplicateIndex(threshold)
+    clusters = []
+    for news in news_list:
+        text = news_text(news)
+        if not text:
+            continue
+        cluster = index.add(text, len(clusters))
+        if cluster is None:
+            clusters.append(news)
+        elif len(news.get("content") or "") > len(clusters[cluster].get("content") or ""):
+            clusters[cluster] = news
+    return clusters
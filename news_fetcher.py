@@ -2,9 +2,14 @@
 # 支持多数据源：新浪财经、同花顺、东方财富
 
 import time
-import requests
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import NEWS_LOOKBACK_DAYS, THEME_KEYWORD_CACHE_SIZE
+from http_client import http_get
+from keyword_matcher import KeywordMatcher
+from news_dedup import dedupe_news
+from news_store import save_news, search_news
 
 try:
     import akshare as ak
@@ -47,6 +52,17 @@ NEGATIVE_KEYWORDS = [
     "诉讼", "仲裁", "纠纷",
 ]
 
+_POSITIVE_SET = frozenset(POSITIVE_KEYWORDS)
+_NEGATIVE_SET = frozenset(NEGATIVE_KEYWORDS)
+# 利好/利空词典的匹配自动机
+_SENTIMENT_MATCHER = KeywordMatcher(POSITIVE_KEYWORDS + NEGATIVE_KEYWORDS)
+
+# 题材相关新闻每个题材最多返回条数
+MAX_THEME_NEWS = 5
+
+# 题材名拆分时认可的2字词根
+COMMON_ROOTS = frozenset(["互联", "智能", "新能", "半导", "芯片", "机器", "卫星", "低空", "量子", "生物", "医药", "军工", "消费", "金融"])
+
 # 股票名称常见后缀（用于清洗）
 STOCK_NAME_SUFFIXES = ["股份", "科技", "电子", "集团", "新材", "智能", "信息", "网络", "软件", "医药", "生物", "能源", "电气", "机械", "材料"]
 
@@ -70,7 +86,7 @@ def fetch_sina_news(limit: int = 30) -> List[Dict]:
     try:
         url = 'https://feed.mix.sina.com.cn/api/roll/get'
         params = {'pageid': '153', 'lid': '2516', 'num': str(limit), 'page': '1'}
-        resp = requests.get(url, headers=HEADERS, params=params, timeout=10)
+        resp = http_get(url, headers=HEADERS, params=params, timeout=10)
         if resp.status_code == 200:
             data = resp.json()
             for item in data.get('result', {}).get('data', [])[:limit]:
@@ -91,7 +107,7 @@ def fetch_ths_news(limit: int = 30) -> List[Dict]:
     try:
         url = 'https://news.10jqka.com.cn/tapp/news/push/stock/'
         params = {'page': '1', 'tag': '', 'track': 'website', 'pagesize': str(limit)}
-        resp = requests.get(url, headers={**HEADERS, 'Referer': 'https://news.10jqka.com.cn/'}, params=params, timeout=10)
+        resp = http_get(url, headers={**HEADERS, 'Referer': 'https://news.10jqka.com.cn/'}, params=params, timeout=10)
         if resp.status_code == 200:
             data = resp.json()
             for item in data.get('data', {}).get('list', [])[:limit]:
@@ -113,7 +129,7 @@ def fetch_eastmoney_news(limit: int = 30) -> List[Dict]:
         # 股票快讯
         url = 'https://np-anotice-stock.eastmoney.com/api/security/ann'
         params = {'sr': '-1', 'page_size': str(limit), 'page_index': '1', 'ann_type': 'A', 'client_source': 'web', 'f_node': '0'}
-        resp = requests.get(url, headers={**HEADERS, 'Referer': 'https://data.eastmoney.com/'}, params=params, timeout=10)
+        resp = http_get(url, headers={**HEADERS, 'Referer': 'https://data.eastmoney.com/'}, params=params, timeout=10)
         if resp.status_code == 200:
             data = resp.json()
             items = data.get('data', {}).get('list', []) if data.get('data') else []
@@ -160,18 +176,20 @@ def fetch_all_news(limit_per_source: int = 30) -> List[Dict]:
             except Exception as e:
                 print(f"  {source}获取失败: {e}")
     
-    # 去重（按标题）
-    seen_titles = set()
-    unique_news = []
-    for news in all_news:
-        title = news.get('title', '')[:20]  # 取前20字作为去重key
-        if title and title not in seen_titles:
-            seen_titles.add(title)
-            unique_news.append(news)
+    # 近似去重：不同来源措辞略有差异的同一条消息只保留一条
+    unique_news = dedupe_news(news for news in all_news if news.get('title'))
     
     if unique_news:
         _set_cache(cache_key, unique_news)
         print(f"📰 新闻聚合完成: 共{len(unique_news)}条 (去重后)")
+        
+        # 落地本地新闻库，供题材匹配检索最近几天的新闻
+        try:
+            inserted = save_news(unique_news)
+            if inserted:
+                print(f"📰 新闻入库: 新增{inserted}条")
+        except Exception as e:
+            print(f"⚠️ 新闻入库失败: {e}")
     
     return unique_news
 
@@ -196,8 +214,9 @@ def analyze_news_sentiment(news_list: List[Dict]) -> Dict:
     for news in news_list:
         content = news.get("content", "") + news.get("title", "")
         
-        has_positive = any(kw in content for kw in POSITIVE_KEYWORDS)
-        has_negative = any(kw in content for kw in NEGATIVE_KEYWORDS)
+        hits = _SENTIMENT_MATCHER.find(content)
+        has_positive = not hits.isdisjoint(_POSITIVE_SET)
+        has_negative = not hits.isdisjoint(_NEGATIVE_SET)
         
         if has_positive:
             positive_count += 1
@@ -235,92 +254,152 @@ def extract_theme_keywords(theme_name: str, stocks: List[Dict] = None) -> List[s
     1. 题材名称本身
     2. 智能拆分题材名（如"卫星互联网"→"卫星互联网"、"卫星"、"互联网"）
     3. 成分股名称（去除常见后缀）
+    
+    结果按 (题材名, 前8只成分股名称集合) 缓存（见 theme_keyword_index）
     """
-    keywords = []
+    names = frozenset(stock.get("name", "") for stock in (stocks or [])[:8])
+    return list(theme_keyword_index(theme_name, names))
+
+
+@lru_cache(maxsize=THEME_KEYWORD_CACHE_SIZE)
+def theme_keyword_index(theme_name: str, stock_names: frozenset) -> Tuple[str, ...]:
+    """题材关键词（按长度从长到短，同长度按字典序），同一题材成分股不变时直接命中缓存"""
+    keywords = set()
     
     # 1. 题材名称本身（最高优先级）
-    keywords.append(theme_name)
+    keywords.add(theme_name)
     
     # 2. 智能拆分题材名
     if len(theme_name) >= 4:
-        common_roots = ["互联", "智能", "新能", "半导", "芯片", "机器", "卫星", "低空", "量子", "生物", "医药", "军工", "消费", "金融"]
-        
         for i in range(2, len(theme_name) - 1):
             part1 = theme_name[:i]
             part2 = theme_name[i:]
             
             if len(part1) >= 2 and len(part2) >= 2:
-                if part1 in common_roots or part2 in common_roots or len(part1) >= 3 or len(part2) >= 3:
-                    keywords.append(part1)
-                    keywords.append(part2)
+                if part1 in COMMON_ROOTS or part2 in COMMON_ROOTS or len(part1) >= 3 or len(part2) >= 3:
+                    keywords.add(part1)
+                    keywords.add(part2)
     
     # 3. 从成分股名称提取关键词
-    if stocks:
-        for stock in stocks[:8]:
-            stock_name = stock.get("name", "")
-            if not stock_name or len(stock_name) < 2:
-                continue
-            
-            clean_name = stock_name
-            for suffix in STOCK_NAME_SUFFIXES:
-                if clean_name.endswith(suffix):
-                    clean_name = clean_name[:-len(suffix)]
-                    break
-            
-            if len(clean_name) >= 2:
-                keywords.append(clean_name)
-            
-            if len(stock_name) >= 3:
-                keywords.append(stock_name)
-    
-    keywords = list(set(keywords))
-    keywords.sort(key=len, reverse=True)
+    for stock_name in stock_names:
+        if not stock_name or len(stock_name) < 2:
+            continue
+        
+        clean_name = stock_name
+        for suffix in STOCK_NAME_SUFFIXES:
+            if clean_name.endswith(suffix):
+                clean_name = clean_name[:-len(suffix)]
+                break
+        
+        if len(clean_name) >= 2:
+            keywords.add(clean_name)
+        
+        if len(stock_name) >= 3:
+            keywords.add(stock_name)
     
-    return keywords
+    return tuple(sorted(keywords, key=lambda kw: (-len(kw), kw)))
 
 
-def find_theme_related_news(theme_name: str, news_list: List[Dict], stocks: List[Dict] = None) -> List[Dict]:
+def is_match_keyword(theme_name: str, keyword: str) -> bool:
+    """要求关键词长度至少3个字符，避免误匹配；2个字的关键词只能是题材名本身"""
+    return len(keyword) >= 3 or (len(keyword) == 2 and keyword == theme_name)
+
+
+def find_themes_news(theme_keywords: Dict[str, List[str]], news_list: List[Dict] = None,
+                     lookback_days: float = NEWS_LOOKBACK_DAYS) -> Dict[str, List[Dict]]:
     """
-    查找与特定题材相关的新闻
-    使用动态提取的关键词进行匹配
+    多个题材的相关新闻：从本地新闻库全文检索最近 lookback_days 天的候选新闻，再精确匹配
+    新闻库不可用时退回到 news_list（最新一批快讯）
+    """
+    keywords = {
+        kw for theme_name, kws in theme_keywords.items()
+        for kw in kws if is_match_keyword(theme_name, kw)
+    }
+    candidates = search_news(keywords, lookback_days)
+    if candidates is None:
+        candidates = news_list or []
+    return match_themes_news(theme_keywords, candidates)
+
+
+class ThemeNewsMatcher:
+    """
+    多个题材的新闻匹配器
+    所有题材关键词和利好/利空词典编译成一个自动机，每条新闻只扫描一遍，
+    得到命中的题材（每个题材取优先级最高的关键词）和利好/利空判断
     """
-    related_news = []
     
-    # 动态提取关键词
-    keywords = extract_theme_keywords(theme_name, stocks)
+    def __init__(self, theme_keywords: Dict[str, List[str]]):
+        """theme_keywords: {题材名: 关键词列表（按优先级排序，见 extract_theme_keywords）}"""
+        self.theme_keywords = theme_keywords
+        # 关键词 -> [(题材, 优先级)]
+        self._owners = {}
+        for theme_name, keywords in theme_keywords.items():
+            for rank, kw in enumerate(keywords):
+                if is_match_keyword(theme_name, kw):
+                    self._owners.setdefault(kw, []).append((theme_name, rank))
+        self._matcher = KeywordMatcher(list(self._owners) + POSITIVE_KEYWORDS + NEGATIVE_KEYWORDS)
     
-    # 搜索新闻
-    for news in news_list:
+    def match(self, news: Dict) -> Dict[str, Dict]:
+        """
+        匹配一条新闻
+        返回: {题材名: 相关新闻条目}，没有命中任何题材返回空dict
+        """
+        if not self._owners:
+            return {}
         content = news.get("content", "") + news.get("title", "")
-        matched_keyword = None
+        hits = self._matcher.find(content)
         
-        for kw in keywords:
-            # 要求关键词长度至少3个字符，避免误匹配
-            if len(kw) >= 3 and kw in content:
-                matched_keyword = kw
-                break
-            # 对于2个字的关键词，要求是题材名本身
-            elif len(kw) == 2 and kw == theme_name and kw in content:
-                matched_keyword = kw
-                break
+        # 每个题材取优先级最高的命中关键词
+        matched = {}
+        for kw in hits:
+            for theme_name, rank in self._owners.get(kw, ()):
+                if theme_name not in matched or rank < matched[theme_name][0]:
+                    matched[theme_name] = (rank, kw)
+        if not matched:
+            return {}
         
-        if matched_keyword:
-            # 判断是利好还是利空
-            is_positive = any(pk in content for pk in POSITIVE_KEYWORDS)
-            is_negative = any(nk in content for nk in NEGATIVE_KEYWORDS)
-            
-            related_news.append({
+        # 判断是利好还是利空
+        is_positive = not hits.isdisjoint(_POSITIVE_SET)
+        is_negative = not hits.isdisjoint(_NEGATIVE_SET)
+        return {
+            theme_name: {
                 "content": content[:100],
                 "time": news.get("time", 0),
+                "published_at": news.get("published_at", 0),
                 "is_positive": is_positive,
                 "is_negative": is_negative,
-                "matched_keyword": matched_keyword,
-            })
+                "matched_keyword": kw,
+            }
+            for theme_name, (_, kw) in matched.items()
+        }
+
+
+def match_themes_news(theme_keywords: Dict[str, List[str]], news_list: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    一次扫描为多个题材匹配相关新闻（见 ThemeNewsMatcher）
     
-    return related_news[:5]  # 最多返回5条
+    返回: {题材名: 相关新闻列表（最多 MAX_THEME_NEWS 条）}
+    """
+    related = {theme_name: [] for theme_name in theme_keywords}
+    matcher = ThemeNewsMatcher(theme_keywords)
+    for news in news_list:
+        for theme_name, entry in matcher.match(news).items():
+            if len(related[theme_name]) < MAX_THEME_NEWS:
+                related[theme_name].append(entry)
+    return related
 
 
-def evaluate_theme_news_factor(theme_name: str, news_list: List[Dict] = None, stocks: List[Dict] = None) -> Dict:
+def find_theme_related_news(theme_name: str, news_list: List[Dict], stocks: List[Dict] = None) -> List[Dict]:
+    """
+    查找与特定题材相关的新闻
+    使用动态提取的关键词进行匹配（多个题材一起匹配见 match_themes_news）
+    """
+    keywords = extract_theme_keywords(theme_name, stocks)
+    return match_themes_news({theme_name: keywords}, news_list)[theme_name]
+
+
+def evaluate_theme_news_factor(theme_name: str, news_list: List[Dict] = None, stocks: List[Dict] = None,
+                               related_news: List[Dict] = None) -> Dict:
     """
     评估题材的消息面因子
     返回消息面评分和相关新闻
@@ -329,11 +408,12 @@ def evaluate_theme_news_factor(theme_name: str, news_list: List[Dict] = None, st
         theme_name: 题材名称
         news_list: 新闻列表（可选，不传则自动获取）
         stocks: 题材内的股票列表（用于匹配新闻）
+        related_news: 已匹配好的相关新闻（可选，由 match_themes_news 批量匹配，传入时不再匹配）
     """
-    if news_list is None:
-        news_list = fetch_cls_news(50)
-    
-    related_news = find_theme_related_news(theme_name, news_list, stocks)
+    if related_news is None:
+        if news_list is None:
+            news_list = fetch_cls_news(50)
+        related_news = find_theme_related_news(theme_name, news_list, stocks)
     
     if not related_news:
         return {
@@ -0,0 +1,252 @@
+# 新闻增量采集模块 - 每个来源记录游标（最新一条的时间和uid），只处理比游标更新的新闻
+# 新闻经过生成器流水线：标准化 → 过滤旧消息 → 去重入库 → 题材匹配（含利好/利空），
+# 各题材的相关新闻和消息面因子随新消息增量更新，不再每次全量重算
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from config import NEWS_LOOKBACK_DAYS, NEWS_POLL_SECONDS, NEWS_POLL_PAGE_SIZE, NEWS_PAGE_SIZE
+from database import get_connection, transaction
+from news_fetcher import (
+    fetch_sina_news, fetch_ths_news, fetch_eastmoney_news,
+    ThemeNewsMatcher, find_themes_news, evaluate_theme_news_factor, MAX_THEME_NEWS,
+)
+from news_store import insert_news, news_uid, parse_news_time
+
+# (来源名, 抓取函数(limit) -> 新闻列表，按时间从新到旧)
+NEWS_SOURCES: List[Tuple[str, Callable[[int], List[Dict]]]] = [
+    ("新浪", fetch_sina_news),
+    ("同花顺", fetch_ths_news),
+    ("东财", fetch_eastmoney_news),
+]
+
+
+# ============ 游标 ============
+
+def load_cursor(source: str) -> Tuple[float, Set[str]]:
+    """来源的游标：(最新一条新闻的时间戳, 该时间戳上的uid集合)；没有记录返回 (0, 空集)"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT last_published, last_uids FROM news_cursors WHERE source = ?', (source,))
+        row = cursor.fetchone()
+        if not row:
+            return 0, set()
+        return row["last_published"] or 0, set(filter(None, (row["last_uids"] or "").split(",")))
+    finally:
+        conn.close()
+
+
+def save_cursor(source: str, last_published: float, last_uids: Set[str]):
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO news_cursors (source, last_published, last_uids, polled_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET
+                last_published = excluded.last_published,
+                last_uids = excluded.last_uids,
+                polled_at = excluded.polled_at
+        ''', (source, last_published, ",".join(sorted(last_uids)), time.time()))
+
+
+def advance_cursor(items: List[Dict], last_published: float, last_uids: Set[str]) -> Tuple[float, Set[str]]:
+    """用本次拿到的新闻推进游标（没有时间的新闻不参与）"""
+    for item in items:
+        ts = item.get("published_at")
+        if ts is None or ts < last_published:
+            continue
+        if ts > last_published:
+            last_published, last_uids = ts, set()
+        last_uids = last_uids | {item["uid"]}
+    return last_published, last_uids
+
+
+# ============ 流水线 ============
+
+def normalize(source: str, items: Iterable[Dict]) -> Iterator[Dict]:
+    """补上来源、uid、时间戳（无法解析时间的为None）"""
+    for item in items:
+        if not item.get("title"):
+            continue
+        yield dict(
+            item,
+            source=item.get("source") or source,
+            uid=news_uid(item),
+            published_at=parse_news_time(item.get("time")),
+        )
+
+
+def newer_than(items: Iterable[Dict], last_published: float, last_uids: Set[str]) -> Iterator[Dict]:
+    """只保留比游标新的新闻；没有时间的新闻交给去重阶段判断"""
+    for item in items:
+        ts = item["published_at"]
+        if ts is None or ts > last_published or (ts == last_published and item["uid"] not in last_uids):
+            yield item
+
+
+def store_new(items: Iterable[Dict]) -> Iterator[Dict]:
+    """去重入库，只放行真正新增的新闻（见 news_store.insert_news）"""
+    yield from insert_news(list(items))
+
+
+def match_themes(items: Iterable[Dict], matcher: Optional[ThemeNewsMatcher]) -> Iterator[Tuple[Dict, Dict[str, Dict]]]:
+    """题材匹配与利好/利空判断：产出 (新闻, {题材名: 相关新闻条目})"""
+    for item in items:
+        yield item, (matcher.match(item) if matcher else {})
+
+
+# ============ 增量采集器 ============
+
+class NewsIngester:
+    """
+    新闻增量采集器
+
+    set_themes()/add_theme() 设置当前题材关键词（关键词有变化的题材从本地新闻库重新检索一次），
+    poll() 拉取各来源比游标新的新闻，增量更新各题材最近 MAX_THEME_NEWS 条相关新闻；
+    theme_factor() 返回题材的消息面因子（相关新闻有变化时才重算）
+    """
+
+    def __init__(self, sources: List[Tuple[str, Callable[[int], List[Dict]]]] = None,
+                 poll_seconds: float = NEWS_POLL_SECONDS):
+        self.sources = sources or NEWS_SOURCES
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._theme_keywords: Dict[str, List[str]] = {}
+        self._matcher: Optional[ThemeNewsMatcher] = None
+        self._related: Dict[str, List[Dict]] = {}
+        self._factors: Dict[str, Dict] = {}
+        self._polled_at = 0
+        self._polling = False
+
+    def set_themes(self, theme_keywords: Dict[str, List[str]]):
+        """设置全部题材（不在其中的题材不再跟踪）"""
+        with self._lock:
+            if theme_keywords == self._theme_keywords:
+                return
+            self._related = {t: self._related[t] for t in theme_keywords if t in self._related}
+            self._factors = {t: self._factors[t] for t in theme_keywords if t in self._factors}
+            self._update_themes(theme_keywords, dict(theme_keywords))
+
+    def add_theme(self, theme_name: str, keywords: List[str]):
+        """新增或更新一个题材（流式构建时逐个题材加入）"""
+        with self._lock:
+            if self._theme_keywords.get(theme_name) != keywords:
+                self._update_themes({theme_name: keywords}, dict(self._theme_keywords, **{theme_name: keywords}))
+
+    def _update_themes(self, updates: Dict[str, List[str]], theme_keywords: Dict[str, List[str]]):
+        """关键词有变化的题材从本地新闻库重新检索一次（调用方持有锁）"""
+        changed = {
+            theme_name: keywords for theme_name, keywords in updates.items()
+            if self._theme_keywords.get(theme_name) != keywords
+        }
+        self._theme_keywords = theme_keywords
+        self._matcher = ThemeNewsMatcher(theme_keywords)
+        for theme_name in changed:
+            self._factors.pop(theme_name, None)
+        if changed:
+            self._related.update(find_themes_news(changed))
+
+    def _download(self, source: str, fetch: Callable[[int], List[Dict]]) -> Tuple[List[Dict], Tuple[float, Set[str]]]:
+        """
+        拉取一个来源的新消息
+        有游标时先取 NEWS_POLL_PAGE_SIZE 条，整页都比游标新（可能有遗漏）时再取 NEWS_PAGE_SIZE 条
+        """
+        last_published, last_uids = load_cursor(source)
+        limit = NEWS_POLL_PAGE_SIZE if last_published else NEWS_PAGE_SIZE
+        items = list(normalize(source, fetch(limit)))
+        fresh = list(newer_than(items, last_published, last_uids))
+        if last_published and len(items) >= limit and len(fresh) == len(items) and limit < NEWS_PAGE_SIZE:
+            items = list(normalize(source, fetch(NEWS_PAGE_SIZE)))
+            fresh = list(newer_than(items, last_published, last_uids))
+        return fresh, advance_cursor(items, last_published, last_uids)
+
+    def poll(self, force: bool = False) -> int:
+        """
+        增量采集一次（距上次不足 poll_seconds 秒时跳过，force=True 除外；已有采集在进行时跳过）
+        下载和入库不持有锁，只在匹配题材、更新相关新闻时加锁，采集期间 theme_factor() 不被阻塞
+        返回新入库的新闻条数
+        """
+        with self._lock:
+            if self._polling or (not force and time.time() - self._polled_at < self.poll_seconds):
+                return 0
+            self._polling = True
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.sources)) as executor:
+                futures = [(source, executor.submit(self._download, source, fetch)) for source, fetch in self.sources]
+                downloads = []
+                for source, future in futures:
+                    try:
+                        downloads.append((source, future.result()))
+                    except Exception as e:
+                        print(f"  {source}增量采集失败: {e}")
+
+            stored = []
+            for source, (fresh, (last_published, last_uids)) in downloads:
+                try:
+                    stored.extend(store_new(fresh))
+                    save_cursor(source, last_published, last_uids)
+                except Exception as e:
+                    print(f"  {source}新闻入库失败: {e}")
+
+            with self._lock:
+                touched = set()
+                for news, entries in match_themes(stored, self._matcher):
+                    for theme_name, entry in entries.items():
+                        if self._add_related(theme_name, entry):
+                            touched.add(theme_name)
+                for theme_name in touched:
+                    self._factors.pop(theme_name, None)
+        finally:
+            with self._lock:
+                self._polling = False
+                self._polled_at = time.time()
+
+        if stored:
+            print(f"📰 新闻增量采集: 新增{len(stored)}条，{len(touched)}个题材有新消息")
+        return len(stored)
+
+    def _add_related(self, theme_name: str, entry: Dict) -> bool:
+        """
+        按时间从新到旧插入，只保留最近 MAX_THEME_NEWS 条；返回是否有变化
+        （采集期间新加入的题材已从新闻库检索过同一条新闻时不重复加入）
+        """
+        related = self._related.setdefault(theme_name, [])
+        key = (entry.get("content"), entry.get("published_at"))
+        if any((n.get("content"), n.get("published_at")) == key for n in related):
+            return False
+        pos = 0
+        while pos < len(related) and (related[pos].get("published_at") or 0) >= (entry.get("published_at") or 0):
+            pos += 1
+        related.insert(pos, entry)
+        del related[MAX_THEME_NEWS:]
+        return pos < MAX_THEME_NEWS
+
+    def theme_news(self, theme_name: str) -> List[Dict]:
+        """题材最近 NEWS_LOOKBACK_DAYS 天的相关新闻（按时间从新到旧）"""
+        with self._lock:
+            return list(self._current_related(theme_name))
+
+    def _current_related(self, theme_name: str) -> List[Dict]:
+        cutoff = time.time() - NEWS_LOOKBACK_DAYS * 86400
+        related = self._related.get(theme_name, [])
+        current = [n for n in related if (n.get("published_at") or cutoff) >= cutoff]
+        if len(current) != len(related):
+            self._related[theme_name] = current
+            self._factors.pop(theme_name, None)
+        return current
+
+    def theme_factor(self, theme_name: str) -> Dict:
+        """题材的消息面因子（见 evaluate_theme_news_factor）"""
+        with self._lock:
+            related = self._current_related(theme_name)
+            factor = self._factors.get(theme_name)
+            if factor is None:
+                factor = evaluate_theme_news_factor(theme_name, related_news=related)
+                self._factors[theme_name] = factor
+            return factor
+
+
+# 全局采集器（/api/all 快照构建时使用）
+news_ingester = NewsIngester()
@@ -0,0 +1,172 @@
+# 新闻本地存储模块 - 抓取到的新闻落地SQLite（按标题去重），FTS5全文索引检索
+# 题材匹配不再只看最新一批快讯，而是检索最近 NEWS_LOOKBACK_DAYS 天的全部新闻
+import hashlib
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import database
+from config import NEWS_LOOKBACK_DAYS, NEWS_RETENTION_DAYS, NEWS_SEARCH_LIMIT
+from database import get_connection, transaction
+from news_dedup import NearDuplicateIndex, news_text
+
+NEWS_COLUMNS = ["source", "title", "content", "time", "published_at"]
+
+# trigram 分词只能检索3个字及以上的子串，更短的关键词用 LIKE
+FTS_MIN_LENGTH = 3
+
+# 最近 NEWS_LOOKBACK_DAYS 天已入库新闻的近似重复索引（每天按库内数据重建一次）
+_dup_index = {"key": None, "index": None}
+_dup_lock = threading.Lock()
+
+
+def news_uid(news: Dict) -> str:
+    """去重键：去掉空白后的标题（无标题时用正文）的摘要"""
+    text = "".join((news.get("title") or news.get("content") or "").split())
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def parse_news_time(value) -> Optional[float]:
+    """新闻时间转时间戳：兼容秒/毫秒时间戳和 'YYYY-MM-DD HH:MM:SS' 字符串，无法解析返回None"""
+    if value in (None, ""):
+        return None
+    try:
+        ts = float(value)
+        return ts / 1000 if ts > 1e12 else ts
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(value).replace("/", "-")[:19]).timestamp()
+    except ValueError:
+        return None
+
+
+def _has_fts(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'news_fts'")
+    return cursor.fetchone() is not None
+
+
+def _recent_index(cursor, now: float) -> NearDuplicateIndex:
+    """已入库新闻的近似重复索引（调用方持有 _dup_lock）"""
+    key = (database.DB_PATH, date.today())
+    if _dup_index["key"] != key:
+        index = NearDuplicateIndex()
+        cursor.execute(
+            'SELECT uid, title, content FROM news_articles WHERE published_at >= ? ORDER BY published_at',
+            (now - NEWS_LOOKBACK_DAYS * 86400,),
+        )
+        for row in cursor.fetchall():
+            index.add(news_text(dict(row)), row["uid"])
+        _dup_index.update(key=key, index=index)
+    return _dup_index["index"]
+
+
+def insert_news(news_list: Iterable[Dict]) -> List[Dict]:
+    """
+    保存新闻：已入库的（uid相同）或与最近几天已入库新闻近似重复的跳过，
+    并清理超过 NEWS_RETENTION_DAYS 天的旧新闻（无法解析时间的新闻按抓取时间计）
+    返回新入库的新闻（补上 uid、published_at）
+    """
+    now = time.time()
+    cutoff = now - NEWS_RETENTION_DAYS * 86400
+    items = []
+    for news in news_list:
+        if not (news.get("title") or news.get("content")):
+            continue
+        published_at = parse_news_time(news.get("time")) or now
+        if published_at >= cutoff:
+            items.append(dict(news, uid=news.get("uid") or news_uid(news), published_at=published_at))
+
+    with _dup_lock:
+        try:
+            with transaction() as conn:
+                cursor = conn.cursor()
+                index = _recent_index(cursor, now)
+
+                existing = set()
+                uids = list({item["uid"] for item in items})
+                for i in range(0, len(uids), 500):
+                    chunk = uids[i:i + 500]
+                    cursor.execute(
+                        f'SELECT uid FROM news_articles WHERE uid IN ({", ".join("?" * len(chunk))})', chunk
+                    )
+                    existing.update(row["uid"] for row in cursor.fetchall())
+
+                accepted = []
+                for item in items:
+                    if item["uid"] in existing or index.add(news_text(item), item["uid"]) is not None:
+                        continue
+                    accepted.append(item)
+
+                if accepted:
+                    cursor.executemany('''
+                        INSERT OR IGNORE INTO news_articles (uid, source, title, content, time, published_at, fetched_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', [
+                        (item["uid"], item.get("source", ""), item.get("title", ""), item.get("content", ""),
+                         str(item.get("time", "")), item["published_at"], now)
+                        for item in accepted
+                    ])
+                cursor.execute('DELETE FROM news_articles WHERE published_at < ?', (cutoff,))
+        except Exception:
+            # 写入失败时索引里可能有未入库的条目，下次重建
+            _dup_index["key"] = None
+            raise
+    return accepted
+
+
+def save_news(news_list: List[Dict]) -> int:
+    """保存新闻，返回新增条数（见 insert_news）"""
+    return len(insert_news(news_list))
+
+
+def _fts_phrase(keyword: str) -> str:
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def _like_pattern(keyword: str) -> str:
+    return "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search_news(keywords: Iterable[str], lookback_days: float = NEWS_LOOKBACK_DAYS,
+                limit: int = NEWS_SEARCH_LIMIT) -> Optional[List[Dict]]:
+    """
+    检索最近 lookback_days 天内包含任一关键词的新闻（按时间从新到旧）
+    3个字及以上的关键词走FTS5索引，更短的关键词用 LIKE；
+    结果是候选集（FTS不区分大小写），精确匹配由调用方完成
+
+    返回: [{source, title, content, time, published_at}]；数据库出错返回None
+    """
+    keywords = sorted({kw for kw in keywords if kw})
+    if not keywords:
+        return []
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        use_fts = _has_fts(cursor)
+        long_words = [kw for kw in keywords if use_fts and len(kw) >= FTS_MIN_LENGTH]
+        short_words = [kw for kw in keywords if kw not in long_words]
+
+        conditions, params = [], []
+        if long_words:
+            conditions.append('id IN (SELECT rowid FROM news_fts WHERE news_fts MATCH ?)')
+            params.append(" OR ".join(_fts_phrase(kw) for kw in long_words))
+        for kw in short_words:
+            conditions.append("(title LIKE ? ESCAPE '\\' OR content LIKE ? ESCAPE '\\')")
+            params += [_like_pattern(kw)] * 2
+
+        cursor.execute(f'''
+            SELECT {", ".join(NEWS_COLUMNS)} FROM news_articles
+            WHERE published_at >= ? AND ({" OR ".join(conditions)})
+            ORDER BY published_at DESC
+            LIMIT ?
+        ''', [time.time() - lookback_days * 86400] + params + [limit])
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"检索本地新闻失败: {e}")
+        return None
+    finally:
+        conn.close()
+
@@ -1,13 +1,24 @@
 # 收益跟踪模块 - 每日更新推荐股票的实盘收益
-import requests
-from datetime import datetime, date, timedelta
-from typing import List, Dict
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, time as dtime, timedelta
+from typing import List, Dict, Optional
+from config import MAX_WORKERS, BATCH_PRICE_CHUNK_SIZE, BATCH_PRICE_RETRIES
 from database import (
     get_stocks_for_tracking, 
-    save_performance, 
-    get_connection
+    save_performance_batch,
+    get_connection,
+    ROLLUP_DAYS,
 )
-from config import REQUEST_TIMEOUT
+from http_client import get_json
+from kline_store import get_klines, secid_for_stock
+from trading_calendar import is_trading_day, trading_days_between, refresh_calendar, run_on_trading_day
+
+# 收盘时间（此后当日K线的收盘价才是最终值）
+MARKET_CLOSE = dtime(15, 0)
+
+# 东方财富批量行情接口
+ULIST_URL = "http://push2.eastmoney.com/api/qt/ulist/get"
 
 # 缓存当天的股票价格
 _price_cache = {}
@@ -35,8 +46,7 @@ def get_current_price(stock_code: str) -> float:
             "fields": "f43,f44,f45,f46,f47,f48,f57,f58,f169,f170"
         }
         
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        data = resp.json()
+        data = get_json(url, params=params)
         
         if data.get("data"):
             # f43 是最新价（单位：分，需要除以100）
@@ -51,45 +61,65 @@ def get_current_price(stock_code: str) -> float:
     return 0
 
 
-def get_batch_prices(stock_codes: List[str]) -> Dict[str, float]:
+def _fetch_price_chunk(stock_codes: List[str]) -> Dict[str, float]:
     """
-    批量获取股票价格（更高效）
+    一次批量接口请求获取一组股票的最新价
+    请求失败或接口无数据时抛出异常（由调用方重试该组）；停牌等无价格的股票不在返回结果中
     """
-    if not stock_codes:
-        return {}
+    params = {
+        "fltt": "2",
+        "secids": ",".join(secid_for_stock(code) for code in stock_codes),
+        "fields": "f2,f12"  # f2=最新价, f12=代码
+    }
+    data = get_json(ULIST_URL, params=params)
+    if not data.get("data"):
+        raise ValueError("接口无数据")
     
     prices = {}
+    for item in data["data"].get("diff") or []:
+        code = item.get("f12", "")
+        price = item.get("f2", 0)
+        if code and price and price != "-":
+            prices[code] = float(price)
+    return prices
+
+
+def get_batch_prices(stock_codes: List[str], chunk_size: int = BATCH_PRICE_CHUNK_SIZE) -> Dict[str, float]:
+    """
+    批量获取股票价格
+    按 chunk_size 个代码分组并发请求，失败的分组单独重试 BATCH_PRICE_RETRIES 轮；
+    仍缺价格的股票（分组失败或返回结果中没有）再并发逐只获取
     
-    try:
-        # 构建secids参数
-        secids = []
-        for code in stock_codes:
-            market = "1" if code.startswith(("6", "9")) else "0"
-            secids.append(f"{market}.{code}")
-        
-        # 东方财富批量接口
-        url = "http://push2.eastmoney.com/api/qt/ulist/get"
-        params = {
-            "fltt": "2",
-            "secids": ",".join(secids),
-            "fields": "f2,f12"  # f2=最新价, f12=代码
-        }
-        
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        data = resp.json()
+    返回: {代码: 价格}，获取不到价格的股票不在结果中
+    """
+    codes = list(dict.fromkeys(code for code in stock_codes if code))
+    if not codes:
+        return {}
+    
+    prices = {}
+    pending = [codes[i:i + chunk_size] for i in range(0, len(codes), chunk_size)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="batch-price") as executor:
+        for attempt in range(BATCH_PRICE_RETRIES + 1):
+            if attempt:
+                print(f"🔄 批量获取价格：重试 {len(pending)} 组（第{attempt}轮）")
+            futures = [(chunk, executor.submit(_fetch_price_chunk, chunk)) for chunk in pending]
+            pending = []
+            for chunk, future in futures:
+                try:
+                    prices.update(future.result())
+                except Exception as e:
+                    print(f"批量获取价格失败（{len(chunk)}只，{chunk[0]}...）: {e}")
+                    pending.append(chunk)
+            if not pending:
+                break
         
-        if data.get("data") and data["data"].get("diff"):
-            for item in data["data"]["diff"]:
-                code = item.get("f12", "")
-                price = item.get("f2", 0)
-                if code and price and price != "-":
-                    prices[code] = float(price)
-                    
-    except Exception as e:
-        print(f"批量获取价格失败: {e}")
-        # 失败时逐个获取
-        for code in stock_codes:
-            prices[code] = get_current_price(code)
+        # 分组失败或返回结果中缺失的股票，逐只并发获取
+        missing = [code for code in codes if code not in prices]
+        if missing:
+            print(f"⚠️ 批量接口缺少 {len(missing)} 只股票价格，逐只获取")
+            for code, price in zip(missing, executor.map(get_current_price, missing)):
+                if price > 0:
+                    prices[code] = price
     
     return prices
 
@@ -101,31 +131,6 @@ def calculate_return(recommend_price: float, current_price: float) -> float:
     return round((current_price - recommend_price) / recommend_price * 100, 2)
 
 
-def is_trading_day(check_date: date = None) -> bool:
-    """
-    判断是否为交易日
-    简单判断：周一到周五为交易日（不考虑节假日）
-    """
-    if check_date is None:
-        check_date = date.today()
-    return check_date.weekday() < 5
-
-
-def get_trading_days_between(start_date: date, end_date: date) -> int:
-    """计算两个日期之间的交易日数量"""
-    if end_date <= start_date:
-        return 0
-    
-    trading_days = 0
-    current = start_date + timedelta(days=1)
-    while current <= end_date:
-        if is_trading_day(current):
-            trading_days += 1
-        current += timedelta(days=1)
-    
-    return trading_days
-
-
 def update_all_performance():
     """
     更新所有需要跟踪的股票收益
@@ -142,7 +147,7 @@ def update_all_performance():
         print("⚠️ 今天不是交易日，跳过更新")
         return
     
-    # 获取需要跟踪的股票（最近5天推荐的）
+    # 获取需要跟踪的股票（最近5个交易日推荐的）
     stocks = get_stocks_for_tracking(days_ago=5)
     
     if not stocks:
@@ -155,8 +160,8 @@ def update_all_performance():
     stock_codes = list(set(s['stock_code'] for s in stocks))
     prices = get_batch_prices(stock_codes)
     
-    # 更新每只股票的收益
-    updated_count = 0
+    # 计算每只股票的收益，最后一次性写入
+    rows = []
     for stock in stocks:
         stock_code = stock['stock_code']
         stock_id = stock['id']
@@ -170,16 +175,13 @@ def update_all_performance():
             report_date = report_date_str
         
         # 计算持有天数（交易日）
-        days_held = get_trading_days_between(report_date, today)
+        days_held = trading_days_between(report_date, today)
         
         if days_held < 1:
             continue  # 推荐当天不计算
         
-        # 获取当前价格
+        # 获取当前价格（批量获取时已对缺失的股票逐只补取）
         current_price = prices.get(stock_code, 0)
-        if current_price <= 0:
-            current_price = get_current_price(stock_code)
-        
         if current_price <= 0:
             print(f"  ⚠️ {stock['stock_name']}({stock_code}) 获取价格失败")
             continue
@@ -187,25 +189,135 @@ def update_all_performance():
         # 计算收益率
         return_pct = calculate_return(recommend_price, current_price)
         
-        # 保存收益记录
-        save_performance(
-            stock_id=stock_id,
-            track_date=today,
-            days_held=days_held,
-            current_price=current_price,
-            return_pct=return_pct,
-            is_trading_day=True
-        )
-        
-        updated_count += 1
+        rows.append({
+            "stock_id": stock_id,
+            "track_date": today,
+            "days_held": days_held,
+            "current_price": current_price,
+            "return_pct": return_pct,
+            "is_trading_day": True,
+        })
         
         # 打印日志
         emoji = "🔴" if return_pct < 0 else "🟢"
         print(f"  {emoji} {stock['stock_name']}({stock_code}) T+{days_held}: "
               f"{recommend_price:.2f} → {current_price:.2f} ({return_pct:+.2f}%)")
     
-    print(f"\n✅ 收益更新完成，共更新 {updated_count} 条记录")
+    # 批量保存收益记录（同时更新涉及报表日期的收益汇总）
+    try:
+        result = save_performance_batch(rows)
+    except Exception as e:
+        print(f"❌ 保存收益记录失败: {e}")
+        return
+    
+    print(f"\n✅ 收益更新完成，共 {len(rows)} 条记录（新增 {result['inserted']}，更新 {result['updated']}）")
+    print("=" * 60 + "\n")
+
+
+def _parse_date(value) -> date:
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+
+def _load_closed_bars(stock_code: str, since: date, closed_through: date) -> List[dict]:
+    """
+    读取 since 之后（含）到 closed_through 为止的不复权日K线（本地优先，只拉取缺失部分）
+    收益按推荐价计算，推荐价为当日实盘价，所以用不复权价格
+    """
+    # 自然日数 >= 交易日数，多取几根保证覆盖推荐日
+    limit = (date.today() - since).days + 10
+    _, bars = get_klines(secid_for_stock(stock_code), limit=limit, fqt=0)
+    since_str, through_str = since.isoformat(), closed_through.isoformat()
+    return [b for b in bars if since_str <= b["trade_date"] <= through_str and b["close"] > 0]
+
+
+def build_backfill_rows(stock: Dict, bars: List[dict]) -> List[Dict]:
+    """
+    按日K线计算一只推荐股票 T+1 ~ T+{max(ROLLUP_DAYS)} 的收益记录
+    T+N 与定时更新（update_all_performance）的定义相同：推荐日到该K线日期之间的交易日数（交易日历），
+    停牌日没有K线，该日不产生记录（定时更新当天取不到价格同样跳过），不顺延。
+    收益按当日收盘价计算，同时记录当日开盘价（T+1开盘价即次日买入的实际成本）
+    """
+    report_date = _parse_date(stock["report_date"])
+    recommend_price = stock["recommend_price"] or 0
+    dates = [b["trade_date"] for b in bars]
+    start = bisect_right(dates, report_date.isoformat())
+    
+    rows = []
+    for bar in bars[start:]:
+        days_held = trading_days_between(report_date, bar["trade_date"])
+        if days_held > max(ROLLUP_DAYS):
+            break
+        if days_held < 1:
+            continue
+        rows.append({
+            "stock_id": stock["id"],
+            "track_date": bar["trade_date"],
+            "days_held": days_held,
+            "current_price": bar["close"],
+            "return_pct": calculate_return(recommend_price, bar["close"]),
+            "is_trading_day": True,
+            "open_price": bar["open"],
+        })
+    return rows
+
+
+def backfill_performance(days_ago: int = 30, only_buyable: bool = True,
+                         max_workers: int = MAX_WORKERS) -> Optional[Dict]:
+    """
+    按历史日K线回填收益记录
+    定时更新只能记录运行当天的价格，漏跑的交易日无法补回；回填按K线收盘价
+    补齐最近 days_ago 个交易日推荐股票 T+1 ~ T+5 的记录（T+N 的定义同定时更新），结果可重复计算。
+    K线按股票代码并发同步，收益记录一次性批量写入（已有且数值相同的记录不会改写）
+
+    返回: {"stocks", "codes", "inserted", "updated"}；写入失败返回None
+    """
+    print("\n" + "=" * 60)
+    print(f"📊 开始回填最近{days_ago}天的收益记录...")
+    print("=" * 60)
+    
+    stocks = get_stocks_for_tracking(days_ago=days_ago, only_buyable=only_buyable)
+    if not stocks:
+        print("ℹ️ 没有需要回填的股票")
+        return {"stocks": 0, "codes": 0, "inserted": 0, "updated": 0}
+    
+    # 收盘前当日K线仍在变化，只用已收盘的K线
+    now = datetime.now()
+    closed_through = now.date() if now.time() >= MARKET_CLOSE else now.date() - timedelta(days=1)
+    
+    # 每只股票只同步一次K线，从最早的推荐日开始
+    since = {}
+    for stock in stocks:
+        report_date = _parse_date(stock["report_date"])
+        code = stock["stock_code"]
+        since[code] = min(since.get(code, report_date), report_date)
+    
+    def load(code: str) -> List[dict]:
+        try:
+            return _load_closed_bars(code, since[code], closed_through)
+        except Exception as e:
+            print(f"  ⚠️ {code} 读取K线失败: {e}")
+            return []
+    
+    codes = sorted(since)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backfill") as executor:
+        bars_by_code = dict(zip(codes, executor.map(load, codes)))
+    
+    rows = []
+    for stock in stocks:
+        rows.extend(build_backfill_rows(stock, bars_by_code.get(stock["stock_code"], [])))
+    
+    try:
+        result = save_performance_batch(rows)
+    except Exception as e:
+        print(f"❌ 保存回填记录失败: {e}")
+        return None
+    
+    print(f"\n✅ 收益回填完成，{len(stocks)} 只推荐 / {len(codes)} 个代码，共 {len(rows)} 条记录"
+          f"（新增 {result['inserted']}，更新 {result['updated']}）")
     print("=" * 60 + "\n")
+    return {"stocks": len(stocks), "codes": len(codes), **result}
 
 
 def get_today_performance_report() -> Dict:
@@ -281,10 +393,12 @@ def start_performance_scheduler():
         import time
         
         def run_scheduler():
-            # 每天15:30更新收益
+            # 交易日15:10刷新交易日历，15:30更新收益，16:00按K线补齐漏记的收益
+            schedule.every().day.at("15:10").do(run_on_trading_day, refresh_calendar)
             schedule.every().day.at("15:30").do(update_all_performance)
+            schedule.every().day.at("16:00").do(run_on_trading_day, backfill_performance)
             
-            print("📅 收益跟踪定时任务已启动（每天15:30更新）")
+            print("📅 收益跟踪定时任务已启动（交易日15:30更新，16:00回填）")
             
             while True:
                 schedule.run_pending()
@@ -0,0 +1,103 @@
+# 响应模块 - 接口JSON的序列化、ETag校验和压缩
+# ETag取响应内容的哈希，浏览器带 If-None-Match 复查时内容未变直接返回304；
+# 较大的响应按 Accept-Encoding 做 brotli/gzip 压缩，同一内容只压缩一次
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from flask import Response, request
+
+from config import COMPRESS_MIN_BYTES, COMPRESS_CACHE_ENTRIES
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 压缩级别：兼顾压缩率和CPU
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# 每次都向服务器校验（内容未变时返回304）
+NO_CACHE = "no-cache"
+
+# (内容哈希, 编码) -> 压缩后的内容
+_compressed = OrderedDict()
+_compressed_lock = threading.Lock()
+
+
+def dumps(payload) -> bytes:
+    """序列化为UTF-8 JSON（装了 orjson 时使用 orjson）"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _accepted_encoding(size: int) -> Optional[str]:
+    """客户端支持的压缩编码（brotli优先），响应太小不压缩"""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, digest: str, encoding: str) -> bytes:
+    key = (digest, encoding)
+    with _compressed_lock:
+        if key in _compressed:
+            _compressed.move_to_end(key)
+            return _compressed[key]
+
+    if encoding == "br":
+        data = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+    with _compressed_lock:
+        _compressed[key] = data
+        while len(_compressed) > COMPRESS_CACHE_ENTRIES:
+            _compressed.popitem(last=False)
+    return data
+
+
+def send_bytes(body: bytes, mimetype: str = "application/json", cache_control: str = NO_CACHE) -> Response:
+    """
+    发送已序列化的内容：带内容哈希ETag，If-None-Match 命中时返回304，较大时压缩
+    cache_control: 如历史数据可用 "public, max-age=86400"，默认每次校验
+    """
+    digest = content_hash(body)
+    encoding = _accepted_encoding(len(body))
+    # 不同编码的内容不同，ETag也要区分
+    etag = f"{digest}-{encoding}" if encoding else digest
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(_compress(body, digest, encoding) if encoding else body, mimetype=mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def send_json(payload, cache_control: str = NO_CACHE) -> Response:
+    """序列化并发送JSON（见 send_bytes）"""
+    return send_bytes(dumps(payload), cache_control=cache_control)
@@ -1,17 +1,24 @@
 # 路由模块
-import time
+import json
 from datetime import date, datetime
-from flask import Blueprint, jsonify, render_template, make_response, request
-from theme_fetcher import fetch_hot_themes, fetch_all_themes_with_stocks
-from analyzer import analyze_and_format_stocks
+from typing import Iterator, Tuple
+from flask import Blueprint, Response, jsonify, render_template, request, stream_with_context
+from theme_fetcher import fetch_hot_themes, iter_themes_with_stocks, get_cache_stats
+from analyzer import analyze_stocks
 from emotion_cycle import calculate_theme_emotion, get_stage_color, get_stage_advice
 from theme_quality import evaluate_theme_quality
-from news_fetcher import fetch_cls_news, evaluate_theme_news_factor, get_market_news_summary
+from news_fetcher import extract_theme_keywords
+from news_ingest import news_ingester
 from database import (
     save_report, get_report_by_date, get_recent_reports,
-    get_performance_summary, get_stock_history, init_database
+    get_performance_summary, get_stock_history, init_database, get_pool_stats, get_report_cache_stats,
 )
-from performance_tracker import update_all_performance, get_today_performance_report
+from performance_tracker import update_all_performance, backfill_performance, get_today_performance_report
+from http_client import get_http_stats
+from kline_store import get_klines, secid_for_stock
+from snapshot import SnapshotRefresher
+from config import SNAPSHOT_REFRESH_SECONDS, HISTORY_MAX_AGE
+from responses import send_bytes, send_json, NO_CACHE
 
 try:
     import akshare as ak
@@ -44,12 +51,7 @@ def get_market_index_change() -> float:
 @api.route('/')
 def index():
     """首页"""
-    response = make_response(render_template('index.html'))
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '-1'
-    response.headers['ETag'] = str(time.time())  # 每次生成新的ETag
-    return response
+    return send_bytes(render_template('index.html').encode('utf-8'), mimetype='text/html')
 
 
 @api.route('/api/themes')
@@ -65,140 +67,258 @@ def get_themes():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-@api.route('/api/all')
-def get_all_data():
-    """获取所有热门题材及其推荐股票（并发）"""
+def build_theme_entry(theme_name: str, data: dict, market_change: float, news_factor: dict) -> tuple:
+    """
+    分析单个题材：情绪周期、股票评分、资金认可、大新强、消息面
+    news_factor: 该题材的消息面因子（见 news_ingest.NewsIngester.theme_factor）
+    返回: (题材显示数据, 推荐股票的数值记录)
+    """
+    stocks = data.get("stocks", [])
+    theme_info = data.get("info", {})
+    history = data.get("history", {})
+    hot_score = data.get("hot_score", 0)
+    
+    # 板块涨跌幅
+    theme_change = theme_info.get("change_pct", 0) or 0
+    
+    # 计算情绪周期
+    emotion = calculate_theme_emotion(theme_info, stocks)
+    
+    # 打印分析日志
+    print(f"\n【{theme_name}】热度:{hot_score:.0f}")
+    print(f"  情绪: {emotion['stage']}({emotion['emotion_score']}分) | 涨跌:{theme_change:.2f}%")
+    print(f"  指标: 涨停{emotion['metrics']['limit_up_count']}家 上涨率{emotion['metrics']['up_ratio']:.0f}% 振幅{emotion['metrics']['avg_amplitude']:.1f}%")
+    if history.get('is_hot'):
+        tags = history.get('fund_tags', [])
+        print(f"  🔥资金认可: {', '.join(tags) if tags else '是'}")
+    
+    # 分析并格式化股票（传入大盘和板块涨跌幅）
+    analyzed = analyze_stocks(stocks, market_change, theme_change)
+    formatted_stocks = [s.to_display() for s in analyzed]
+    
+    # 调试：如果没有股票，打印原因
+    if not formatted_stocks and stocks:
+        print(f"  ⚠️ {theme_name} 有{len(stocks)}只原始股票但格式化后为空")
+        for s in stocks[:3]:
+            print(f"    - {s.get('name')} price={s.get('price')} change={s.get('change_pct')}")
+    
+    # 打印龙头股和前排强度
+    if formatted_stocks:
+        print(f"  龙头: ", end="")
+        top3 = []
+        for s in formatted_stocks[:3]:
+            tags = []
+            if s.get('is_front_runner'):
+                tags = s.get('front_runner_tags', [])[:2]
+            tag_str = f"[{'|'.join(tags)}]" if tags else ""
+            top3.append(f"{s['name']}({s['change_pct']}){tag_str}")
+        print(" | ".join(top3))
+    
+    # 资金认可标签
+    fund_tags = []
+    if history.get("continuous_up", 0) >= 2:
+        fund_tags.append(f"连涨{history['continuous_up']}日")
+    if history.get("continuous_inflow", 0) >= 2:
+        fund_tags.append(f"连续{history['continuous_inflow']}日流入")
+    if history.get("total_change_3d", 0) >= 5:
+        fund_tags.append(f"3日涨{history['total_change_3d']:.1f}%")
+    
+    # 评估题材质量（大、新、强）
+    quality = evaluate_theme_quality(theme_name, theme_info, stocks, history)
+    
+    return {
+        "info": {
+            "change_pct": theme_change,
+            "up_count": theme_info.get("up_count", 0),
+            "down_count": theme_info.get("down_count", 0),
+        },
+        "history": {
+            "continuous_up": history.get("continuous_up", 0),
+            "continuous_inflow": history.get("continuous_inflow", 0),
+            "total_change_3d": round(history.get("total_change_3d", 0), 2),
+            "total_inflow_3d": round(history.get("total_inflow_3d", 0) / 100000000, 2),
+            "is_hot": history.get("is_hot", False),
+            "fund_tags": fund_tags,
+        },
+        "hot_score": hot_score,
+        "quality": quality,
+        "news": news_factor,
+        "market_change": market_change,  # 大盘涨跌
+        "emotion": {
+            "stage": emotion["stage"],
+            "stage_desc": emotion["stage_desc"],
+            "score": emotion["emotion_score"],
+            "color": get_stage_color(emotion["stage"]),
+            "advice": get_stage_advice(emotion["stage"]),
+            "metrics": emotion["metrics"],
+        },
+        "stocks": formatted_stocks
+    }, [s.to_record() for s in analyzed]
+
+
+def iter_all_data() -> Iterator[Tuple[str, dict]]:
+    """
+    逐个题材构建 /api/all 的数据（并发抓取 + 分析 + 保存报表）
+    产出事件 (类型, 数据)：
+        ("meta", {market_change})                先产出大盘涨跌
+        ("theme", {name, rank, theme})           每个题材的成分股一到就分析并产出（rank为热度排名）
+        ("done", {success, data, market_change}) 全部完成后的完整数据（与 build_all_data 返回值相同）
+    """
+    print("\n" + "="*60)
+    print("📊 开始获取热门题材数据...")
+    print("="*60)
+    
+    # 并发获取所有数据（后台线程立即开始抓取）
+    themes = iter_themes_with_stocks(theme_limit=8)
+    
+    ranks = {}
+    theme_keywords = {}
+    result = {}
+    stock_records = {}
     try:
-        print("\n" + "="*60)
-        print("📊 开始获取热门题材数据...")
-        print("="*60)
-        
         # 获取大盘涨跌幅（用于判断逆势）
         market_change = get_market_index_change()
         print(f"📈 大盘涨跌: {market_change:+.2f}%")
+        yield "meta", {"market_change": market_change}
         
-        # 并发获取所有数据
-        theme_data = fetch_all_themes_with_stocks(theme_limit=8)
-        
-        # 预先获取新闻列表（避免重复请求）
-        news_list = fetch_cls_news(50)
-        market_news = get_market_news_summary()
-        
-        result = {}
-        for theme_name, data in theme_data.items():
-            stocks = data.get("stocks", [])
-            theme_info = data.get("info", {})
-            history = data.get("history", {})
-            hot_score = data.get("hot_score", 0)
-            
-            # 板块涨跌幅
-            theme_change = theme_info.get("change_pct", 0) or 0
-            
-            # 计算情绪周期
-            emotion = calculate_theme_emotion(theme_info, stocks)
-            
-            # 打印分析日志
-            print(f"\n【{theme_name}】热度:{hot_score:.0f}")
-            print(f"  情绪: {emotion['stage']}({emotion['emotion_score']}分) | 涨跌:{theme_change:.2f}%")
-            print(f"  指标: 涨停{emotion['metrics']['limit_up_count']}家 上涨率{emotion['metrics']['up_ratio']:.0f}% 振幅{emotion['metrics']['avg_amplitude']:.1f}%")
-            if history.get('is_hot'):
-                tags = history.get('fund_tags', [])
-                print(f"  🔥资金认可: {', '.join(tags) if tags else '是'}")
-            
-            # 分析并格式化股票（传入大盘和板块涨跌幅）
-            formatted_stocks = analyze_and_format_stocks(stocks, market_change, theme_change)
-            
-            # 调试：如果没有股票，打印原因
-            if not formatted_stocks and stocks:
-                print(f"  ⚠️ {theme_name} 有{len(stocks)}只原始股票但格式化后为空")
-                for s in stocks[:3]:
-                    print(f"    - {s.get('name')} price={s.get('price')} change={s.get('change_pct')}")
-            
-            # 打印龙头股和前排强度
-            if formatted_stocks:
-                print(f"  龙头: ", end="")
-                top3 = []
-                for s in formatted_stocks[:3]:
-                    tags = []
-                    if s.get('is_front_runner'):
-                        tags = s.get('front_runner_tags', [])[:2]
-                    tag_str = f"[{'|'.join(tags)}]" if tags else ""
-                    top3.append(f"{s['name']}({s['change_pct']}){tag_str}")
-                print(" | ".join(top3))
-            
-            # 资金认可标签
-            fund_tags = []
-            if history.get("continuous_up", 0) >= 2:
-                fund_tags.append(f"连涨{history['continuous_up']}日")
-            if history.get("continuous_inflow", 0) >= 2:
-                fund_tags.append(f"连续{history['continuous_inflow']}日流入")
-            if history.get("total_change_3d", 0) >= 5:
-                fund_tags.append(f"3日涨{history['total_change_3d']:.1f}%")
-            
-            # 评估题材质量（大、新、强）
-            quality = evaluate_theme_quality(theme_name, theme_info, stocks, history)
-            
-            # 评估消息面因子（传入股票列表用于匹配）
-            news_factor = evaluate_theme_news_factor(theme_name, news_list, stocks)
-            
-            result[theme_name] = {
-                "info": {
-                    "change_pct": theme_change,
-                    "up_count": theme_info.get("up_count", 0),
-                    "down_count": theme_info.get("down_count", 0),
-                },
-                "history": {
-                    "continuous_up": history.get("continuous_up", 0),
-                    "continuous_inflow": history.get("continuous_inflow", 0),
-                    "total_change_3d": round(history.get("total_change_3d", 0), 2),
-                    "total_inflow_3d": round(history.get("total_inflow_3d", 0) / 100000000, 2),
-                    "is_hot": history.get("is_hot", False),
-                    "fund_tags": fund_tags,
-                },
-                "hot_score": hot_score,
-                "quality": quality,
-                "news": news_factor,
-                "market_change": market_change,  # 大盘涨跌
-                "emotion": {
-                    "stage": emotion["stage"],
-                    "stage_desc": emotion["stage_desc"],
-                    "score": emotion["emotion_score"],
-                    "color": get_stage_color(emotion["stage"]),
-                    "advice": get_stage_advice(emotion["stage"]),
-                    "metrics": emotion["metrics"],
-                },
-                "stocks": formatted_stocks
-            }
-        
-        # 按热度分数排序
-        sorted_result = dict(sorted(
-            result.items(), 
-            key=lambda x: x[1].get("hot_score", 0), 
-            reverse=True
-        ))
+        # 消息面：增量采集各来源的新消息，只更新有新消息的题材（见 news_ingest）
+        news_ingester.poll()
         
-        print("\n" + "="*60)
-        print(f"✅ 数据获取完成，共 {len(sorted_result)} 个题材")
-        print("="*60 + "\n")
-        
-        # 自动保存报表到数据库
-        try:
-            today = date.today()
-            save_report(today, market_change, sorted_result)
-        except Exception as save_err:
-            print(f"⚠️ 保存报表失败: {save_err}")
-        
-        return jsonify({
-            "success": True,
-            "data": sorted_result,
-            "market_change": market_change
-        })
+        for rank, theme_name, data in themes:
+            theme_keywords[theme_name] = extract_theme_keywords(theme_name, data.get("stocks", []))
+            news_ingester.add_theme(theme_name, theme_keywords[theme_name])
+            result[theme_name], stock_records[theme_name] = build_theme_entry(
+                theme_name, data, market_change, news_ingester.theme_factor(theme_name))
+            ranks[theme_name] = rank
+            yield "theme", {"name": theme_name, "rank": rank, "theme": result[theme_name]}
+    finally:
+        # 提前关闭（构建出错中止）时停止后台抓取
+        themes.close()
+    news_ingester.set_themes(theme_keywords)
+    
+    # 按热度分数排序（同分按排名）
+    sorted_result = dict(sorted(
+        result.items(), 
+        key=lambda x: (-x[1].get("hot_score", 0), ranks[x[0]])
+    ))
+    
+    print("\n" + "="*60)
+    print(f"✅ 数据获取完成，共 {len(sorted_result)} 个题材")
+    print("="*60 + "\n")
+    
+    # 自动保存报表到数据库
+    try:
+        today = date.today()
+        save_report(today, market_change, sorted_result, stock_records)
+    except Exception as save_err:
+        print(f"⚠️ 保存报表失败: {save_err}")
+    
+    yield "done", {
+        "success": True,
+        "data": sorted_result,
+        "market_change": market_change
+    }
+
+
+def build_all_data() -> dict:
+    """
+    构建 /api/all 的完整数据（见 iter_all_data）
+    非流式版本；快照刷新器配置了 iter_all_data 时由后者驱动构建
+    """
+    for event, payload in iter_all_data():
+        if event == "done":
+            return payload
+
+
+# /api/all 快照：交易时段后台定时重建，请求直接返回内存中的最新版本
+all_data_snapshot = SnapshotRefresher("/api/all", build_all_data, SNAPSHOT_REFRESH_SECONDS, streamer=iter_all_data)
+
+
+def start_snapshot_refresher():
+    """启动 /api/all 快照后台刷新"""
+    return all_data_snapshot.start()
+
+
+@api.route('/api/all')
+def get_all_data():
+    """
+    获取所有热门题材及其推荐股票（返回内存快照）
+    参数：
+        fresh: 1=立即重建快照
+    """
+    try:
+        fresh = request.args.get('fresh', '') in ('1', 'true')
+        snapshot = all_data_snapshot.get(fresh=fresh)
+        return send_bytes(snapshot.body)
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+def sse_event(event: str, data: dict) -> str:
+    """格式化一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def replay_snapshot(payload: dict) -> Iterator[Tuple[str, dict]]:
+    """把已有快照按 iter_all_data 的事件格式重放（不含 done）"""
+    yield "meta", {"market_change": payload.get("market_change", 0)}
+    for rank, (theme_name, theme) in enumerate(payload.get("data", {}).items()):
+        yield "theme", {"name": theme_name, "rank": rank, "theme": theme}
+
+
+@api.route('/api/all/stream')
+def stream_all_data():
+    """
+    流式获取所有热门题材（Server-Sent Events），每个题材分析完立即推送
+    事件：
+        meta  - {market_change}
+        theme - {name, rank, theme}（按完成先后到达，rank为热度排名）
+        done  - {order, market_change, version, generated_at}
+        failed - {error}
+    已有快照时直接重放快照；否则跟读快照刷新器进行中的构建（没有时启动一次），从第一个事件开始推送，
+    与后台刷新、其他请求共用同一次构建，完成后发布为新快照
+    参数：
+        fresh: 1=忽略快照重新构建
+    """
+    fresh = request.args.get('fresh', '') in ('1', 'true')
+    
+    def generate():
+        events = all_data_snapshot.stream(fresh=fresh)
+        streamed = False
+        try:
+            for event, payload in events:
+                if event != "snapshot":
+                    streamed = True
+                    yield sse_event(event, payload)
+                    continue
+                
+                snapshot = payload
+                data = json.loads(snapshot.body)
+                if not streamed:
+                    for replay_event, replay_payload in replay_snapshot(data):
+                        yield sse_event(replay_event, replay_payload)
+                yield sse_event("done", {
+                    "order": list(data.get("data", {})),
+                    "market_change": data.get("market_change", 0),
+                    "version": snapshot.version,
+                    "generated_at": snapshot.built_at,
+                })
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield sse_event("failed", {"error": str(e)})
+        finally:
+            # 客户端断开时只停止跟读，构建照常完成并发布
+            events.close()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # ==================== 报表存储与查询API ====================
 
 @api.route('/api/reports')
@@ -207,7 +327,7 @@ def get_reports():
     try:
         limit = request.args.get('limit', 30, type=int)
         reports = get_recent_reports(limit)
-        return jsonify({
+        return send_json({
             "success": True,
             "data": reports
         })
@@ -229,10 +349,12 @@ def get_report(report_date):
         if not report:
             return jsonify({"success": False, "error": "未找到该日期的报表"}), 404
         
-        return jsonify({
+        # 历史日期的报表不再变化，允许浏览器缓存（过期后凭ETag校验）
+        cache_control = f"public, max-age={HISTORY_MAX_AGE}" if query_date < date.today() else NO_CACHE
+        return send_json({
             "success": True,
             "data": report
-        })
+        }, cache_control=cache_control)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -245,7 +367,7 @@ def get_performance():
     try:
         days = request.args.get('days', 30, type=int)
         summary = get_performance_summary(days)
-        return jsonify({
+        return send_json({
             "success": True,
             "data": summary
         })
@@ -279,6 +401,23 @@ def trigger_performance_update():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@api.route('/api/performance/backfill', methods=['POST'])
+def trigger_performance_backfill():
+    """按历史K线回填收益记录"""
+    try:
+        days = request.args.get('days', 30, type=int)
+        result = backfill_performance(days_ago=days)
+        if result is None:
+            return jsonify({"success": False, "error": "保存回填记录失败"}), 500
+        return jsonify({
+            "success": True,
+            "message": "收益回填完成",
+            "data": result
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @api.route('/api/stock/<stock_code>/history')
 def get_stock_recommend_history(stock_code):
     """获取股票的历史推荐记录"""
@@ -298,17 +437,13 @@ def get_stock_recommend_history(stock_code):
 @api.route('/history')
 def history_page():
     """历史报表页面"""
-    response = make_response(render_template('history.html'))
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    return response
+    return send_bytes(render_template('history.html').encode('utf-8'), mimetype='text/html')
 
 
 @api.route('/performance')
 def performance_page():
     """收益统计页面"""
-    response = make_response(render_template('performance.html'))
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    return response
+    return send_bytes(render_template('performance.html').encode('utf-8'), mimetype='text/html')
 
 
 # ==================== K线数据API ====================
@@ -316,53 +451,30 @@ def performance_page():
 @api.route('/api/kline/<stock_code>')
 def get_stock_kline(stock_code):
     """
-    获取股票K线数据
+    获取股票K线数据（本地K线库优先，只增量拉取新K线）
     参数：
         days: 获取最近多少天的数据，默认250
     """
-    import requests
-    
     days = request.args.get('days', 250, type=int)
     
     try:
-        # 判断市场（0=深圳 1=上海）
-        market = "1" if stock_code.startswith(("6", "9")) else "0"
+        # 前复权日K
+        stock_name, bars = get_klines(secid_for_stock(stock_code), limit=days, fqt=1)
         
-        # 东方财富K线接口
-        url = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
-        params = {
-            "secid": f"{market}.{stock_code}",
-            "fields1": "f1,f2,f3,f4,f5,f6",
-            "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
-            "klt": "101",  # 日K
-            "fqt": "1",    # 前复权
-            "end": "20500101",
-            "lmt": str(days),
-        }
-        
-        resp = requests.get(url, params=params, timeout=10)
-        data = resp.json()
-        
-        if not data.get("data") or not data["data"].get("klines"):
+        if not bars:
             return jsonify({"success": False, "error": "无K线数据"}), 404
         
-        stock_name = data["data"].get("name", "")
-        klines = data["data"]["klines"]
-        
-        # 解析K线数据
-        # 格式：日期,开盘,收盘,最高,最低,成交量,成交额,振幅,涨跌幅,涨跌额,换手率
-        result = []
-        for kline in klines:
-            parts = kline.split(",")
-            if len(parts) >= 6:
-                result.append({
-                    "time": parts[0],           # 日期 YYYY-MM-DD
-                    "open": float(parts[1]),    # 开盘价
-                    "high": float(parts[3]),    # 最高价
-                    "low": float(parts[4]),     # 最低价
-                    "close": float(parts[2]),   # 收盘价
-                    "volume": float(parts[5]),  # 成交量
-                })
+        result = [
+            {
+                "time": bar["trade_date"],  # 日期 YYYY-MM-DD
+                "open": bar["open"],        # 开盘价
+                "high": bar["high"],        # 最高价
+                "low": bar["low"],          # 最低价
+                "close": bar["close"],      # 收盘价
+                "volume": bar["volume"],    # 成交量
+            }
+            for bar in bars
+        ]
         
         return jsonify({
             "success": True,
@@ -375,3 +487,41 @@ def get_stock_kline(stock_code):
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
+
+
+# ==================== 运行状态API ====================
+
+@api.route('/api/stats/http')
+def get_http_client_stats():
+    """获取各数据源host的请求延迟和连接复用统计"""
+    try:
+        return jsonify({
+            "success": True,
+            "data": get_http_stats()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api.route('/api/stats/cache')
+def get_theme_cache_stats():
+    """获取题材缓存的命中、请求合并和LRU淘汰统计"""
+    try:
+        return jsonify({
+            "success": True,
+            "data": get_cache_stats()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api.route('/api/stats/db')
+def get_db_pool_stats():
+    """获取数据库连接池的新建、复用和空闲连接统计"""
+    try:
+        return jsonify({
+            "success": True,
+            "data": dict(get_pool_stats(), report_cache=get_report_cache_stats())
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
@@ -4,6 +4,7 @@
 
 from feishu_pusher import push_daily_stock_report, send_feishu_text
 from feishu_sheet import save_stock_data_to_sheet
+from trading_calendar import run_on_trading_day
 import schedule
 import time
 from datetime import datetime
@@ -27,12 +28,12 @@ def main():
     # 启动时发送通知，确认服务正常
     send_feishu_text(f"✅ 股票日报推送服务已启动\n⏰ 启动时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n📅 推送时间: 每天 11:00、20:00\n📊 数据同步保存到飞书表格（保留最近5天）")
     
-    # 每天11:00推送（午盘）
-    schedule.every().day.at("11:00").do(daily_task)
-    # 每天20:00推送（收盘总结）
-    schedule.every().day.at("20:00").do(daily_task)
+    # 交易日11:00推送（午盘）
+    schedule.every().day.at("11:00").do(run_on_trading_day, daily_task)
+    # 交易日20:00推送（收盘总结）
+    schedule.every().day.at("20:00").do(run_on_trading_day, daily_task)
     
-    print(f"📅 已设置每天 11:00、20:00 推送并保存数据")
+    print(f"📅 已设置交易日 11:00、20:00 推送并保存数据")
     print(f"⏳ 等待执行中...")
     
     while True:
@@ -0,0 +1,237 @@
+# 快照模块 - 后台定时构建接口数据，请求直接返回内存中的不可变快照
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, time as dtime, timedelta
+from typing import Callable, Iterator, Optional, Tuple
+
+from responses import dumps
+from trading_calendar import is_trading_day
+
+# version: 递增版本号；built_at: 构建时间；body: 序列化好的JSON（bytes，不可变）
+Snapshot = namedtuple("Snapshot", ["version", "built_at", "body"])
+
+# 交易时段（含集合竞价）
+TRADING_SESSIONS = [
+    (dtime(9, 15), dtime(11, 30)),
+    (dtime(13, 0), dtime(15, 0)),
+]
+
+
+def in_trading_hours(now: datetime = None) -> bool:
+    """是否处于交易时段（交易日）"""
+    now = now or datetime.now()
+    if not is_trading_day(now.date()):
+        return False
+    return any(start <= now.time() < end for start, end in TRADING_SESSIONS)
+
+
+def last_session_end(now: datetime = None) -> datetime:
+    """最近一个已结束交易时段的结束时间"""
+    now = now or datetime.now()
+    d = now.date()
+    while True:
+        if is_trading_day(d):
+            for _, end in reversed(TRADING_SESSIONS):
+                end_at = datetime.combine(d, end)
+                if end_at <= now:
+                    return end_at
+        d -= timedelta(days=1)
+
+
+class _Build:
+    """
+    一次进行中的构建：构建线程依次追加事件，任意多个订阅者各自从头跟读，
+    订阅者断开不影响构建；构建结束时记录发布的快照（或异常）
+    """
+
+    def __init__(self):
+        self.events = []
+        self.snapshot = None
+        self.error = None
+        self.finished = False
+        self._cond = threading.Condition()
+
+    @classmethod
+    def completed(cls, snapshot: Snapshot) -> "_Build":
+        build = cls()
+        build.finish(snapshot)
+        return build
+
+    def append(self, event: str, data):
+        with self._cond:
+            self.events.append((event, data))
+            self._cond.notify_all()
+
+    def finish(self, snapshot: Snapshot = None, error: Exception = None):
+        with self._cond:
+            self.snapshot = snapshot
+            self.error = error
+            self.finished = True
+            self._cond.notify_all()
+
+    def follow(self) -> Iterator[Tuple[str, object]]:
+        """从第一个事件开始跟读，最后产出 ("snapshot", 快照)；构建失败时抛出构建的异常"""
+        pos = 0
+        while True:
+            with self._cond:
+                while pos >= len(self.events) and not self.finished:
+                    self._cond.wait()
+                batch = self.events[pos:]
+                finished = self.finished
+            pos += len(batch)
+            # 不持锁推送，慢客户端不阻塞构建和其他订阅者
+            yield from batch
+            if finished and pos >= len(self.events):
+                break
+        if self.error is not None:
+            raise self.error
+        yield "snapshot", self.snapshot
+
+    def wait(self) -> Snapshot:
+        with self._cond:
+            while not self.finished:
+                self._cond.wait()
+        if self.error is not None:
+            raise self.error
+        return self.snapshot
+
+
+class SnapshotRefresher:
+    """
+    快照刷新器
+
+    builder 返回可JSON序列化的dict，刷新器为其补上 version / generated_at 后序列化保存。
+    交易时段内按 interval 秒定时重建；休市时只在最近一次收盘后补建一次（拿到收盘数据）。
+    同一时间只有一个构建在执行（独立线程），强制刷新和流式请求都加入进行中的那次构建，共用其结果。
+    streamer（可选）是 builder 的流式版本：逐步产出 (事件, 数据)，最后产出 ("done", builder返回的dict)；
+    有 streamer 时构建由它驱动，事件记入本次构建的缓冲，stream() 的订阅者从头跟读。
+    """
+
+    def __init__(self, name: str, builder: Callable[[], dict], interval: float,
+                 streamer: Callable[[], Iterator[Tuple[str, dict]]] = None):
+        self.name = name
+        self.builder = builder
+        self.streamer = streamer
+        self.interval = interval
+        self._snapshot = None
+        self._version = 0
+        self._build = None
+        # 只保护 _build 的登记（不在持锁时构建或推送）
+        self._build_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._thread = None
+
+    def current(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    def _join(self, seen: Optional[Snapshot]) -> _Build:
+        """
+        加入进行中的构建；没有时启动一次新构建
+        seen 为调用方看到的快照，之后已有新快照发布时直接返回它
+        """
+        with self._build_lock:
+            if self._build is not None:
+                return self._build
+            if self._snapshot is not seen:
+                return _Build.completed(self._snapshot)
+            build = self._build = _Build()
+        threading.Thread(
+            target=self._run_build, args=(build, seen), daemon=True, name=f"snapshot-build-{self.name}",
+        ).start()
+        return build
+
+    def _run_build(self, build: _Build, seen: Optional[Snapshot]):
+        start = time.time()
+        try:
+            if self.streamer is None:
+                data = self.builder()
+            else:
+                data = None
+                for event, payload in self.streamer():
+                    if event == "done":
+                        data = payload
+                        break
+                    build.append(event, payload)
+                if data is None:
+                    raise RuntimeError("流式构建未产出完整数据")
+            snapshot = self._publish(data, seen)
+        except Exception as e:
+            print(f"⚠️ {self.name} 快照构建失败: {e}")
+            with self._build_lock:
+                self._build = None
+            build.finish(error=e)
+            return
+        print(f"📸 {self.name} 快照 v{snapshot.version} 构建完成，耗时 {time.time() - start:.1f}s，{len(snapshot.body) // 1024}KB")
+        with self._build_lock:
+            self._build = None
+        build.finish(snapshot)
+
+    def rebuild(self) -> Snapshot:
+        """立即重建快照并等待完成；已有构建在进行时等待它，不重复构建"""
+        return self._join(self._snapshot).wait()
+
+    def stream(self, fresh: bool = False) -> Iterator[Tuple[str, object]]:
+        """
+        流式获取快照
+        已有快照（且不要求 fresh）时只产出 ("snapshot", 快照)；
+        否则加入进行中的构建（没有时启动一次），从头产出其事件（"done" 除外），最后产出 ("snapshot", 新快照)。
+        调用方提前关闭迭代器只是停止跟读，构建照常完成并发布
+        """
+        seen = self._snapshot
+        if seen is not None and not fresh:
+            yield "snapshot", seen
+            return
+        yield from self._join(seen).follow()
+
+    def _publish(self, data: dict, seen: Optional[Snapshot]) -> Snapshot:
+        """
+        把构建好的数据发布为最新快照
+        seen 为构建开始时的快照；期间已有更新的快照发布时不覆盖，返回那份更新的快照
+        """
+        payload = dict(data)
+        with self._publish_lock:
+            if self._snapshot is not seen:
+                return self._snapshot
+            version = self._version + 1
+            built_at = datetime.now().isoformat(timespec="seconds")
+            payload["version"] = version
+            payload["generated_at"] = built_at
+            body = dumps(payload)
+
+            self._version = version
+            self._snapshot = Snapshot(version, built_at, body)
+            return self._snapshot
+
+    def get(self, fresh: bool = False) -> Snapshot:
+        """获取快照；尚未构建或 fresh=True 时同步构建"""
+        snapshot = self._snapshot
+        if fresh or snapshot is None:
+            return self.rebuild()
+        return snapshot
+
+    def _needs_refresh(self) -> bool:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return True
+        if in_trading_hours():
+            return True
+        return datetime.fromisoformat(snapshot.built_at) < last_session_end()
+
+    def _run(self):
+        print(f"📅 {self.name} 快照刷新已启动（交易时段每{self.interval}秒）")
+        while True:
+            try:
+                if self._needs_refresh():
+                    self.rebuild()
+            except Exception as e:
+                print(f"⚠️ {self.name} 快照构建失败，继续使用旧快照: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        """启动后台刷新线程（重复调用无副作用）"""
+        if self._thread is not None:
+            return self._thread
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"snapshot-{self.name}")
+        self._thread.start()
+        return self._thread
@@ -0,0 +1,127 @@
+# 测试批量评分与逐只评分结果一致
+import random
+
+from analyzer import (
+    calculate_score, score_stocks_batch, score_columns, stocks_to_columns,
+    build_rank_index, assign_roles, identify_stock_role, analyze_and_format_stocks,
+)
+from models import StockQuote
+
+
+def make_stock(rng: random.Random) -> dict:
+    """随机生成一只股票的行情（覆盖涨停、一字板、缺字段、整数字段等情况）"""
+    prev_close = round(rng.uniform(3, 80), 2)
+    change_pct = rng.choice([
+        round(rng.uniform(-10, 10), 2),
+        10.0, 9.9, 7.0, 5.0, 3.0, 2.0, 0, -1.0, -3.0,
+    ])
+    price = round(prev_close * (1 + change_pct / 100), 2)
+    high = round(max(price, prev_close) * (1 + rng.uniform(0, 0.05)), 2)
+    low = round(min(price, prev_close) * (1 - rng.uniform(0, 0.05)), 2)
+    if rng.random() < 0.1:
+        high = low = price  # 一字板
+    stock = {
+        "code": f"{rng.choice(['600', '000', '002'])}{rng.randint(0, 999):03d}",
+        "name": "测试",
+        "price": price,
+        "change_pct": change_pct,
+        "amount": rng.choice([rng.uniform(1e6, 5e9), rng.randint(0, 10 ** 9), 0]),
+        "amplitude": round(rng.uniform(0, 12), 2),
+        "high": high,
+        "low": low,
+        "open": round(prev_close * (1 + rng.uniform(-0.06, 0.1)), 2),
+        "prev_close": prev_close,
+        "market_cap": rng.choice([rng.uniform(1e9, 3e11), 6e9, 1.2e11, 0]),
+        "float_cap": rng.choice([rng.uniform(5e8, 1e11), 0]),
+    }
+    # 随机去掉字段或置空
+    for key in ["open", "prev_close", "float_cap", "high", "amplitude"]:
+        r = rng.random()
+        if r < 0.05:
+            del stock[key]
+        elif r < 0.1:
+            stock[key] = None
+    if rng.random() < 0.05:
+        stock["price"] = 0
+    return stock
+
+
+def test_batch_score_matches_scalar():
+    rng = random.Random(20240101)
+    for market_change in [0, 0.8, -0.3, -0.5, -1.2]:
+        for theme_change in [0, 1.5, 0.5, -0.8]:
+            stocks = [make_stock(rng) for _ in range(300)]
+            expected = [calculate_score(s, market_change, theme_change) for s in stocks]
+            assert score_stocks_batch(stocks, market_change, theme_change) == expected
+
+
+def test_score_columns_accepts_dataframe():
+    import pandas as pd
+
+    rng = random.Random(7)
+    stocks = [make_stock(rng) for _ in range(100)]
+    cols = stocks_to_columns(stocks)
+    from_dict = score_columns(cols, -0.8, 0.5)
+    from_frame = score_columns(pd.DataFrame(cols), -0.8, 0.5)
+    assert (from_dict["score"] == from_frame["score"]).all()
+    assert [calculate_score(s, -0.8, 0.5)[0] for s in stocks] == from_dict["score"].tolist()
+
+
+def test_empty_batch():
+    assert score_stocks_batch([]) == []
+    assert assign_roles([]) == []
+
+
+def naive_rank(stock: dict, stocks: list, field: str) -> int:
+    """原逐只排序的名次算法"""
+    ordered = sorted(stocks, key=lambda x: x.get(field, 0) or 0, reverse=True)
+    return next((i for i, s in enumerate(ordered) if s.get("code") == stock.get("code")), 99) + 1
+
+
+def test_rank_index_matches_naive():
+    rng = random.Random(42)
+    stocks = [make_stock(rng) for _ in range(200)]
+    stocks += stocks[:5]  # 重复代码
+    index = build_rank_index(stocks)
+    for s in stocks:
+        assert index["change_rank"][s["code"]] == naive_rank(s, stocks, "change_pct")
+        assert index["cap_rank"][s["code"]] == naive_rank(s, stocks, "market_cap")
+        assert index["amount_rank"][s["code"]] == naive_rank(s, stocks, "amount")
+
+    outsider = dict(stocks[0], code="999999")
+    assert identify_stock_role(outsider, stocks, rank_index=index)["change_rank"] == naive_rank(outsider, stocks, "change_pct")
+
+
+def test_assign_roles_matches_single():
+    rng = random.Random(3)
+    for market_change in [0, -0.8]:
+        stocks = [make_stock(rng) for _ in range(60)]
+        roles = assign_roles(stocks, 0.5, market_change)
+        assert roles == [identify_stock_role(s, stocks, 0.5, market_change) for s in stocks]
+
+
+def test_stock_quote_matches_dict():
+    rng = random.Random(11)
+    stocks = [make_stock(rng) for _ in range(80)]
+    # 行情记录把缺失/None/'-' 统一为0，对照组用同样的值
+    as_dicts = [StockQuote(**s).to_dict() for s in stocks]
+    quotes = [StockQuote(**s) for s in stocks]
+    assert analyze_and_format_stocks(quotes, -0.6, 1.2) == analyze_and_format_stocks(as_dicts, -0.6, 1.2)
+
+
+def test_stock_quote_from_clist():
+    quote = StockQuote.from_clist({"f12": "600000", "f14": "浦发银行", "f2": "-", "f3": "-", "f6": 1.5e8}, "银行")
+    assert quote.price == 0 and quote.change_pct == 0 and quote["amount"] == 1.5e8
+    assert quote.get("theme") == "银行" and quote.get("unknown", 1) == 1
+    assert analyze_and_format_stocks([quote]) == []  # 停牌
+
+
+if __name__ == "__main__":
+    test_batch_score_matches_scalar()
+    test_score_columns_accepts_dataframe()
+    test_empty_batch()
+    test_rank_index_matches_naive()
+    test_assign_roles_matches_single()
+    test_stock_quote_matches_dict()
+    test_stock_quote_from_clist()
+    print("✅ 批量评分与逐只评分结果一致")
@@ -0,0 +1,49 @@
+# 测试自动机匹配结果与逐个 `kw in text` 一致
+import random
+
+from keyword_matcher import KeywordMatcher
+from news_fetcher import match_themes_news, POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS
+
+
+def test_matcher_matches_naive():
+    rng = random.Random(1)
+    alphabet = "卫星互联网低空经济ST*利好ab"
+    keywords = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(200)]
+    keywords += POSITIVE_KEYWORDS + NEGATIVE_KEYWORDS
+    matcher = KeywordMatcher(keywords)
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet + "的了") for _ in range(rng.randint(0, 60)))
+        assert matcher.find(text) == {kw for kw in set(keywords) if kw in text}
+
+
+def test_match_themes_news_rules():
+    news = [
+        {"title": "", "content": "低空经济政策出台，利好", "time": 1},
+        {"title": "卫星", "content": "互联网大跌", "time": 2},
+        {"title": "", "content": "芯片板块减持", "time": 3},
+    ]
+    related = match_themes_news({
+        "低空经济": ["低空经济", "低空", "经济"],
+        "卫星互联网": ["卫星互联网", "卫星", "互联网"],
+        "芯片": ["芯片"],
+    }, news)
+    # 按优先级取第一个命中的关键词；2字关键词只认题材名本身
+    assert [n["matched_keyword"] for n in related["低空经济"]] == ["低空经济"]
+    assert related["低空经济"][0]["is_positive"] and not related["低空经济"][0]["is_negative"]
+    assert [n["matched_keyword"] for n in related["卫星互联网"]] == ["互联网"]
+    assert related["卫星互联网"][0]["is_negative"]
+    assert [n["matched_keyword"] for n in related["芯片"]] == ["芯片"]
+
+
+def test_theme_keywords_cached_by_constituents():
+    from news_fetcher import extract_theme_keywords, theme_keyword_index
+    stocks = [{"name": "中科星图"}, {"name": "航天电子"}, {"name": "ST"}]
+    keywords = extract_theme_keywords("卫星互联网", stocks)
+    assert keywords[0] == "卫星互联网"
+    assert {"卫星", "互联网", "中科星图", "航天", "航天电子"} <= set(keywords)
+    assert [len(kw) for kw in keywords] == sorted((len(kw) for kw in keywords), reverse=True)
+
+    hits = theme_keyword_index.cache_info().hits
+    keywords.append("被调用方修改")
+    assert extract_theme_keywords("卫星互联网", list(reversed(stocks))) == keywords[:-1]
+    assert theme_keyword_index.cache_info().hits == hits + 1
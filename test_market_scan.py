@@ -0,0 +1,25 @@
+# 测试clist分页：按代码分页、页边界重复去重、失败页补取、本地按涨跌幅排序
+import market_scan
+
+
+def test_fetch_clist_all_pages_by_code(monkeypatch):
+    boards = [{"f12": f"BK{i:04d}", "f3": float(i % 7)} for i in range(5)]
+    boards[3]["f3"] = "-"
+    pages = {1: boards[0:2], 2: boards[1:3], 3: boards[3:5]}  # 第2页与第1页边界重复一条
+    requested = []
+    failures = {3: 1}
+
+    def fake_get_json(url, params=None):
+        assert params["fid"] == "f12" and params["po"] == 0
+        pn = params["pn"]
+        requested.append(pn)
+        if failures.get(pn):
+            failures[pn] -= 1
+            raise IOError("timeout")
+        return {"data": {"total": 5, "diff": pages[pn]}}
+
+    monkeypatch.setattr(market_scan, "get_json", fake_get_json)
+    items = market_scan.fetch_clist_all("m:90+t:3", "f3,f12", sort_by="f3", page_size=2)
+
+    assert requested.count(3) == 2
+    assert [item["f12"] for item in items] == ["BK0004", "BK0002", "BK0001", "BK0000", "BK0003"]
@@ -0,0 +1,25 @@
+# 测试新闻近似去重：不同来源措辞略有差异的同一条消息合并，不同消息保留
+from news_dedup import dedupe_news, NearDuplicateIndex
+
+
+def test_dedupe_news_clusters_rewordings():
+    news = [
+        {"title": "国务院印发关于推动低空经济高质量发展的指导意见，明确到2027年低空经济规模超过万亿元", "source": "新浪"},
+        {"title": "宁德时代：前三季度净利润同比增长25.97%", "source": "新浪"},
+        {"title": "国务院印发《关于推动低空经济高质量发展的指导意见》，明确到2027年低空经济规模超万亿元",
+         "content": "国务院印发《关于推动低空经济高质量发展的指导意见》全文", "source": "东财"},
+        {"title": "比亚迪：前三季度净利润同比增长25.97%", "source": "同花顺"},
+        {"title": "宁德时代前三季度净利润同比增长25.97%", "source": "同花顺"},
+    ]
+    unique = dedupe_news(news)
+    # 每组保留正文最长的一条，位置为该组第一次出现的位置
+    assert [n["source"] for n in unique] == ["东财", "新浪", "同花顺"]
+    assert unique[2]["title"].startswith("比亚迪")
+
+
+def test_index_returns_existing_key():
+    index = NearDuplicateIndex()
+    assert index.add("中国卫通涨停，卫星互联网板块午后拉升", "a") is None
+    assert index.add("卫星互联网板块午后拉升，中国卫通涨停", "b") == "a"
+    assert index.find("央行宣布下调存款准备金率0.5个百分点") is None
+    assert len(index) == 1
@@ -0,0 +1,22 @@
+# 测试增量采集的游标过滤与推进
+from news_ingest import advance_cursor, newer_than, normalize
+
+
+def test_cursor_filters_and_advances():
+    items = list(normalize("新浪", [
+        {"title": "c", "time": "2025-01-02 09:30:00"},
+        {"title": "b", "time": "2025-01-02 09:30:00"},
+        {"title": "a", "time": "2025-01-02 09:00:00"},
+        {"title": "无时间", "time": ""},
+        {"title": "", "time": "2025-01-02 10:00:00"},
+    ]))
+    assert [n["title"] for n in items] == ["c", "b", "a", "无时间"]
+    assert all(n["source"] == "新浪" for n in items)
+
+    ts, uids = advance_cursor(items, 0, set())
+    assert uids == {items[0]["uid"], items[1]["uid"]}
+
+    # 同一时间戳上已见过 b，只剩 c 和没有时间的新闻
+    fresh = list(newer_than(items, ts, {items[1]["uid"]}))
+    assert [n["title"] for n in fresh] == ["c", "无时间"]
+    assert advance_cursor(fresh, ts, {items[1]["uid"]}) == (ts, uids)
@@ -0,0 +1,22 @@
+# 测试收益回填的 T+N 与定时更新一致（按交易日历计算，停牌日不顺延）
+from performance_tracker import build_backfill_rows
+from trading_calendar import trading_days_between
+
+
+def bar(day, close):
+    return {"trade_date": day, "open": close, "close": close}
+
+
+def test_backfill_days_held_matches_live_job_for_suspended_stock():
+    stock = {"id": 1, "report_date": "2025-03-03", "recommend_price": 10.0}
+    # 2025-03-05 停牌（无K线）
+    bars = [bar("2025-03-03", 10.0), bar("2025-03-04", 10.5), bar("2025-03-06", 11.0),
+            bar("2025-03-07", 11.5), bar("2025-03-10", 12.0), bar("2025-03-11", 12.5)]
+    rows = build_backfill_rows(stock, bars)
+
+    assert [(r["track_date"], r["days_held"]) for r in rows] == [
+        ("2025-03-04", 1), ("2025-03-06", 3), ("2025-03-07", 4), ("2025-03-10", 5),
+    ]
+    # 与定时更新相同的定义：同一 track_date 得到相同的 days_held，每个 T+N 至多一条
+    assert all(r["days_held"] == trading_days_between("2025-03-03", r["track_date"]) for r in rows)
+    assert rows[-1]["return_pct"] == 20.0
@@ -0,0 +1,31 @@
+# 测试快照构建的事件缓冲：订阅者从头跟读，慢客户端不阻塞重建
+import threading
+
+from snapshot import SnapshotRefresher
+
+
+def test_subscribers_follow_one_build():
+    gate = threading.Event()
+    builds = []
+
+    def streamer():
+        builds.append(1)
+        yield "meta", {"market_change": 1}
+        gate.wait(5)
+        yield "theme", {"name": "a"}
+        yield "done", {"data": {"a": {}}}
+
+    refresher = SnapshotRefresher("test", None, 60, streamer=streamer)
+    slow = refresher.stream(fresh=True)
+    assert next(slow) == ("meta", {"market_change": 1})
+
+    # 构建进行中加入的订阅者从第一个事件开始
+    late = refresher.stream(fresh=True)
+    assert next(late) == ("meta", {"market_change": 1})
+
+    gate.set()
+    # slow 停在第一个事件不读，重建照常完成
+    snapshot = refresher.rebuild()
+    assert snapshot.version == 1 and len(builds) == 1
+    assert [event for event, _ in late] == ["theme", "snapshot"]
+    assert list(slow)[-1] == ("snapshot", snapshot)
@@ -0,0 +1,50 @@
+# 测试交易日历的二分运算与逐日遍历结果一致
+from datetime import date, timedelta
+
+import trading_calendar
+from trading_calendar import (
+    SSE_HOLIDAYS, is_trading_day, trading_days_between, offset_trading_day,
+    next_trading_day, previous_trading_day,
+)
+
+
+def naive_is_trading_day(d: date) -> bool:
+    return d.weekday() < 5 and d not in SSE_HOLIDAYS
+
+
+def test_calendar_matches_naive(monkeypatch, tmp_path):
+    monkeypatch.setattr(trading_calendar, "CALENDAR_FILE", str(tmp_path / "trading_days.txt"))
+    trading_calendar.load_calendar()
+
+    start = date(2024, 1, 1)
+    days = [start + timedelta(days=i) for i in range(365 * 3)]
+    for d in days:
+        assert is_trading_day(d) == naive_is_trading_day(d)
+
+    for a in days[::37]:
+        for b in days[::53]:
+            naive = sum(1 for d in days if a < d <= b and naive_is_trading_day(d))
+            assert trading_days_between(a, b) == naive
+
+    # 春节、国庆长假前后
+    assert next_trading_day(date(2025, 1, 27)) == date(2025, 2, 5)
+    assert previous_trading_day(date(2025, 10, 9)) == date(2025, 9, 30)
+    assert offset_trading_day(date(2025, 9, 30), 1) == date(2025, 10, 9)
+    assert offset_trading_day("2025-10-09", -2) == date(2025, 9, 29)
+    assert offset_trading_day(date(2025, 10, 4), 0) == date(2025, 10, 4)
+    assert trading_days_between(date(2025, 9, 30), date(2025, 10, 9)) == 1
+
+
+def test_calendar_file_overrides_seed(monkeypatch, tmp_path):
+    path = tmp_path / "trading_days.txt"
+    # 文件中的交易日（漏掉 2025-01-03 模拟临时休市）
+    path.write_text("2025-01-02\n2025-01-06\n", encoding="utf-8")
+    monkeypatch.setattr(trading_calendar, "CALENDAR_FILE", str(path))
+    trading_calendar.load_calendar()
+    try:
+        assert not is_trading_day(date(2025, 1, 3))
+        assert next_trading_day(date(2025, 1, 2)) == date(2025, 1, 6)
+        assert next_trading_day(date(2025, 1, 6)) == date(2025, 1, 7)  # 文件之后用种子
+    finally:
+        monkeypatch.undo()
+        trading_calendar.load_calendar()
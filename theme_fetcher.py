@@ -1,14 +1,32 @@
 # 题材获取模块 - 从东方财富获取实时热门题材
-import requests
+import asyncio
+import queue
 import re
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import MAX_WORKERS, REQUEST_TIMEOUT, STOCKS_PER_THEME
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Tuple
+from config import (
+    STOCKS_PER_THEME, FETCH_CONCURRENCY, FETCH_DEADLINE,
+    CACHE_MAX_ENTRIES, CACHE_STALE_SECONDS, FULL_MARKET_SCAN,
+)
+from http_client import get_json
+from cache import SingleFlightCache
+from kline_store import get_klines, get_fund_flows
+from models import StockQuote
+from market_scan import (
+    STOCK_FIELDS, is_main_board, fetch_all_boards, fetch_market_spot, assemble_board_stocks,
+)
 
-# 缓存
-_cache = {}
-_cache_time = {}
+# 缓存（单飞：并发请求同一key只抓取一次；过期后宽限期内先返回旧值并后台刷新）
 CACHE_TTL = 300
+_cache = SingleFlightCache(ttl=CACHE_TTL, maxsize=CACHE_MAX_ENTRIES, stale_ttl=CACHE_STALE_SECONDS)
+
+# 逐个题材获取时检查调用方是否已停止的间隔(秒)
+STOP_CHECK_SECONDS = 0.2
+
+# asyncio引擎的阻塞IO线程池
+_executor = None
+_executor_lock = threading.Lock()
 
 # 需要过滤的非题材标签（涨停形态、技术指标等）
 EXCLUDE_KEYWORDS = [
@@ -21,15 +39,9 @@ EXCLUDE_KEYWORDS = [
 ]
 
 
-def _get_cached(key):
-    if key in _cache and time.time() - _cache_time.get(key, 0) < CACHE_TTL:
-        return _cache[key]
-    return None
-
-
-def _set_cache(key, value):
-    _cache[key] = value
-    _cache_time[key] = time.time()
+def get_cache_stats() -> dict:
+    """题材缓存的命中、合并、淘汰统计"""
+    return _cache.stats()
 
 
 def is_valid_theme(name: str) -> bool:
@@ -42,16 +54,64 @@ def is_valid_theme(name: str) -> bool:
     return True
 
 
-def fetch_theme_history(theme_code: str) -> dict:
+def fetch_theme_kline(theme_code: str):
     """
-    获取题材近3日的历史数据（涨跌幅、资金流向）
-    用于判断题材是否持续获得资金认可
+    获取板块近5日K线，返回最近3天的数据
+    失败返回None（不缓存，下次重试）
     """
-    cache_key = f"theme_history_{theme_code}"
-    cached = _get_cached(cache_key)
-    if cached:
-        return cached
+    return _cache.get_or_load(f"theme_kline_{theme_code}", lambda: _load_theme_kline(theme_code))
+
 
+def _load_theme_kline(theme_code: str):
+    try:
+        # 板块K线数据（近5日，本地K线库增量同步）
+        _, bars = get_klines(f"90.{theme_code}", limit=5, fqt=1)
+        if not bars:
+            return None
+        
+        return [
+            {
+                "date": bar["trade_date"],
+                "close": bar["close"],
+                "change_pct": bar["change_pct"],
+                "amount": bar["amount"],
+            }
+            for bar in bars[-3:]  # 取最近3天
+        ]
+        
+    except Exception as e:
+        print(f"获取题材K线失败 {theme_code}: {e}")
+        return None
+
+
+def fetch_theme_fflow(theme_code: str):
+    """
+    获取板块近5日主力资金净流入（f52），返回最近3天的流入额列表
+    失败返回None（不缓存，下次重试）
+    """
+    return _cache.get_or_load(f"theme_fflow_{theme_code}", lambda: _load_theme_fflow(theme_code))
+
+
+def _load_theme_fflow(theme_code: str):
+    try:
+        # 板块资金流向（近5日，本地K线库增量同步）
+        flows = get_fund_flows(f"90.{theme_code}", limit=5)
+        if not flows:
+            return None
+        
+        # main_inflow(f52)是主力净流入
+        return [f["main_inflow"] for f in flows[-3:]]
+        
+    except Exception as e:
+        print(f"获取题材资金流向失败 {theme_code}: {e}")
+        return None
+
+
+def build_theme_history(days_data, inflows) -> dict:
+    """
+    根据K线和资金流向汇总题材近3日表现
+    用于判断题材是否持续获得资金认可
+    """
     result = {
         "days": [],
         "continuous_up": 0,      # 连续上涨天数
@@ -60,102 +120,56 @@ def fetch_theme_history(theme_code: str) -> dict:
         "total_inflow_3d": 0,    # 3日累计资金流入
         "is_hot": False,         # 是否为热门题材
     }
-
-    try:
-        # 获取板块K线数据（近5日）
-        url = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
-        params = {
-            "secid": f"90.{theme_code}",
-            "fields1": "f1,f2,f3,f4,f5,f6",
-            "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
-            "klt": "101",  # 日K
-            "fqt": "1",
-            "end": "20500101",
-            "lmt": "5",
-        }
-        
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        data = resp.json()
-        
-        if data.get("data") and data["data"].get("klines"):
-            klines = data["data"]["klines"]
-            days_data = []
-            
-            for kline in klines[-3:]:  # 取最近3天
-                parts = kline.split(",")
-                if len(parts) >= 9:
-                    days_data.append({
-                        "date": parts[0],
-                        "close": float(parts[2]) if parts[2] else 0,
-                        "change_pct": float(parts[8]) if parts[8] else 0,
-                        "amount": float(parts[5]) if parts[5] else 0,
-                    })
-            
-            result["days"] = days_data
-            
-            # 计算连续上涨天数
-            continuous_up = 0
-            for d in reversed(days_data):
-                if d["change_pct"] > 0:
-                    continuous_up += 1
-                else:
-                    break
-            result["continuous_up"] = continuous_up
-            
-            # 计算3日累计涨幅
-            if days_data:
-                result["total_change_3d"] = sum(d["change_pct"] for d in days_data)
-        
-        # 获取资金流向数据
-        flow_url = "http://push2.eastmoney.com/api/qt/stock/fflow/kline/get"
-        flow_params = {
-            "secid": f"90.{theme_code}",
-            "fields1": "f1,f2,f3,f4,f5,f6",
-            "fields2": "f51,f52,f53,f54,f55,f56",
-            "klt": "101",
-            "lmt": "5",
-        }
-        
-        flow_resp = requests.get(flow_url, params=flow_params, timeout=REQUEST_TIMEOUT)
-        flow_data = flow_resp.json()
+    
+    if days_data:
+        result["days"] = days_data
         
-        if flow_data.get("data") and flow_data["data"].get("klines"):
-            flow_klines = flow_data["data"]["klines"]
-            
-            # 计算连续资金流入天数
-            continuous_inflow = 0
-            total_inflow = 0
-            
-            for kline in reversed(flow_klines[-3:]):
-                parts = kline.split(",")
-                if len(parts) >= 2:
-                    # f52是主力净流入
-                    inflow = float(parts[1]) if parts[1] else 0
-                    total_inflow += inflow
-                    if inflow > 0:
-                        continuous_inflow += 1
-                    else:
-                        break
-            
-            result["continuous_inflow"] = continuous_inflow
-            result["total_inflow_3d"] = total_inflow
+        # 计算连续上涨天数
+        continuous_up = 0
+        for d in reversed(days_data):
+            if d["change_pct"] > 0:
+                continuous_up += 1
+            else:
+                break
+        result["continuous_up"] = continuous_up
         
-        # 判断是否为热门题材（资金认可）
-        # 条件：连续2天以上上涨 或 连续2天以上资金流入 或 3日累计涨幅>5%
-        result["is_hot"] = (
-            result["continuous_up"] >= 2 or 
-            result["continuous_inflow"] >= 2 or 
-            result["total_change_3d"] >= 5
-        )
+        # 计算3日累计涨幅
+        result["total_change_3d"] = sum(d["change_pct"] for d in days_data)
+    
+    if inflows:
+        # 计算连续资金流入天数
+        continuous_inflow = 0
+        total_inflow = 0
         
-        _set_cache(cache_key, result)
+        for inflow in reversed(inflows):
+            total_inflow += inflow
+            if inflow > 0:
+                continuous_inflow += 1
+            else:
+                break
         
-    except Exception as e:
-        print(f"获取题材历史数据失败 {theme_code}: {e}")
+        result["continuous_inflow"] = continuous_inflow
+        result["total_inflow_3d"] = total_inflow
+    
+    # 判断是否为热门题材（资金认可）
+    # 条件：连续2天以上上涨 或 连续2天以上资金流入 或 3日累计涨幅>5%
+    result["is_hot"] = (
+        result["continuous_up"] >= 2 or 
+        result["continuous_inflow"] >= 2 or 
+        result["total_change_3d"] >= 5
+    )
     
     return result
 
 
+def fetch_theme_history(theme_code: str) -> dict:
+    """
+    获取题材近3日的历史数据（涨跌幅、资金流向）
+    用于判断题材是否持续获得资金认可
+    """
+    return build_theme_history(fetch_theme_kline(theme_code), fetch_theme_fflow(theme_code))
+
+
 # 需要过滤的非题材标签（涨停形态、技术指标等）
 EXCLUDE_KEYWORDS = [
     "连板", "一字板", "涨停", "跌停", "打板", "首板", "二板", "三板",
@@ -179,32 +193,36 @@ def is_valid_theme(name: str) -> bool:
 
 def fetch_hot_themes(limit=10) -> list:
     """获取热门题材板块列表"""
-    cache_key = "hot_themes"
-    cached = _get_cached(cache_key)
-    if cached:
-        return cached[:limit]
+    themes = _cache.get_or_load("hot_themes", _load_hot_themes)
+    return themes[:limit] if themes else []
+
 
+def _load_hot_themes():
     try:
-        # 东方财富概念板块接口
-        url = "http://push2.eastmoney.com/api/qt/clist/get"
-        params = {
-            "pn": 1,
-            "pz": 100,  # 多获取一些，过滤后保证数量
-            "po": 1,
-            "np": 1,
-            "fltt": 2,
-            "invt": 2,
-            "fid": "f3",  # 按涨跌幅排序
-            "fs": "m:90+t:3",  # 概念板块
-            "fields": "f1,f2,f3,f4,f12,f13,f14,f104,f105,f128,f136,f152"
-        }
-        
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        data = resp.json()
+        fields = "f1,f2,f3,f4,f12,f13,f14,f104,f105,f128,f136,f152"
+        if FULL_MARKET_SCAN:
+            # 全市场模式：分页拉取全部概念板块
+            items = fetch_all_boards(fields)
+        else:
+            # 东方财富概念板块接口
+            url = "http://push2.eastmoney.com/api/qt/clist/get"
+            params = {
+                "pn": 1,
+                "pz": 100,  # 多获取一些，过滤后保证数量
+                "po": 1,
+                "np": 1,
+                "fltt": 2,
+                "invt": 2,
+                "fid": "f3",  # 按涨跌幅排序
+                "fs": "m:90+t:3",  # 概念板块
+                "fields": fields
+            }
+            data = get_json(url, params=params)
+            items = (data.get("data") or {}).get("diff")
         
-        if data.get("data") and data["data"].get("diff"):
+        if items:
             themes = []
-            for item in data["data"]["diff"]:
+            for item in items:
                 name = item.get("f14", "")
                 # 过滤非题材标签
                 if not is_valid_theme(name):
@@ -216,21 +234,31 @@ def fetch_hot_themes(limit=10) -> list:
                     "up_count": item.get("f104", 0),
                     "down_count": item.get("f105", 0),
                 })
-            _set_cache(cache_key, themes)
-            return themes[:limit]
+            return themes
     except Exception as e:
         print(f"获取热门题材失败: {e}")
     
-    return []
+    return None
 
 
 def fetch_theme_stocks(theme_code: str, theme_name: str) -> list:
-    """获取单个题材的成分股"""
-    cache_key = f"theme_stocks_{theme_code}"
-    cached = _get_cached(cache_key)
-    if cached:
-        return cached
+    """获取单个题材的成分股（StockQuote列表，按涨跌幅降序）"""
+    stocks = _cache.get_or_load(
+        f"theme_stocks_{theme_code}", lambda: _load_theme_stocks(theme_code, theme_name)
+    )
+    return stocks if stocks is not None else []
+
 
+def fetch_market_spot_cached():
+    """沪深主板A股实时行情（缓存，所有题材共用一次拉取）"""
+    return _cache.get_or_load("market_spot", fetch_market_spot)
+
+
+def _load_theme_stocks(theme_code: str, theme_name: str):
+    if FULL_MARKET_SCAN:
+        # 全市场模式：板块成分表 join 全市场行情，取全部成分股
+        return assemble_board_stocks(theme_code, theme_name, get_spot=fetch_market_spot_cached)
+    
     try:
         url = "http://push2.eastmoney.com/api/qt/clist/get"
         params = {
@@ -242,92 +270,37 @@ def fetch_theme_stocks(theme_code: str, theme_name: str) -> list:
             "invt": 2,
             "fid": "f3",  # 按涨跌幅排序
             "fs": f"b:{theme_code}",
-            "fields": "f2,f3,f4,f5,f6,f7,f12,f14,f15,f16,f17,f18,f20,f21"
+            "fields": STOCK_FIELDS
         }
         
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        data = resp.json()
+        data = get_json(url, params=params)
+        items = (data.get("data") or {}).get("diff")
+        if not items:
+            # 限流时接口返回 data: null，按失败处理（不缓存空列表）
+            return None
         
         stocks = []
-        if data.get("data") and data["data"].get("diff"):
-            for item in data["data"]["diff"]:
-                code = item.get("f12", "")
-                if not code:
-                    continue
-                # 过滤科创板（68开头）和深圳创业板/中小板（3开头）
-                if code.startswith("68") or code.startswith("3"):
-                    continue
-                stocks.append({
-                    "code": code,
-                    "name": item.get("f14", ""),
-                    "price": item.get("f2", 0),
-                    "change_pct": item.get("f3", 0),
-                    "change_amt": item.get("f4", 0),
-                    "volume": item.get("f5", 0),  # 成交量(手)
-                    "amount": item.get("f6", 0),  # 成交额
-                    "amplitude": item.get("f7", 0),  # 振幅
-                    "high": item.get("f15", 0),
-                    "low": item.get("f16", 0),
-                    "open": item.get("f17", 0),
-                    "prev_close": item.get("f18", 0),
-                    "market_cap": item.get("f20", 0),  # 总市值
-                    "float_cap": item.get("f21", 0),  # 流通市值
-                    "theme": theme_name,
-                })
+        for item in items:
+            # 过滤科创板（68开头）和深圳创业板/中小板（3开头）
+            if not is_main_board(item.get("f12", "")):
+                continue
+            stocks.append(StockQuote.from_clist(item, theme_name))
         
-        _set_cache(cache_key, stocks)
         return stocks
         
     except Exception as e:
         print(f"获取题材 {theme_name} 成分股失败: {e}")
-        return []
+        return None
 
 
-def fetch_all_themes_with_stocks(theme_limit=8) -> dict:
-    """并发获取所有热门题材及其股票"""
-    # 1. 获取热门题材
-    themes = fetch_hot_themes(theme_limit + 5)  # 多获取一些，后续筛选
-    if not themes:
-        return {}
-    
+def _rank_themes(themes: list, stock_results: dict, history_results: dict, theme_limit: int,
+                 stocks_per_theme: int = STOCKS_PER_THEME) -> dict:
+    """
+    组装结果，优先显示资金认可的题材
+    stocks_per_theme: 每个题材保留的成分股数，None表示全部保留
+    """
     result = {}
     
-    # 2. 并发获取每个题材的成分股和历史数据
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # 提交股票获取任务
-        stock_futures = {
-            executor.submit(fetch_theme_stocks, t["code"], t["name"]): t 
-            for t in themes
-        }
-        # 提交历史数据获取任务
-        history_futures = {
-            executor.submit(fetch_theme_history, t["code"]): t 
-            for t in themes
-        }
-        
-        # 收集股票数据
-        stock_results = {}
-        for future in as_completed(stock_futures):
-            theme = stock_futures[future]
-            try:
-                stocks = future.result()
-                stock_results[theme["code"]] = stocks
-            except Exception as e:
-                print(f"获取股票失败 {theme['name']}: {e}")
-                stock_results[theme["code"]] = []
-        
-        # 收集历史数据
-        history_results = {}
-        for future in as_completed(history_futures):
-            theme = history_futures[future]
-            try:
-                history = future.result()
-                history_results[theme["code"]] = history
-            except Exception as e:
-                print(f"获取历史失败 {theme['name']}: {e}")
-                history_results[theme["code"]] = {}
-    
-    # 3. 组装结果，优先显示资金认可的题材
     theme_scores = []
     for t in themes:
         code = t["code"]
@@ -354,9 +327,194 @@ def fetch_all_themes_with_stocks(theme_limit=8) -> dict:
         
         result[t["name"]] = {
             "info": t,
-            "stocks": stocks[:STOCKS_PER_THEME],
+            "stocks": stocks[:stocks_per_theme],
             "history": history,
             "hot_score": round(score, 1),
         }
     
     return result
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """asyncio引擎使用的阻塞IO线程池（跨请求复用）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=FETCH_CONCURRENCY,
+                    thread_name_prefix="theme-fetch",
+                )
+    return _executor
+
+
+async def iter_themes_with_stocks_async(theme_limit=8, deadline: float = FETCH_DEADLINE
+                                       ) -> AsyncIterator[Tuple[int, str, dict]]:
+    """
+    asyncio并发获取热门题材及其股票，每个题材的成分股一到就产出 (排名, 题材名, 数据)
+    
+    成分股、板块K线、资金流向三类请求全部同时发出（每个题材3个请求），
+    由信号量限制同时在途的请求数，超过总时限仍未返回的请求按失败处理。
+    题材排名只取决于K线和资金流向，先等齐这两类请求确定入选题材，
+    再按成分股返回的先后逐个产出，慢的板块不拖累快的板块
+    
+    参数:
+        theme_limit: 返回的题材数量
+        deadline: 总时限(秒)，包含热门题材列表的获取
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+    end_at = loop.time() + deadline
+    
+    async def run(fn, *args):
+        async with semaphore:
+            return await loop.run_in_executor(executor, fn, *args)
+    
+    # 1. 获取热门题材
+    try:
+        themes = await asyncio.wait_for(run(fetch_hot_themes, theme_limit + 5), deadline)  # 多获取一些，后续筛选
+    except asyncio.TimeoutError:
+        print(f"获取热门题材超时({deadline}s)")
+        return
+    if not themes:
+        return
+    
+    # 2. 同时发出所有题材的成分股、K线、资金流向请求
+    jobs = {}
+    for t in themes:
+        jobs[asyncio.ensure_future(run(fetch_theme_stocks, t["code"], t["name"]))] = ("stocks", t)
+        jobs[asyncio.ensure_future(run(fetch_theme_kline, t["code"]))] = ("kline", t)
+        jobs[asyncio.ensure_future(run(fetch_theme_fflow, t["code"]))] = ("fflow", t)
+    
+    def collect(tasks, parts):
+        for task in tasks:
+            kind, t = jobs[task]
+            try:
+                parts.setdefault(kind, {})[t["code"]] = task.result()
+            except Exception as e:
+                print(f"获取{kind}失败 {t['name']}: {e}")
+    
+    def expire(pending):
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"⚠️ {len(pending)}个请求超过总时限({deadline}s)，按失败处理")
+    
+    # 提前关闭（调用方不再需要结果）时取消还未完成的请求
+    try:
+        # 3. 等齐K线和资金流向，排序确定入选题材
+        history_jobs = [task for task, (kind, _) in jobs.items() if kind != "stocks"]
+        parts = {}
+        done, pending = await asyncio.wait(history_jobs, timeout=max(0, end_at - loop.time()))
+        expire(pending)
+        collect(done, parts)
+        history_results = {
+            t["code"]: build_theme_history(parts.get("kline", {}).get(t["code"]), parts.get("fflow", {}).get(t["code"]))
+            for t in themes
+        }
+        # 全市场模式保留全部成分股参与评分
+        stocks_per_theme = None if FULL_MARKET_SCAN else STOCKS_PER_THEME
+        ranked = _rank_themes(themes, {}, history_results, theme_limit, stocks_per_theme)
+        ranks = {name: rank for rank, name in enumerate(ranked)}
+    
+        # 4. 入选题材的成分股按返回先后产出，未入选题材的请求取消
+        stock_jobs = {}
+        for task, (kind, t) in jobs.items():
+            if kind != "stocks":
+                continue
+            if ranked.get(t["name"], {}).get("info") is not t:
+                task.cancel()
+            else:
+                stock_jobs[task] = t
+    
+        pending = set(stock_jobs)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0, end_at - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                expire(pending)
+                break
+            stock_parts = {}
+            collect(done, stock_parts)
+            for task in done:
+                t = stock_jobs[task]
+                stocks = stock_parts.get("stocks", {}).get(t["code"]) or []
+                yield ranks[t["name"]], t["name"], dict(ranked[t["name"]], stocks=stocks[:stocks_per_theme])
+    
+        # 超时或失败的题材以空成分股产出
+        for task in pending:
+            t = stock_jobs[task]
+            yield ranks[t["name"]], t["name"], ranked[t["name"]]
+    finally:
+        for task in jobs:
+            task.cancel()
+
+
+async def fetch_all_themes_with_stocks_async(theme_limit=8, deadline: float = FETCH_DEADLINE) -> dict:
+    """asyncio并发获取所有热门题材及其股票（按热度排序，见 iter_themes_with_stocks_async）"""
+    items = [item async for item in iter_themes_with_stocks_async(theme_limit, deadline)]
+    return {name: data for _, name, data in sorted(items, key=lambda item: item[0])}
+
+
+def fetch_all_themes_with_stocks(theme_limit=8) -> dict:
+    """并发获取所有热门题材及其股票（asyncio引擎的同步封装）"""
+    return asyncio.run(fetch_all_themes_with_stocks_async(theme_limit))
+
+
+class ThemeStream:
+    """iter_themes_with_stocks 返回的迭代器，close() 停止后台抓取（未开始迭代时也有效）"""
+    
+    def __init__(self, results: queue.Queue, stop: threading.Event, finished: object):
+        self._results = results
+        self._stop = stop
+        self._finished = finished
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> Tuple[int, str, dict]:
+        item = self._results.get()
+        if item is self._finished:
+            self._results.put(item)
+            raise StopIteration
+        if isinstance(item, Exception):
+            self.close()
+            raise item
+        return item
+    
+    def close(self):
+        self._stop.set()
+
+
+def iter_themes_with_stocks(theme_limit=8) -> ThemeStream:
+    """
+    逐个题材获取（asyncio引擎的同步封装）：立即在后台线程开始抓取，
+    返回的迭代器按成分股返回的先后产出 (排名, 题材名, 数据)；
+    迭代器关闭（如客户端断开）时后台抓取随之停止，未发出的请求取消
+    """
+    results = queue.Queue()
+    stop = threading.Event()
+    finished = object()
+    
+    async def consume():
+        async for item in iter_themes_with_stocks_async(theme_limit):
+            results.put(item)
+    
+    async def pump():
+        task = asyncio.ensure_future(consume())
+        try:
+            while not task.done():
+                if stop.is_set():
+                    task.cancel()
+                await asyncio.wait([task], timeout=STOP_CHECK_SECONDS)
+            task.result()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(finished)
+    
+    threading.Thread(target=asyncio.run, args=(pump(),), daemon=True, name="theme-stream").start()
+    return ThemeStream(results, stop, finished)
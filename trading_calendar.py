@@ -0,0 +1,207 @@
+# 交易日历模块 - 上交所交易日有序数组，交易日判断与加减都是二分查找
+# 历史交易日来自上证指数日K线（本地文件 trading_days.txt），
+# 文件不存在或未覆盖的日期用内置种子（工作日去掉法定节假日休市日）
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import List, Union
+
+CALENDAR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trading_days.txt")
+
+# 用于刷新日历的指数（上证指数）
+CALENDAR_SECID = "1.000001"
+
+# 内置种子覆盖的年份；之后的日期按工作日推算，直到新的休市安排加入种子
+SEED_START = date(2024, 1, 1)
+SEED_END = date(2026, 12, 31)
+# 日历向后推算的长度（自然日），保证日期加减不会越界
+EXTEND_DAYS = 400
+
+# 上交所法定节假日休市日（只列周一到周五，周末本来就休市）
+SSE_HOLIDAYS = frozenset(date.fromisoformat(d) for d in [
+    # 2024
+    "2024-01-01",
+    "2024-02-09", "2024-02-12", "2024-02-13", "2024-02-14", "2024-02-15", "2024-02-16",
+    "2024-04-04", "2024-04-05",
+    "2024-05-01", "2024-05-02", "2024-05-03",
+    "2024-06-10",
+    "2024-09-16", "2024-09-17",
+    "2024-10-01", "2024-10-02", "2024-10-03", "2024-10-04", "2024-10-07",
+    # 2025
+    "2025-01-01",
+    "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31", "2025-02-03", "2025-02-04",
+    "2025-04-04",
+    "2025-05-01", "2025-05-02", "2025-05-05",
+    "2025-06-02",
+    "2025-10-01", "2025-10-02", "2025-10-03", "2025-10-06", "2025-10-07", "2025-10-08",
+    # 2026
+    "2026-01-01", "2026-01-02",
+    "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20", "2026-02-23",
+    "2026-04-06",
+    "2026-05-01", "2026-05-04", "2026-05-05",
+    "2026-06-19",
+    "2026-09-25",
+    "2026-10-01", "2026-10-02", "2026-10-05", "2026-10-06", "2026-10-07",
+])
+
+DateLike = Union[date, datetime, str]
+
+# 升序的交易日数组，首次使用时加载
+_dates: List[date] = []
+_lock = threading.Lock()
+
+
+def _to_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _weekdays(start: date, end: date, holidays=frozenset()) -> List[date]:
+    """[start, end] 之间的工作日（去掉休市日）"""
+    days = []
+    d = start
+    while d <= end:
+        if d.weekday() < 5 and d not in holidays:
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def _read_file() -> List[date]:
+    if not os.path.exists(CALENDAR_FILE):
+        return []
+    try:
+        with open(CALENDAR_FILE, encoding="utf-8") as f:
+            return sorted({date.fromisoformat(line.strip()) for line in f if line.strip()})
+    except Exception as e:
+        print(f"读取交易日历失败，使用内置日历: {e}")
+        return []
+
+
+def _build(history: List[date]) -> List[date]:
+    """
+    合并日历：文件之前的种子日期 + 本地文件（实际交易日） + 文件之后的种子日期 + 种子之后按工作日推算
+    """
+    dates = list(history)
+    if dates and dates[0] > SEED_START:
+        dates = _weekdays(SEED_START, min(dates[0] - timedelta(days=1), SEED_END), SSE_HOLIDAYS) + dates
+    last = dates[-1] if dates else SEED_START - timedelta(days=1)
+    if last < SEED_END:
+        dates += _weekdays(max(last + timedelta(days=1), SEED_START), SEED_END, SSE_HOLIDAYS)
+        last = SEED_END
+    horizon = date.today() + timedelta(days=EXTEND_DAYS)
+    if last < horizon:
+        dates += _weekdays(last + timedelta(days=1), horizon)
+    return dates
+
+
+def _calendar() -> List[date]:
+    if not _dates:
+        with _lock:
+            if not _dates:
+                _dates.extend(_build(_read_file()))
+    return _dates
+
+
+def load_calendar() -> int:
+    """重新加载交易日历，返回交易日数量"""
+    dates = _build(_read_file())
+    with _lock:
+        _dates[:] = dates
+    return len(dates)
+
+
+def refresh_calendar() -> bool:
+    """
+    用上证指数日K线刷新本地交易日历文件（只记录已发生的交易日，未来日期仍用种子）
+    失败时保留原日历
+    """
+    from kline_store import get_klines
+
+    try:
+        limit = (date.today() - SEED_START).days + 10
+        _, bars = get_klines(CALENDAR_SECID, limit=limit, fqt=0)
+        history = sorted({date.fromisoformat(b["trade_date"]) for b in bars})
+        if not history:
+            print("⚠️ 刷新交易日历失败: 未获取到指数K线")
+            return False
+
+        # 文件里更早的交易日保留
+        history = sorted(set(history) | {d for d in _read_file() if d < history[0]})
+        tmp_path = CALENDAR_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(d.isoformat() for d in history) + "\n")
+        os.replace(tmp_path, CALENDAR_FILE)
+    except Exception as e:
+        print(f"⚠️ 刷新交易日历失败: {e}")
+        return False
+
+    load_calendar()
+    print(f"📅 交易日历已更新: {history[0]} ~ {history[-1]}，共 {len(history)} 个交易日")
+    return True
+
+
+# ============ 交易日运算 ============
+
+def is_trading_day(d: DateLike = None) -> bool:
+    """是否为交易日（默认今天）；早于日历的日期按工作日判断"""
+    d = _to_date(d) if d is not None else date.today()
+    dates = _calendar()
+    if d < min(dates[0], SEED_START):
+        return d.weekday() < 5
+    i = bisect_left(dates, d)
+    return i < len(dates) and dates[i] == d
+
+
+def trading_days_between(start: DateLike, end: DateLike) -> int:
+    """(start, end] 区间内的交易日数量；end <= start 返回0"""
+    start, end = _to_date(start), _to_date(end)
+    if end <= start:
+        return 0
+    dates = _calendar()
+    return bisect_right(dates, end) - bisect_right(dates, start)
+
+
+def next_trading_day(d: DateLike = None) -> date:
+    """d 之后的第一个交易日"""
+    return offset_trading_day(d, 1)
+
+
+def previous_trading_day(d: DateLike = None) -> date:
+    """d 之前的最后一个交易日"""
+    return offset_trading_day(d, -1)
+
+
+def offset_trading_day(d: DateLike = None, n: int = 0) -> date:
+    """
+    交易日偏移：n>0 为 d 之后第n个交易日，n<0 为 d 之前第|n|个交易日（都不含d本身），
+    n=0 返回 d
+    """
+    d = _to_date(d) if d is not None else date.today()
+    if n == 0:
+        return d
+    dates = _calendar()
+    i = bisect_right(dates, d) + n - 1 if n > 0 else bisect_left(dates, d) + n
+    if i < 0:
+        # 早于日历的部分按工作日倒推
+        day = dates[0]
+        for _ in range(-i):
+            day -= timedelta(days=1)
+            while not is_trading_day(day):
+                day -= timedelta(days=1)
+        return day
+    if i >= len(dates):
+        raise ValueError(f"{d} 偏移 {n} 个交易日超出日历范围（截止 {dates[-1]}）")
+    return dates[i]
+
+
+def run_on_trading_day(job, *args, **kwargs):
+    """定时任务包装：非交易日跳过"""
+    if not is_trading_day():
+        print(f"⏭️ 今天不是交易日，跳过 {getattr(job, '__name__', job)}")
+        return None
+    return job(*args, **kwargs)